@@ -1,20 +1,30 @@
+import asyncio
+import json
 import logging
 import os
-import uuid
-import inspect
-from typing import Optional, List, Tuple
-
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-
-from app.services.extract_text import extract_text_from_file
-from app.services.analyze import analyze_cv
-from app.services.llm import (
-    llm_compare_cvs,
-    llm_canonicalize,
-    llm_keyword_matching,
+from typing import Optional, List
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.core.config import settings
+from app.services.analyze import analyze_document, analyze_document_events, forget_canonical
+from app.services.batch import BatchInputError, ZipBatch, run_batch
+from app.services.cache import cache_stats
+from app.services.candidates import SORTS, get_candidate_store, shortlist_candidates
+from app.services.compare import ComparisonError, compare_cvs
+from app.services.jobs import JobQueueFullError, job_manager
+from app.services.uploads import (
+    UNSUPPORTED_FORMAT_MESSAGE,
+    UploadedDocument,
+    UploadRejectedError,
+    close_all,
+    read_upload,
 )
-from app.services.scoring import fallback_scoring_if_needed
+from app.models.candidates import CandidateFilters, CandidateRecord, CandidateSearchResult
 from app.models.cv import CvAnalysisResponse, CVComparisonResult
+from app.models.jobs import JobInfo, JobKind
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -22,46 +32,41 @@ logger = logging.getLogger(__name__)
 # =========================
 # Sécurité / limites
 # =========================
-MAX_FILE_SIZE_MB = 5
+MAX_FILE_SIZE_MB = settings.MAX_FILE_SIZE_MB
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
 ALLOWED_CONTENT_TYPES = {
     "application/pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    "application/msword",
 }
 
-
-async def _maybe_await(value):
-    """Permet d'appeler des fonctions sync ou async sans se tromper."""
-    if inspect.isawaitable(value):
-        return await value
-    return value
+ZIP_CONTENT_TYPES = {
+    "application/zip",
+    "application/x-zip-compressed",
+    "multipart/x-zip",
+}
 
 
-async def _read_and_validate_file(file: UploadFile) -> bytes:
+async def _read_and_validate_file(file: UploadFile) -> UploadedDocument:
     # 1) Valider le type MIME
     if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
-            detail="Format non supporté. PDF ou DOCX uniquement.",
+            detail=UNSUPPORTED_FORMAT_MESSAGE,
         )
 
-    # 2) Lire le fichier
-    raw_bytes = await file.read()
-
-    # 3) Valider la taille réelle
-    if len(raw_bytes) > MAX_FILE_SIZE_BYTES:
+    # 2) Taille annoncée : refus immédiat, sans rien lire
+    if file.size is not None and file.size > MAX_FILE_SIZE_BYTES:
         raise HTTPException(
             status_code=400,
             detail=f"Fichier trop volumineux (taille maximale : {MAX_FILE_SIZE_MB} Mo).",
         )
 
-    # 4) Valider non-vide
-    if not raw_bytes:
-        raise HTTPException(status_code=400, detail="Fichier vide.")
-
-    return raw_bytes
+    # 3) Lecture par blocs : taille réelle, magic bytes, non-vide
+    try:
+        return await read_upload(file, file.filename or "", MAX_FILE_SIZE_BYTES)
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/analyze-cv", response_model=CvAnalysisResponse)
@@ -69,33 +74,63 @@ async def analyze_cv_endpoint(
     file: UploadFile = File(...),
     job_description: Optional[str] = Form(None),
 ):
-    raw_bytes = await _read_and_validate_file(file)
-
-    try:
-        cv_text, warnings = extract_text_from_file(raw_bytes, file.filename)
-    except Exception as e:
-        logger.error(f"Erreur extraction pour {file.filename}: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erreur extraction: {str(e)}"
-        )
+    document = await _read_and_validate_file(file)
 
     try:
-        # analyze_cv peut être sync OU async selon ta version -> on gère les deux
-        result = await _maybe_await(
-            analyze_cv(
-                cv_text=cv_text,
-                extraction_warnings=warnings,
-                job_description=job_description,
-            )
+        # Extraction + canonicalisation (en cache) puis étapes d'analyse
+        return await analyze_document(
+            document=document,
+            job_description=job_description,
         )
-        return result
     except Exception as e:
         logger.error(f"Erreur analyse CV: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de l'analyse: {str(e)}"
         )
+    finally:
+        document.close()
+
+
+@router.post("/analyze-cv/stream")
+async def analyze_cv_stream_endpoint(
+    file: UploadFile = File(...),
+    job_description: Optional[str] = Form(None),
+):
+    """
+    Variante streaming de /analyze-cv (Server-Sent Events) : un événement par
+    étape terminée, puis `result` avec le même contenu que CVAnalysisResponse.
+    """
+    document = await _read_and_validate_file(file)
+
+    async def event_stream():
+        async for event, data in analyze_document_events(document, job_description):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(document.close),
+    )
+
+
+async def _read_comparison_files(files: List[UploadFile]) -> List[UploadedDocument]:
+    if len(files) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="Au moins 2 CV sont nécessaires pour une comparaison.",
+        )
+
+    # Valider tous les fichiers avant de lancer le moindre appel LLM
+    documents: List[UploadedDocument] = []
+    try:
+        for f in files:
+            documents.append(await _read_and_validate_file(f))
+    except BaseException:
+        close_all(documents)
+        raise
+    return documents
 
 
 @router.post("/compare-cvs", response_model=CVComparisonResult)
@@ -103,54 +138,240 @@ async def compare_cvs_endpoint(
     files: List[UploadFile] = File(...),
     job_description: str = Form(...),
 ):
-    if len(files) < 2:
+    documents = await _read_comparison_files(files)
+
+    try:
+        return await compare_cvs(documents, job_description)
+    except ComparisonError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("Erreur lors de la comparaison", exc_info=True)
         raise HTTPException(
-            status_code=400,
-            detail="Au moins 2 CV sont nécessaires pour une comparaison.",
+            status_code=500,
+            detail=f"Erreur lors de la comparaison: {str(e)}",
         )
+    finally:
+        close_all(documents)
 
-    cvs_data: List[Tuple[str, str, object]] = []
 
-    for f in files:
-        raw_bytes = await _read_and_validate_file(f)
+# =========================
+# Jobs asynchrones
+# =========================
 
-        try:
-            cv_text, warnings = extract_text_from_file(raw_bytes, f.filename)
+def _submit_job(kind: JobKind, runner, documents: List[UploadedDocument]) -> JobInfo:
+    """
+    Met le job en file ; les fichiers temporaires sont supprimés à la fin du job,
+    ou à l'arrêt du serveur s'il était encore en file.
+    """
+    try:
+        return job_manager.submit(kind, runner, cleanup=lambda: close_all(documents))
+    except JobQueueFullError as e:
+        close_all(documents)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
 
-            canonical = await _maybe_await(llm_canonicalize(cv_text, warnings))
-            canonical = fallback_scoring_if_needed(canonical)
 
-            cv_id = str(uuid.uuid4())[:8]
-            cvs_data.append((cv_id, f.filename, canonical))
+@router.post("/jobs/analyze-cv", response_model=JobInfo, status_code=202)
+async def submit_analyze_job(
+    file: UploadFile = File(...),
+    job_description: Optional[str] = Form(None),
+):
+    """Variante asynchrone de /analyze-cv : retourne un job à suivre via GET /jobs/{id}."""
+    document = await _read_and_validate_file(file)
+    return _submit_job(
+        JobKind.ANALYZE,
+        lambda: analyze_document(document, job_description),
+        [document],
+    )
 
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur extraction pour {f.filename}: {e}",
-            )
+
+@router.post("/jobs/compare-cvs", response_model=JobInfo, status_code=202)
+async def submit_compare_job(
+    files: List[UploadFile] = File(...),
+    job_description: str = Form(...),
+):
+    """Variante asynchrone de /compare-cvs : retourne un job à suivre via GET /jobs/{id}."""
+    documents = await _read_comparison_files(files)
+    return _submit_job(
+        JobKind.COMPARE,
+        lambda: compare_cvs(documents, job_description),
+        documents,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Long-polling : attente max (s) de la fin du job"),
+):
+    job = await job_manager.wait(job_id, wait) if wait else job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré.")
+    return job
+
+
+# =========================
+# Analyse en lot
+# =========================
+
+@router.post("/batch/analyze")
+async def batch_analyze_endpoint(
+    files: List[UploadFile] = File(...),
+    job_description: Optional[str] = Form(None),
+    processed_hashes: Optional[str] = Form(
+        None, description="Hashes SHA-256 déjà traités (séparés par des virgules) pour reprendre un lot"
+    ),
+):
+    """
+    Analyse d'un lot de CV (fichiers PDF/DOCX et/ou archives ZIP).
+    Les résultats sont envoyés au fil de l'eau en JSON Lines, un par CV.
+    """
+    documents: List[UploadedDocument] = []
+    archives: List[ZipBatch] = []
+    max_archive = settings.BATCH_MAX_ARCHIVE_MB * 1024 * 1024
+
+    def close_batch() -> None:
+        close_all(documents)
+        for archive in archives:
+            archive.close()
 
     try:
-        # Comparaison (sync ou async)
-        result: CVComparisonResult = await _maybe_await(llm_compare_cvs(cvs_data, job_description))
+        for f in files:
+            if f.content_type in ZIP_CONTENT_TYPES or (f.filename or "").lower().endswith(".zip"):
+                if f.size is not None and f.size > max_archive:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Archive trop volumineuse (taille maximale : {settings.BATCH_MAX_ARCHIVE_MB} Mo).",
+                    )
+                # L'archive est lue en place (fichier temporaire de l'envoi) ; seul
+                # le répertoire central est lu ici, les entrées le seront par run_batch
+                try:
+                    archives.append(await asyncio.to_thread(ZipBatch, f.file))
+                except BatchInputError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            else:
+                documents.append(await _read_and_validate_file(f))
 
-        # Enrichir chaque CV avec matching mots-clés (sync ou async)
-        for cv_item in result.cvs:
-            try:
-                keyword_matching = await _maybe_await(
-                    llm_keyword_matching(cv_item.canonical, job_description)
-                )
-                cv_item.keyword_matching = keyword_matching
-            except Exception as e:
-                logger.warning(f"Erreur analyse mots-clés pour {cv_item.filename}: {e}")
+        # Compté avant toute décompression
+        total = len(documents) + sum(len(archive) for archive in archives)
+        if not total:
+            raise HTTPException(status_code=400, detail="Aucun CV PDF/DOCX dans le lot.")
+        if total > settings.BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Trop de fichiers ({settings.BATCH_MAX_FILES} maximum).")
+    except BaseException:
+        close_batch()
+        raise
 
-        return result
+    skip = {h.strip() for h in (processed_hashes or "").split(",") if h.strip()}
+
+    def batch_documents():
+        yield from documents
+        for archive in archives:
+            yield from archive
+
+    async def records():
+        async for record in run_batch(batch_documents(), job_description, skip_hashes=skip):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        records(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(close_batch),
+    )
+
+
+# =========================
+# Store des candidats
+# =========================
+
+def _candidate_store():
+    store = get_candidate_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Store des candidats désactivé (CANDIDATE_STORE_PATH non défini).")
+    return store
+
+
+def _candidate_filters(
+    q: Optional[str],
+    skills: Optional[str],
+    location: Optional[str],
+    min_years: Optional[float],
+    max_years: Optional[float],
+    min_ats: Optional[int],
+    max_ats: Optional[int],
+) -> CandidateFilters:
+    return CandidateFilters(
+        q=q,
+        skills=[s.strip() for s in (skills or "").split(",") if s.strip()],
+        location=location,
+        min_years=min_years,
+        max_years=max_years,
+        min_ats=min_ats,
+        max_ats=max_ats,
+    )
+
+
+@router.get("/candidates", response_model=CandidateSearchResult)
+def search_candidates_endpoint(
+    q: Optional[str] = Query(None, description="Recherche plein texte"),
+    skills: Optional[str] = Query(None, description="Compétences requises, séparées par des virgules"),
+    location: Optional[str] = Query(None, description="Début de la localisation (sans accents ni casse)"),
+    min_years: Optional[float] = Query(None, ge=0),
+    max_years: Optional[float] = Query(None, ge=0),
+    min_ats: Optional[int] = Query(None, ge=0, le=100),
+    max_ats: Optional[int] = Query(None, ge=0, le=100),
+    sort: str = Query("recent", description="recent, ats, experience ou relevance (avec q)"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """Recherche et filtres sur les CV déjà analysés (aucun appel LLM)."""
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Tri inconnu : {sort} ({', '.join(SORTS)}).")
+    filters = _candidate_filters(q, skills, location, min_years, max_years, min_ats, max_ats)
+    return _candidate_store().search(filters, sort=sort, limit=limit, offset=offset)
+
+
+@router.post("/candidates/shortlist", response_model=CandidateSearchResult)
+async def shortlist_candidates_endpoint(
+    job_description: str = Form(...),
+    limit: int = Form(20, ge=1, le=200),
+    q: Optional[str] = Form(None),
+    skills: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    min_years: Optional[float] = Form(None, ge=0),
+    max_years: Optional[float] = Form(None, ge=0),
+    min_ats: Optional[int] = Form(None, ge=0, le=100),
+    max_ats: Optional[int] = Form(None, ge=0, le=100),
+):
+    """
+    CV stockés les plus proches d'une offre (filtres puis similarité par
+    embeddings), sans ré-envoi des fichiers ni appel LLM.
+    """
+    _candidate_store()
+    filters = _candidate_filters(q, skills, location, min_years, max_years, min_ats, max_ats)
+    return await shortlist_candidates(job_description, filters, limit)
+
+
+@router.get("/candidates/{candidate_id}", response_model=CandidateRecord)
+def get_candidate_endpoint(candidate_id: str):
+    record = _candidate_store().get(candidate_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Candidat introuvable.")
+    return record
+
+
+@router.delete("/candidates/{candidate_id}", status_code=204)
+def delete_candidate_endpoint(candidate_id: str):
+    """
+    Supprime un CV et son analyse du store (droit à l'effacement), ainsi que son
+    CV canonique en cache et ses vecteurs d'embeddings. Les résultats de
+    matching en cache expirent avec RESULT_CACHE_TTL_SECONDS.
+    """
+    if not _candidate_store().delete(candidate_id):
+        raise HTTPException(status_code=404, detail="Candidat introuvable.")
+    forget_canonical(candidate_id)
 
-    except Exception as e:
-        logger.error("Erreur lors de la comparaison", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erreur lors de la comparaison: {str(e)}",
-        )
 
+@router.get("/cache/stats")
+def cache_stats_endpoint():
+    """Compteurs hits/misses des caches (CV canoniques, résultats LLM)."""
+    return cache_stats()
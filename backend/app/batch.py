@@ -0,0 +1,131 @@
+"""
+Analyse en lot d'un répertoire de CV (PDF/DOCX), résultats en JSON Lines.
+
+Usage (depuis le dossier backend) :
+    python -m app.batch ./cvs --job-description offre.txt --output resultats.jsonl
+
+Relancer la même commande reprend le traitement : les fichiers dont le hash
+figure déjà (statut "ok") dans le fichier de sortie sont ignorés.
+
+Avec --batch-api, les appels LLM passent par l'API Batch d'OpenAI (ou son
+simulateur local, BATCH_API_BACKEND=local) : plus lent, mais moins cher et
+sans limite de débit, pour re-scorer tout un vivier de CV pendant la nuit.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from contextlib import nullcontext
+
+from app.core.config import settings
+from app.services.batch import iter_directory_documents, run_batch
+from app.services.batch_api import batch_api_session
+from app.services.extract_text import shutdown_extraction_executor
+from app.services.llm import close_llm_client, compile_job_profile
+
+
+def _processed_hashes(output_path: str) -> set[str]:
+    """Hashes des documents déjà analysés avec succès dans un fichier de sortie existant."""
+    hashes: set[str] = set()
+    if not os.path.exists(output_path):
+        return hashes
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # ligne tronquée par une interruption
+            if record.get("status") == "ok" and record.get("content_hash"):
+                hashes.add(record["content_hash"])
+    return hashes
+
+
+def _read_job_description(value: str | None) -> str | None:
+    if value and os.path.isfile(value):
+        with open(value, encoding="utf-8") as f:
+            return f.read()
+    return value
+
+
+async def _run(args: argparse.Namespace) -> int:
+    job_description = _read_job_description(args.job_description)
+    skip = _processed_hashes(args.output) if args.output and not args.no_resume else set()
+    if skip:
+        logging.info(f"Reprise : {len(skip)} fichier(s) déjà traité(s) seront ignorés.")
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    # API Batch : tous les CV en vol, pour que leurs appels partent dans les mêmes lots
+    concurrency = args.concurrency or (settings.BATCH_MAX_FILES if args.batch_api else settings.BATCH_MAX_CONCURRENCY)
+    try:
+        async with batch_api_session() if args.batch_api else nullcontext() as batching:
+            profile_task = None
+            if batching is not None and job_description:
+                # Profil de l'offre compilé dans le premier lot, avec les canonicalisations
+                profile_task = asyncio.ensure_future(compile_job_profile(job_description))
+            try:
+                async for record in run_batch(
+                    iter_directory_documents(args.directory),
+                    job_description=job_description,
+                    concurrency=concurrency,
+                    skip_hashes=skip,
+                    stage_timeouts=not args.batch_api,
+                ):
+                    status = record.get("status", "error")
+                    counts[status] = counts.get(status, 0) + 1
+                    if status == "skipped":
+                        continue
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    logging.info(f"[{status}] {record.get('filename', '')}")
+                if profile_task is not None:
+                    # Attendu avant la fin de session (déjà terminé en général) ; un échec
+                    # est sans effet, les analyses se sont rabattues sur le texte de l'offre
+                    await asyncio.gather(profile_task, return_exceptions=True)
+            finally:
+                if profile_task is not None and not profile_task.done():
+                    profile_task.cancel()
+                    await asyncio.gather(profile_task, return_exceptions=True)
+            if batching is not None:
+                logging.info(f"API Batch : {batching.submitted} lot(s) soumis.")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await close_llm_client()
+        shutdown_extraction_executor()
+
+    logging.info(f"Terminé : {counts['ok']} ok, {counts['error']} en erreur, {counts['skipped']} ignoré(s).")
+    return 1 if counts["error"] else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Répertoire contenant les CV (parcours récursif)")
+    parser.add_argument("--job-description", "-j", help="Texte de l'offre ou chemin d'un fichier texte")
+    parser.add_argument("--output", "-o", help="Fichier JSON Lines de sortie (défaut : sortie standard)")
+    parser.add_argument(
+        "--concurrency", "-c", type=int, default=None,
+        help=f"Nombre d'analyses simultanées (défaut : {settings.BATCH_MAX_CONCURRENCY}, "
+        f"{settings.BATCH_MAX_FILES} avec --batch-api)",
+    )
+    parser.add_argument(
+        "--batch-api", action="store_true",
+        help="Appels LLM via l'API Batch (BATCH_API_BACKEND), sans délai par étape",
+    )
+    parser.add_argument("--no-resume", action="store_true", help="Ré-analyser même les fichiers déjà traités")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Répertoire introuvable: {args.directory}")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,8 +10,163 @@ class Settings(BaseSettings):
     En local, un fichier .env peut être utilisé (optionnel).
     """
 
+    # Fournisseur LLM : "openai", "openai_compatible" (OPENAI_BASE_URL) ou "fixtures" (rejeu hors ligne)
     LLM_PROVIDER: str = Field(default="openai")
     OPENAI_API_KEY: str | None = Field(default=None)
+    # Modèle par défaut, et modèle par étape, ex. {"canonicalize": "gpt-4o-mini", "compare": "gpt-4o"}
+    LLM_MODEL: str = Field(default="gpt-4o-mini")
+    LLM_STAGE_MODELS: dict[str, str] = Field(default_factory=dict)
+    # Réponses rejouées par le fournisseur "fixtures" ; LLM_FIXTURES_RECORD=true les enregistre
+    LLM_FIXTURES_DIR: str = Field(default="fixtures/llm")
+    LLM_FIXTURES_RECORD: bool = Field(default=False)
+    # Sorties structurées (response_format json_schema strict) quand un schéma est fourni ;
+    # à désactiver pour un endpoint compatible qui ne gère que json_object
+    LLM_STRICT_SCHEMA: bool = Field(default=True)
+
+    # Taille maximale d'un CV envoyé (Mo)
+    MAX_FILE_SIZE_MB: int = Field(default=5)
+    # Au-delà de ce seuil (Ko), un envoi est écrit sur disque plutôt que gardé en mémoire
+    UPLOAD_SPOOL_THRESHOLD_KB: int = Field(default=512)
+    UPLOAD_TMP_DIR: str | None = Field(default=None)
+
+    # Client HTTP partagé vers OpenAI (pool de connexions keep-alive)
+    OPENAI_TIMEOUT_SECONDS: float = Field(default=120.0)
+    OPENAI_MAX_CONNECTIONS: int = Field(default=100)
+    # Endpoint alternatif (serveur factice de test, proxy) ; None = API OpenAI
+    OPENAI_BASE_URL: str | None = Field(default=None)
+
+    # Résilience des appels LLM : nouvelles tentatives, débit client (palier OpenAI), disjoncteur
+    LLM_MAX_RETRIES: int = Field(default=4)
+    LLM_RETRY_BASE_DELAY_SECONDS: float = Field(default=0.5)
+    LLM_RETRY_MAX_DELAY_SECONDS: float = Field(default=20.0)
+    LLM_RATE_LIMIT_RPM: int = Field(default=500)  # 0 = pas de limite côté client
+    LLM_RATE_LIMIT_TPM: int = Field(default=200_000)
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5)  # 0 = disjoncteur désactivé
+    LLM_CIRCUIT_RESET_SECONDS: float = Field(default=30.0)
+
+    # Budgets de tokens des prompts (comptage local, voir services/prompt_budget.py)
+    PROMPT_CV_TEXT_MAX_TOKENS: int = Field(default=3000)
+    PROMPT_CANONICAL_MAX_TOKENS: int = Field(default=2000)
+    PROMPT_JOB_DESCRIPTION_MAX_TOKENS: int = Field(default=1200)
+    PROMPT_COMPARE_MAX_TOKENS: int = Field(default=4000)
+
+    # Canonicalisation : "single" (un appel, texte tronqué à PROMPT_CV_TEXT_MAX_TOKENS),
+    # "sections" (un appel par groupe de sections, en parallèle, fusionnés) ou "auto"
+    # (par sections au-delà de CANONICALIZE_SECTIONS_MIN_TOKENS ; vide = PROMPT_CV_TEXT_MAX_TOKENS,
+    # soit seulement les CV que l'appel unique tronquerait : 3 appels au lieu d'un coûtent plus cher)
+    CANONICALIZE_MODE: str = Field(default="auto")
+    CANONICALIZE_SECTIONS_MIN_TOKENS: int | None = Field(default=None)
+    CANONICALIZE_SECTION_MAX_TOKENS: int = Field(default=1500)  # section plus longue : découpée
+
+    # Matching mots-clés : "llm" (défaut), "fast" (moteur local) ou "hybrid"
+    # (moteur local, seuls les mots-clés ambigus sont envoyés au LLM)
+    KEYWORD_MATCHING_MODE: str = Field(default="llm")
+
+    # Offre compilée une fois (JobProfile en cache) et transmise aux prompts de matching
+    # à la place du texte brut ; false = texte brut de l'offre dans chaque prompt
+    JOB_PROFILE_ENABLED: bool = Field(default=True)
+    # Cache des profils : "memory", "sqlite" ou "none", indépendant de RESULT_CACHE_BACKEND
+    # (une entrée par offre, réutilisée pour chaque candidat)
+    JOB_PROFILE_CACHE_BACKEND: str = Field(default="memory")
+
+    # Analyse avec offre : "staged" (un appel LLM par étape : ATS, matching, mots-clés)
+    # ou "fused" (un seul appel à schéma JSON strict qui renvoie les trois)
+    ANALYSIS_MODE: str = Field(default="staged")
+
+    # Délai maximal par étape LLM du pipeline d'analyse (secondes)
+    LLM_STAGE_TIMEOUT_SECONDS: float = Field(default=90.0)
+
+    # Nombre maximal de CV traités simultanément par /compare-cvs
+    COMPARE_MAX_CONCURRENCY: int = Field(default=5)
+
+    # Au-delà de COMPARE_BATCH_SIZE CV : classement map/reduce par lots (services/ranking.py)
+    COMPARE_BATCH_SIZE: int = Field(default=4)
+    COMPARE_REDUCE_ROUNDS: int = Field(default=2)
+    # Présélection sémantique : au-delà de COMPARE_PRERANK_TOP_K CV, seuls les plus
+    # proches de l'offre (embeddings) passent au classement LLM ; 0 = désactivée
+    COMPARE_PRERANK_TOP_K: int = Field(default=20)
+
+    # Embeddings des CV (services/embeddings.py) : "hashing" (hors ligne, déterministe)
+    # ou "local" (modèle sentence-transformers EMBEDDING_MODEL, installé à part)
+    EMBEDDING_BACKEND: str = Field(default="hashing")
+    EMBEDDING_MODEL: str = Field(default="paraphrase-multilingual-MiniLM-L12-v2")
+    EMBEDDING_DIM: int = Field(default=1024)  # dimension du vectoriseur par hachage
+    EMBEDDING_SECTION_WEIGHTS: dict[str, float] = Field(
+        default_factory=lambda: {"summary": 0.2, "experiences": 0.4, "skills": 0.4}
+    )
+    # Répertoire de l'index persistant (blocs .npy en ajout seul, mappés en mémoire) ; vide = index par requête
+    EMBEDDING_INDEX_DIR: str | None = Field(default=None)
+    EMBEDDING_INDEX_MAX_CHUNKS: int = Field(default=32)  # au-delà, les blocs sont fusionnés en un seul
+
+    # Cache des CV canoniques : "memory" (LRU + TTL), "sqlite" ou "none"
+    CANONICAL_CACHE_BACKEND: str = Field(default="memory")
+    CANONICAL_CACHE_MAX_ENTRIES: int = Field(default=1000)
+    CANONICAL_CACHE_TTL_SECONDS: float = Field(default=7 * 24 * 3600)
+
+    # Fichier SQLite partagé par les caches configurés en backend "sqlite"
+    CACHE_SQLITE_PATH: str = Field(default="cache/cv_analyzer.sqlite3")
+
+    # Analyses identiques simultanées (même fichier, même offre) regroupées sur une seule
+    # exécution : "memory" (par worker), "sqlite" (aussi entre workers, verrous dans
+    # CACHE_SQLITE_PATH) ou "none"
+    COALESCE_BACKEND: str = Field(default="memory")
+    # Verrou prolongé toutes les TTL/3 tant que l'exécution dure : la TTL ne borne que la
+    # reprise du verrou d'un worker tombé, pas la durée d'une analyse
+    COALESCE_LOCK_TTL_SECONDS: float = Field(default=180.0)
+    COALESCE_POLL_INTERVAL_SECONDS: float = Field(default=0.2)
+
+    # Cache des résultats LLM par couple (CV canonique, offre) : job/keyword matching
+    RESULT_CACHE_BACKEND: str = Field(default="memory")
+    RESULT_CACHE_MAX_ENTRIES: int = Field(default=2000)
+    RESULT_CACHE_TTL_SECONDS: float = Field(default=24 * 3600)
+
+    # Store des candidats (CV canoniques + dernière analyse, SQLite/FTS5) interrogé par
+    # /candidates ; contient des données personnelles, donc désactivé par défaut :
+    # chemin du fichier SQLite pour l'activer (ex. "cache/candidates.sqlite3"), vide = rien n'est conservé
+    CANDIDATE_STORE_PATH: str | None = Field(default=None)
+
+    # Extraction PDF/DOCX hors event loop : "process" (défaut) ou "thread"
+    EXTRACTION_EXECUTOR: str = Field(default="process")
+    EXTRACTION_MAX_WORKERS: int = Field(default=0)  # 0 = nombre de CPU
+    EXTRACTION_TIMEOUT_SECONDS: float = Field(default=30.0)
+    EXTRACTION_MAX_MEMORY_MB: int = Field(default=1024)  # par worker, 0 = illimité
+    # Pages d'un PDF par tâche du pool de processus (long PDF extrait en parallèle)
+    EXTRACTION_PAGES_PER_TASK: int = Field(default=4)
+    # Tri avant tout appel LLM : score = part de caractères lisibles x densité (caractères
+    # par page / EXTRACTION_MIN_CHARS) ; sous EXTRACTION_TRIAGE_MIN_SCORE, le document
+    # (scan sans texte, vide, encodage cassé) n'est pas analysé. 0 = tri désactivé
+    EXTRACTION_MIN_CHARS: int = Field(default=200)
+    EXTRACTION_TRIAGE_MIN_SCORE: float = Field(default=0.2)
+
+    # Analyse en lot (/batch/analyze et python -m app.batch)
+    BATCH_MAX_CONCURRENCY: int = Field(default=8)
+    BATCH_MAX_FILES: int = Field(default=1000)
+    BATCH_MAX_ARCHIVE_MB: int = Field(default=200)
+
+    # Lots via l'API Batch (python -m app.batch --batch-api) : "openai" (Files + Batches,
+    # coût réduit, réponses sous 24 h) ou "local" (simulateur sur fichiers qui rejoue le
+    # fournisseur configuré). Un lot part après BATCH_API_FLUSH_SECONDS sans nouvel appel.
+    # BATCH_API_DIR garde les fichiers JSONL : ils contiennent des données personnelles
+    BATCH_API_BACKEND: str = Field(default="openai")
+    BATCH_API_DIR: str = Field(default="cache/batches")
+    BATCH_API_MAX_REQUESTS: int = Field(default=50000)  # par lot (limite OpenAI)
+    BATCH_API_FLUSH_SECONDS: float = Field(default=2.0)
+    BATCH_API_POLL_SECONDS: float = Field(default=30.0)
+
+    # Jobs asynchrones (/jobs/...) : pool de workers et file bornée, propres à chaque processus ;
+    # avec plusieurs workers uvicorn, seul le stockage "sqlite" rend un job visible de tous
+    JOBS_WORKERS: int = Field(default=4)
+    JOBS_QUEUE_SIZE: int = Field(default=100)
+    JOBS_TTL_SECONDS: float = Field(default=3600)  # rétention des jobs terminés
+    JOBS_STORE_BACKEND: str = Field(default="memory")  # "memory" ou "sqlite"
+    JOBS_SQLITE_PATH: str = Field(default="cache/jobs.sqlite3")
+    # Bail d'un job non terminé (stockage "sqlite"), prolongé par son processus tant qu'il vit ;
+    # expiré = processus disparu (crash, kill), le job passe en échec
+    JOBS_LEASE_SECONDS: float = Field(default=60)
+
+    # Endpoint Prometheus /metrics (hors préfixe /api/v1, sans authentification) : à n'activer
+    # que s'il n'est pas exposé publiquement (réseau interne, reverse proxy)
+    METRICS_ENABLED: bool = Field(default=False)
     
     # CORS: liste d'origines autorisées séparées par des virgules
     # Exemple: "https://example.com,https://preview.example.com"
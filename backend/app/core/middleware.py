@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import (
+    HTTP_DURATION,
+    HTTP_REQUESTS,
+    RequestTimings,
+    current_request,
+    log_event,
+)
+
+
+def route_label(scope: Scope) -> str:
+    """
+    Gabarit de la route (ex. "/api/v1/candidates/{candidate_id}") : borne la
+    cardinalité des métriques. Pour un routeur inclus avec un préfixe,
+    `route.path` est relatif au routeur : le préfixe d'inclusion est ajouté.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if not path:
+        return "unmatched"
+    included = (scope.get("fastapi") or {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "") or ""
+    return prefix + path
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware ASGI (sans BaseHTTPMiddleware, pour ne pas bufferiser les
+    réponses en streaming) : request id, métriques HTTP, en-tête Server-Timing
+    et une ligne de log structurée par requête.
+
+    Pour les réponses en streaming (SSE, JSON Lines), Server-Timing ne couvre
+    que ce qui est terminé à l'envoi des en-têtes ; la ligne de log finale a
+    les durées complètes.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex[:16]
+        timings = RequestTimings(request_id)
+        token = current_request.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("Server-Timing", timings.server_timing(total=time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            duration = time.perf_counter() - start
+            route_path = route_label(scope)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route_path, status=str(status))
+            HTTP_DURATION.observe(duration, method=scope["method"], route=route_path)
+            log_event(
+                "request",
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=round(duration * 1000, 1),
+                spans_ms={name: round(d * 1000, 1) for name, d in timings.spans.items()},
+                tokens=timings.tokens,
+                cache_hits=timings.cache_hits,
+                llm_retries=timings.llm_retries,
+            )
+            current_request.reset(token)
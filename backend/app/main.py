@@ -1,9 +1,28 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .api import router
 from .core.config import settings
+from .core.middleware import InstrumentationMiddleware
+from .services.extract_text import shutdown_extraction_executor
+from .services.jobs import job_manager
+from .services.llm import close_llm_client
+from .services.metrics import render_metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    # Libère le pool de connexions HTTP partagé vers OpenAI
+    await close_llm_client()
+    shutdown_extraction_executor()
 
-app = FastAPI(title="CV Analyzer", version="0.1.0")
+
+app = FastAPI(title="CV Analyzer", version="0.1.0", lifespan=lifespan)
 
 # Configuration CORS depuis variable d'environnement
 cors_origins = [
@@ -16,9 +35,12 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
     allow_credentials=True,
-    allow_methods=["POST", "GET"],
+    allow_methods=["POST", "GET", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+# Ajouté en dernier : englobe CORS et mesure la requête complète
+app.add_middleware(InstrumentationMiddleware)
 
 app.include_router(router, prefix="/api/v1")
 
@@ -27,3 +49,11 @@ app.include_router(router, prefix="/api/v1")
 def health():
     """Endpoint de santé pour vérifier que le backend est accessible."""
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métriques Prometheus du processus (requêtes, étapes, appels LLM, caches), si METRICS_ENABLED."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from app.models.cv import CVAnalysisResponse, CVCanonical
+
+
+class CandidateFilters(BaseModel):
+    q: Optional[str] = None  # recherche plein texte (nom, titre, résumé, expériences, compétences)
+    skills: List[str] = Field(default_factory=list)  # toutes requises (synonymes reconnus)
+    location: Optional[str] = None  # préfixe, sans accents ni casse ("lyon" -> "Lyon 3e")
+    min_years: Optional[float] = None
+    max_years: Optional[float] = None
+    min_ats: Optional[int] = None
+    max_ats: Optional[int] = None
+
+
+class CandidateSummary(BaseModel):
+    candidate_id: str
+    filename: str = ""
+    full_name: Optional[str] = None
+    headline: Optional[str] = None
+    location: Optional[str] = None
+    years_experience: float = 0.0
+    skills: List[str] = Field(default_factory=list)
+    ats_score: Optional[int] = None
+    job_matching_score: Optional[int] = None
+    created_at: float
+    updated_at: float
+    similarity: Optional[float] = None  # renseigné par la présélection sur une offre
+
+
+class CandidateRecord(CandidateSummary):
+    canonical: CVCanonical
+    analysis: Optional[CVAnalysisResponse] = None
+    job_description: Optional[str] = None
+
+
+class CandidateSearchResult(BaseModel):
+    total: int = 0
+    candidates: List[CandidateSummary] = Field(default_factory=list)
@@ -109,6 +109,7 @@ class KeywordMatching(BaseModel):
     keywords: List[KeywordMatch] = Field(default_factory=list)
     coverage_score: int = 0
     critical_missing: List[str] = Field(default_factory=list)
+    from_cache: bool = False
 
 
 class JobMatching(BaseModel):
@@ -120,6 +121,25 @@ class JobMatching(BaseModel):
     strengths: List[str] = Field(default_factory=list)
     recommendations: List[str] = Field(default_factory=list)
     keyword_matching: Optional[KeywordMatching] = None
+    from_cache: bool = False
+
+
+class JobProfileKeyword(BaseModel):
+    keyword: str = ""
+    category: KeywordCategory = KeywordCategory.OTHER
+    importance: int = 3
+    required: bool = False
+
+
+class JobProfile(BaseModel):
+    """Offre compilée une fois (exigences pondérées), réutilisée pour chaque CV évalué."""
+    title: Optional[str] = None
+    seniority: Optional[str] = None
+    min_years_experience: Optional[float] = None
+    education: List[str] = Field(default_factory=list)
+    languages: List[str] = Field(default_factory=list)
+    responsibilities: List[str] = Field(default_factory=list)
+    keywords: List[JobProfileKeyword] = Field(default_factory=list)
 
 
 class ComparisonCriterion(BaseModel):
@@ -150,6 +170,7 @@ class CVComparisonResult(BaseModel):
     overall_ranking: List[str] = Field(default_factory=list)
     criteria_comparison: List[ComparisonCriterion] = Field(default_factory=list)
     summary: str = ""
+    warnings: List[str] = Field(default_factory=list)
 
 
 class CVAnalysisResponse(BaseModel):
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import Optional, Union
+from pydantic import BaseModel
+
+from app.models.cv import CVAnalysisResponse, CVComparisonResult
+
+
+class JobKind(str, Enum):
+    ANALYZE = "analyze"
+    COMPARE = "compare"
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    kind: JobKind
+    status: JobStatus = JobStatus.QUEUED
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Union[CVAnalysisResponse, CVComparisonResult]] = None
+    error: Optional[str] = None
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
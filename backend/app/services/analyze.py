@@ -1,31 +1,395 @@
 from __future__ import annotations
 
-from app.models.cv import CvAnalysisResponse, CVCanonical, JobMatching
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from app.core.config import settings
+from app.models.cv import (
+    CvAnalysisResponse,
+    CVCanonical,
+    ATSAssessment,
+    ATSSubScores,
+    CVInsights,
+    JobMatching,
+    KeywordMatching,
+)
+from app.services.cache import cache_key, canonical_cache, normalize_job_description
+from app.services.candidates import remember_candidate
+from app.services.coalesce import SingleFlight, make_flight_store
+from app.services.extract_text import UnreadableDocumentError, extract_document_async
 from app.services.llm import (
+    CANONICALIZE_PROMPT_VERSION,
     llm_canonicalize,
+    llm_canonicalize_with_status,
     llm_ats_and_insights,
+    llm_fused_analysis,
     llm_job_matching,
-    llm_keyword_matching,
 )
-from app.services.scoring import fallback_scoring_if_needed
+from app.services.keywords import local_keyword_matching, match_keywords
+from app.services.metrics import timed
+from app.services.pipeline import Stage, StageOutcome, run_stages
+from app.services.providers import model_for
+from app.services.scoring import fallback_scoring_if_needed, is_canonical_empty
+from app.services.uploads import UploadedDocument
+
+
+def _canonical_cache_key(kind: str, content: str | bytes) -> str:
+    return cache_key(
+        kind, content, CANONICALIZE_PROMPT_VERSION, settings.CANONICALIZE_MODE, model_for("canonicalize")
+    )
+
+
+async def canonicalize_document(
+    document: UploadedDocument,
+    on_extracted: Callable[[list[str]], Any] | None = None,
+) -> CVCanonical:
+    """
+    Extraction du texte puis structuration canonique d'un CV, avec cache.
+
+    Le cache est consulté d'abord sur le hash du fichier brut, calculé à la
+    réception (évite aussi
+    l'extraction), puis sur le hash du texte extrait (même CV ré-exporté).
+    Les résultats vides (erreur LLM, clé absente) ou partiels (section en
+    erreur) ne sont jamais mis en cache : le prochain envoi réessaie.
+    Un document écarté par le tri d'extraction lève UnreadableDocumentError.
+
+    `on_extracted` reçoit les avertissements d'extraction dès qu'ils sont
+    connus (ceux mémorisés avec le CV en cas de hit sur le fichier brut).
+    """
+    bytes_key = _canonical_cache_key("bytes", document.content_hash)
+    canonical = canonical_cache.get(bytes_key)
+    if canonical is not None:
+        if on_extracted is not None:
+            on_extracted(list(canonical.extraction_warnings))
+        return canonical
+
+    with timed("extract"):
+        extracted = await extract_document_async(document.data, document.filename, document.path)
+    cv_text, warnings = extracted.text, extracted.warnings
+    if on_extracted is not None:
+        on_extracted(list(warnings))
+    if extracted.quality.unreadable:
+        # Scan sans texte, document vide : écarté avant tout appel LLM
+        raise UnreadableDocumentError(warnings[0], warnings)
+
+    text_key = _canonical_cache_key("text", cv_text)
+    canonical = canonical_cache.get(text_key)
+    if canonical is None:
+        canonical, complete = await llm_canonicalize_with_status(cv_text, warnings)
+        if not complete or is_canonical_empty(canonical):
+            return fallback_scoring_if_needed(canonical)
+        canonical_cache.set(text_key, canonical)
+
+    canonical_cache.set(bytes_key, canonical)
+    return fallback_scoring_if_needed(canonical)
+
+
+def forget_canonical(content_hash: str) -> int:
+    """
+    Retire du cache le CV canonique d'un fichier (droit à l'effacement) : entrée
+    du fichier brut et entrées de même contenu (hash du texte extrait, mêmes CV
+    ré-exportés). Seules les clés de la configuration courante (prompt, mode,
+    modèle) sont retrouvées ; les autres expirent avec CANONICAL_CACHE_TTL_SECONDS.
+    """
+    return canonical_cache.forget(_canonical_cache_key("bytes", content_hash))
+
+
+# CV sans contenu exploitable (document écarté au tri, canonicalisation en échec) :
+# les étapes en aval répondent sans appel LLM
+EMPTY_CV_MESSAGE = "CV sans contenu exploitable : analyse non effectuée."
+
+
+async def _canonicalize_or_empty(canonicalize_cv: Callable[[], Awaitable[CVCanonical]]) -> CVCanonical:
+    try:
+        return await canonicalize_cv()
+    except UnreadableDocumentError as e:
+        return fallback_scoring_if_needed(CVCanonical(extraction_warnings=list(e.warnings)))
+
+
+def _empty_ats() -> tuple[ATSAssessment, CVInsights]:
+    subscores = ATSSubScores(**dict.fromkeys(ATSSubScores.model_fields, 0))
+    return ATSAssessment(total_score=0, subscores=subscores, issues=[EMPTY_CV_MESSAGE]), CVInsights()
+
+
+def build_analysis_stages(
+    canonicalize_cv: Callable[[], Awaitable[CVCanonical]],
+    job_description: str | None = None,
+    stage_timeouts: bool = True,
+) -> list[Stage]:
+    """
+    Graphe d'étapes de l'analyse : la canonicalisation d'abord, puis ATS,
+    matching offre et matching mots-clés en parallèle (ils ne dépendent que
+    du CV canonique).
+
+    En ANALYSIS_MODE="fused" avec une offre, une étape "fused" fait un seul
+    appel LLM et les étapes ats, job_matching et keyword_matching en
+    répartissent le résultat (mêmes noms, mêmes événements SSE).
+
+    Un CV vide (document écarté au tri d'extraction) ne déclenche aucun appel
+    LLM après la canonicalisation.
+
+    `stage_timeouts=False` lève les délais par étape (lot via l'API Batch, dont
+    les réponses arrivent en minutes ou en heures).
+    """
+    timeout = settings.LLM_STAGE_TIMEOUT_SECONDS if stage_timeouts else None
+
+    if job_description and settings.ANALYSIS_MODE.lower() == "fused":
+        return _build_fused_stages(canonicalize_cv, job_description, timeout)
+
+    async def canonicalize(_deps) -> CVCanonical:
+        return await _canonicalize_or_empty(canonicalize_cv)
+
+    async def ats(deps) -> tuple[ATSAssessment, CVInsights]:
+        if is_canonical_empty(deps["canonicalize"]):
+            return _empty_ats()
+        return await llm_ats_and_insights(deps["canonicalize"])
+
+    stages = [
+        Stage("canonicalize", canonicalize, timeout=timeout),
+        Stage(
+            "ats",
+            ats,
+            depends_on=("canonicalize",),
+            timeout=timeout,
+            fallback=lambda error: (ATSAssessment(issues=[error]), CVInsights()),
+        ),
+    ]
+
+    if job_description:
+        async def job_matching(deps) -> JobMatching:
+            if is_canonical_empty(deps["canonicalize"]):
+                return JobMatching(missing_requirements=[EMPTY_CV_MESSAGE])
+            return await llm_job_matching(deps["canonicalize"], job_description)
+
+        async def keyword_matching(deps) -> KeywordMatching:
+            if is_canonical_empty(deps["canonicalize"]):
+                return local_keyword_matching(deps["canonicalize"], job_description)
+            return await match_keywords(deps["canonicalize"], job_description)
+
+        stages += [
+            Stage(
+                "job_matching",
+                job_matching,
+                depends_on=("canonicalize",),
+                timeout=timeout,
+                fallback=lambda error: JobMatching(missing_requirements=[error]),
+            ),
+            Stage(
+                "keyword_matching",
+                keyword_matching,
+                depends_on=("canonicalize",),
+                timeout=timeout,
+                fallback=lambda error: KeywordMatching(critical_missing=[error]),
+            ),
+        ]
+
+    return stages
+
+
+def _build_fused_stages(
+    canonicalize_cv: Callable[[], Awaitable[CVCanonical]],
+    job_description: str,
+    timeout: float | None,
+) -> list[Stage]:
+    # Les mots-clés ne passent par l'appel fusionné qu'en mode "llm" ; sinon le
+    # moteur local ("fast" / "hybrid") tourne en parallèle comme d'habitude
+    keywords_in_fused = settings.KEYWORD_MATCHING_MODE.lower() == "llm"
+
+    async def canonicalize(_deps) -> CVCanonical:
+        return await _canonicalize_or_empty(canonicalize_cv)
 
+    async def fused(deps):
+        canonical = deps["canonicalize"]
+        if is_canonical_empty(canonical):
+            keyword_matching = local_keyword_matching(canonical, job_description) if keywords_in_fused else None
+            return (*_empty_ats(), JobMatching(missing_requirements=[EMPTY_CV_MESSAGE]), keyword_matching)
+        return await llm_fused_analysis(canonical, job_description, include_keywords=keywords_in_fused)
 
-def analyze_cv(
+    def fused_fallback(error: str):
+        keyword_matching = KeywordMatching(critical_missing=[error]) if keywords_in_fused else None
+        return ATSAssessment(issues=[error]), CVInsights(), JobMatching(missing_requirements=[error]), keyword_matching
+
+    async def ats(deps) -> tuple[ATSAssessment, CVInsights]:
+        return deps["fused"][0], deps["fused"][1]
+
+    async def job_matching(deps) -> JobMatching:
+        return deps["fused"][2]
+
+    async def keyword_matching(deps) -> KeywordMatching:
+        if keywords_in_fused:
+            return deps["fused"][3]
+        if is_canonical_empty(deps["canonicalize"]):
+            return local_keyword_matching(deps["canonicalize"], job_description)
+        return await match_keywords(deps["canonicalize"], job_description)
+
+    return [
+        Stage("canonicalize", canonicalize, timeout=timeout),
+        Stage("fused", fused, depends_on=("canonicalize",), timeout=timeout, fallback=fused_fallback),
+        Stage("ats", ats, depends_on=("fused",)),
+        Stage("job_matching", job_matching, depends_on=("fused",)),
+        Stage(
+            "keyword_matching",
+            keyword_matching,
+            depends_on=("fused",) if keywords_in_fused else ("canonicalize",),
+            timeout=timeout,
+            fallback=lambda error: KeywordMatching(critical_missing=[error]),
+        ),
+    ]
+
+
+async def analyze_cv(
     cv_text: str,
     extraction_warnings: list[str],
     job_description: str | None = None,
 ) -> CvAnalysisResponse:
-    canonical: CVCanonical = llm_canonicalize(cv_text, extraction_warnings)
-    canonical = fallback_scoring_if_needed(canonical)
+    """Analyse complète à partir d'un texte de CV déjà extrait."""
+
+    async def canonicalize() -> CVCanonical:
+        canonical = await llm_canonicalize(cv_text, extraction_warnings)
+        return fallback_scoring_if_needed(canonical)
+
+    return await _run_analysis(canonicalize, job_description)
+
+
+# Analyses identiques en cours (même fichier, même offre) : une seule exécution partagée
+analysis_flights: SingleFlight[CvAnalysisResponse] = SingleFlight(
+    "analysis", CvAnalysisResponse, make_flight_store(settings.COALESCE_BACKEND)
+)
+
+
+async def analyze_document(
+    document: UploadedDocument,
+    job_description: str | None = None,
+    stage_timeouts: bool = True,
+) -> CvAnalysisResponse:
+    """
+    Analyse complète d'un fichier CV (extraction + canonicalisation en cache),
+    conservée dans le store des candidats.
+
+    Les appels simultanés pour un même fichier et une même offre (double clic,
+    plusieurs recruteurs) attendent une seule exécution et en reçoivent chacun
+    une copie (COALESCE_BACKEND). L'exécution partagée garde le document ouvert
+    jusqu'à sa fin, même si la requête qui l'a lancée se termine avant.
+    """
+    if settings.COALESCE_BACKEND.lower() == "none":
+        return await _analyze_document(document, job_description, stage_timeouts)
+    key = cache_key(
+        "analysis",
+        document.content_hash,
+        normalize_job_description(job_description or ""),
+        settings.ANALYSIS_MODE,
+        f"timeouts={stage_timeouts}",
+    )
+    document.retain()
+    return await analysis_flights.run(
+        key,
+        lambda: _analyze_document(document, job_description, stage_timeouts),
+        on_finish=document.close,
+    )
+
+
+async def _analyze_document(
+    document: UploadedDocument,
+    job_description: str | None,
+    stage_timeouts: bool = True,
+) -> CvAnalysisResponse:
+    response = await _run_analysis(
+        lambda: canonicalize_document(document),
+        job_description,
+        stage_timeouts=stage_timeouts,
+    )
+    # Écriture SQLite hors event loop
+    await asyncio.to_thread(
+        remember_candidate, document.content_hash, document.filename, response.canonical, response, job_description
+    )
+    return response
+
+
+# Nom d'événement émis pour chaque étape du pipeline (streaming SSE)
+STAGE_EVENTS = {
+    "canonicalize": "canonical",
+    "ats": "ats",
+    "job_matching": "job_matching",
+    "keyword_matching": "keyword_matching",
+}
+
+
+def _stage_payload(outcome: StageOutcome) -> dict:
+    if outcome.name == "ats":
+        ats, insights = outcome.value
+        payload = {"ats": ats.model_dump(mode="json"), "insights": insights.model_dump(mode="json")}
+    else:
+        payload = outcome.value.model_dump(mode="json")
+    if outcome.error:
+        payload = {**payload, "stage_error": outcome.error}
+    return payload
+
+
+async def analyze_document_events(
+    document: UploadedDocument,
+    job_description: str | None = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Analyse d'un fichier CV émettant (événement, données) au fil des étapes :
+    extraction, canonical, ats, job_matching, keyword_matching, puis result
+    (identique à CVAnalysisResponse) ou error.
+    """
+    queue: asyncio.Queue[tuple[str, dict] | None] = asyncio.Queue()
+
+    def emit_extraction(warnings: list[str]) -> None:
+        queue.put_nowait(("extraction", {"warnings": warnings}))
+
+    def emit_stage(outcome: StageOutcome) -> None:
+        # Étapes internes (ex. "fused") : leurs résultats sont émis par les étapes qui les répartissent
+        if outcome.name in STAGE_EVENTS:
+            queue.put_nowait((STAGE_EVENTS[outcome.name], _stage_payload(outcome)))
+
+    async def run() -> None:
+        try:
+            response = await _run_analysis(
+                lambda: canonicalize_document(document, on_extracted=emit_extraction),
+                job_description,
+                on_stage_done=emit_stage,
+            )
+            await asyncio.to_thread(
+                remember_candidate,
+                document.content_hash, document.filename, response.canonical, response, job_description,
+            )
+            queue.put_nowait(("result", response.model_dump(mode="json")))
+        except Exception as e:
+            queue.put_nowait(("error", {"detail": f"Erreur lors de l'analyse: {str(e)}"}))
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (item := await queue.get()) is not None:
+            yield item
+    finally:
+        # Client déconnecté : inutile de poursuivre les appels LLM
+        if not task.done():
+            task.cancel()
+
+
+async def _run_analysis(
+    canonicalize_cv: Callable[[], Awaitable[CVCanonical]],
+    job_description: str | None,
+    on_stage_done: Callable[[StageOutcome], Any] | None = None,
+    stage_timeouts: bool = True,
+) -> CvAnalysisResponse:
+    result = await run_stages(
+        build_analysis_stages(canonicalize_cv, job_description, stage_timeouts),
+        on_stage_done=on_stage_done,
+    )
 
-    ats, insights = llm_ats_and_insights(canonical)
+    canonical: CVCanonical = result.value("canonicalize")
+    ats, insights = result.value("ats")
 
     job_matching: JobMatching | None = None
     if job_description:
-        job_matching = llm_job_matching(canonical, job_description)
-        keyword_matching = llm_keyword_matching(canonical, job_description)
+        job_matching = result.value("job_matching")
         if job_matching is not None:
-            job_matching.keyword_matching = keyword_matching
+            job_matching.keyword_matching = result.value("keyword_matching")
 
     return CvAnalysisResponse(
         canonical=canonical,
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import os
+import zipfile
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator
+
+from app.core.config import settings
+from app.services.analyze import analyze_document
+from app.services.uploads import UploadedDocument, UploadRejectedError, spool_stream
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc")
+
+
+class BatchInputError(ValueError):
+    """Archive ou fichier de lot invalide."""
+
+
+def _is_supported(filename: str) -> bool:
+    name = os.path.basename(filename)
+    return name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith(("~$", "."))
+
+
+class ZipBatch:
+    """
+    CV contenus dans une archive ZIP (PDF/DOCX uniquement). L'archive est ouverte
+    sans rien décompresser : le nombre de CV (`len`) vient du répertoire central
+    et se vérifie avant toute décompression ; les entrées sont décompressées à
+    l'itération, une à une, tailles déclarées vérifiées d'abord (zip bomb).
+    """
+
+    def __init__(self, archive: bytes | BinaryIO):
+        try:
+            self._zf = zipfile.ZipFile(io.BytesIO(archive) if isinstance(archive, bytes) else archive)
+        except zipfile.BadZipFile as e:
+            raise BatchInputError(f"Archive ZIP invalide: {e}")
+        self.entries = [
+            info for info in self._zf.infolist()
+            if not info.is_dir() and "__MACOSX" not in info.filename and _is_supported(info.filename)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[UploadedDocument]:
+        return _iter_zip_entries(self._zf, self.entries)
+
+    def close(self) -> None:
+        self._zf.close()
+
+
+def _iter_zip_entries(zf: zipfile.ZipFile, entries: list[zipfile.ZipInfo]) -> Iterator[UploadedDocument]:
+    max_file = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    with zf:
+        for info in entries:
+            if info.file_size > max_file:
+                logger.warning(f"{info.filename} ignoré (trop volumineux)")
+                continue
+            with zf.open(info) as entry:
+                try:
+                    document = spool_stream(entry, info.filename, max_file)
+                except UploadRejectedError as e:
+                    logger.warning(f"{info.filename} ignoré ({e})")
+                    continue
+            yield document
+
+
+def iter_directory_documents(directory: str) -> Iterable[UploadedDocument]:
+    """CV d'un répertoire (récursif), transmis par chemin à l'extraction."""
+    max_file = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    for root, _dirs, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if not _is_supported(name):
+                continue
+            if os.path.getsize(path) > max_file:
+                logger.warning(f"{path} ignoré (trop volumineux)")
+                continue
+            yield UploadedDocument.from_path(os.path.relpath(path, directory), path)
+
+
+async def run_batch(
+    documents: Iterable[UploadedDocument],
+    job_description: str | None = None,
+    concurrency: int | None = None,
+    skip_hashes: set[str] | None = None,
+    stage_timeouts: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Analyse un lot de CV avec au plus `concurrency` analyses en vol et
+    produit un enregistrement par document dès qu'il est terminé (JSON Lines).
+
+    Les documents dont le hash figure dans `skip_hashes` (déjà traités lors
+    d'une exécution précédente) sont signalés sans être ré-analysés ; les
+    doublons au sein du lot ne sont analysés qu'une fois. `stage_timeouts=False`
+    pour un lot via l'API Batch (voir services/batch_api.py).
+
+    `documents` est parcouru à la demande, hors event loop (décompression d'une
+    archive, hash d'un fichier) : au plus `limit` documents lus à la fois.
+    """
+    limit = max(1, concurrency or settings.BATCH_MAX_CONCURRENCY)
+    seen = set(skip_hashes or ())
+    semaphore = asyncio.Semaphore(limit)
+    results: asyncio.Queue[dict | None] = asyncio.Queue()
+    pending: set[asyncio.Task] = set()
+
+    async def analyze(doc: UploadedDocument, content_hash: str) -> None:
+        record = {"content_hash": content_hash, "filename": doc.filename}
+        try:
+            response = await analyze_document(doc, job_description, stage_timeouts=stage_timeouts)
+            record.update(status="ok", result=response.model_dump(mode="json"))
+        except Exception as e:
+            logger.warning(f"Lot: échec de l'analyse de {doc.filename}: {e}")
+            record.update(status="error", error=str(e)[:500])
+        finally:
+            doc.close()
+            semaphore.release()
+        await results.put(record)
+
+    async def feed() -> None:
+        # Les documents sont lus au fur et à mesure : au plus `limit` en mémoire
+        iterator = iter(documents)
+        try:
+            while (doc := await asyncio.to_thread(next, iterator, None)) is not None:
+                content_hash = doc.content_hash
+                if content_hash in seen:
+                    doc.close()
+                    await results.put({"content_hash": content_hash, "filename": doc.filename, "status": "skipped"})
+                    continue
+                seen.add(content_hash)
+                await semaphore.acquire()
+                task = asyncio.create_task(analyze(doc, content_hash))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*list(pending), return_exceptions=True)
+        except Exception as e:
+            await results.put({"status": "error", "error": f"Lecture du lot interrompue: {str(e)[:500]}"})
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # Lot abandonné (client parti) : archive refermée, entrées restantes jamais lues
+                try:
+                    await asyncio.to_thread(close)
+                except ValueError:
+                    pass  # lecture encore en cours dans son thread : l'archive sera refermée par l'appelant
+            await results.put(None)
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while (record := await results.get()) is not None:
+            yield record
+    finally:
+        feeder.cancel()
+        for task in list(pending):
+            task.cancel()
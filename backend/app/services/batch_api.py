@@ -0,0 +1,419 @@
+"""
+Exécution des appels LLM en lot via l'API Batch d'OpenAI (coût réduit de moitié,
+réponses sous 24 h), pour les re-calculs de nuit sur tout un vivier de CV.
+
+Les fonctions de llm.py ne changent pas : pendant une session de lot, leurs
+appels passent par un BatchingProvider qui les accumule, écrit un fichier JSONL
+par modèle, le soumet, attend la fin du lot puis rend à chaque appel sa réponse
+(parsée ensuite en CVCanonical, JobMatching... comme en temps réel).
+Les requêtes interactives gardent le fournisseur normal.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Protocol
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services import llm
+from app.services.providers import LLMProvider, LLMResponse, chat_request_body
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Statuts finaux d'un lot (API Batch)
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Limite de taille d'un fichier d'entrée (200 Mo côté OpenAI), avec une marge
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+
+
+class BatchRequestError(RuntimeError):
+    """Requête d'un lot sans réponse exploitable (erreur, lot échoué ou expiré)."""
+
+
+@dataclass
+class BatchState:
+    batch_id: str
+    status: str
+    output_file: str | None = None  # identifiant (OpenAI) ou chemin (simulateur)
+    error_file: str | None = None
+    completed: int = 0
+    failed: int = 0
+    total: int = 0
+
+
+class BatchBackend(Protocol):
+    async def submit(self, input_path: str, description: str) -> str: ...
+
+    async def retrieve(self, batch_id: str) -> BatchState: ...
+
+    async def results(self, state: BatchState) -> list[dict]: ...
+
+    async def close(self) -> None: ...
+
+
+def _read_jsonl(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# =========================
+# API Batch d'OpenAI (Files + Batches)
+# =========================
+
+class OpenAIBatchBackend:
+    def __init__(self, api_key: str, base_url: str | None = None):
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=settings.OPENAI_TIMEOUT_SECONDS)
+
+    async def submit(self, input_path: str, description: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata={"description": description},
+        )
+        return batch.id
+
+    async def retrieve(self, batch_id: str) -> BatchState:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchState(
+            batch_id=batch.id,
+            status=batch.status,
+            output_file=batch.output_file_id,
+            error_file=batch.error_file_id,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+            total=counts.total if counts else 0,
+        )
+
+    async def results(self, state: BatchState) -> list[dict]:
+        lines: list[dict] = []
+        for file_id in (state.output_file, state.error_file):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines += _read_jsonl(content.text)
+        return lines
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# =========================
+# Simulateur local (fichiers), pour les tests et la CI
+# =========================
+
+class LocalBatchBackend:
+    """
+    Simulateur de l'API Batch sur disque : `<directory>/<batch_id>/` contient
+    input.jsonl, batch.json (statut), output.jsonl et errors.jsonl au format
+    d'OpenAI. Chaque ligne est exécutée par `inner` (fournisseur configuré :
+    fixtures, serveur factice, endpoint compatible). Un lot interrompu reprend
+    au prochain retrieve.
+    """
+
+    def __init__(self, directory: str, inner: LLMProvider, concurrency: int = 8):
+        self.directory = directory
+        self.inner = inner
+        self.concurrency = max(1, concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.directory, batch_id, name)
+
+    def _write_state(self, state: BatchState) -> None:
+        path = self._path(state.batch_id, "batch.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state.__dict__, f)
+        os.replace(path + ".tmp", path)
+
+    async def submit(self, input_path: str, description: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        shutil.copyfile(input_path, self._path(batch_id, "input.jsonl"))
+        self._write_state(BatchState(batch_id=batch_id, status="validating"))
+        self._start(batch_id)
+        return batch_id
+
+    def _start(self, batch_id: str) -> None:
+        task = asyncio.ensure_future(self._process(batch_id))
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch_id, None))
+
+    async def _answer(self, line: dict) -> dict:
+        custom_id = line["custom_id"]
+        body = line["body"]
+        response_format = body.get("response_format") or {}
+        stage = custom_id.rsplit("-", 1)[0]
+        try:
+            response = await self.inner.complete(
+                stage,
+                body["model"],
+                body["messages"],
+                json_mode=bool(response_format),
+                temperature=body.get("temperature"),
+                json_schema=response_format.get("json_schema"),
+            )
+        except Exception as e:
+            return {
+                "id": f"batch_req_{uuid.uuid4().hex[:16]}", "custom_id": custom_id, "response": None,
+                "error": {"code": type(e).__name__, "message": str(e)[:500]},
+            }
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+            "custom_id": custom_id,
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "object": "chat.completion",
+                    "model": response.model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": response.content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": response.prompt_tokens,
+                        "completion_tokens": response.completion_tokens,
+                        "total_tokens": response.prompt_tokens + response.completion_tokens,
+                    },
+                },
+            },
+            "error": None,
+        }
+
+    async def _process(self, batch_id: str) -> None:
+        with open(self._path(batch_id, "input.jsonl"), encoding="utf-8") as f:
+            lines = _read_jsonl(f.read())
+        state = BatchState(batch_id=batch_id, status="in_progress", total=len(lines))
+        self._write_state(state)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def answer(line: dict) -> dict:
+            async with semaphore:
+                return await self._answer(line)
+
+        try:
+            answers = await asyncio.gather(*(answer(line) for line in lines))
+        except Exception as e:
+            logger.warning(f"Lot local {batch_id} en échec: {e}")
+            state.status = "failed"
+            self._write_state(state)
+            return
+
+        output = [a for a in answers if a["error"] is None]
+        errors = [a for a in answers if a["error"] is not None]
+        for name, records in (("output.jsonl", output), ("errors.jsonl", errors)):
+            with open(self._path(batch_id, name), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        state.status = "completed"
+        state.output_file = self._path(batch_id, "output.jsonl")
+        state.error_file = self._path(batch_id, "errors.jsonl")
+        state.completed, state.failed = len(output), len(errors)
+        self._write_state(state)
+
+    async def retrieve(self, batch_id: str) -> BatchState:
+        with open(self._path(batch_id, "batch.json"), encoding="utf-8") as f:
+            state = BatchState(**json.load(f))
+        if state.status not in TERMINAL_STATUSES and batch_id not in self._tasks:
+            self._start(batch_id)
+        return state
+
+    async def results(self, state: BatchState) -> list[dict]:
+        lines: list[dict] = []
+        for path in (state.output_file, state.error_file):
+            if path and os.path.isfile(path):
+                with open(path, encoding="utf-8") as f:
+                    lines += _read_jsonl(f.read())
+        return lines
+
+    async def close(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+
+# =========================
+# Fournisseur qui regroupe les appels en lots
+# =========================
+
+@dataclass
+class _PendingRequest:
+    custom_id: str
+    body: dict
+    future: asyncio.Future
+    size: int
+
+
+class BatchingProvider:
+    """
+    Fournisseur LLM qui accumule les appels et les envoie en lot : un lot part
+    après `flush_seconds` sans nouvel appel (toutes les canonicalisations d'un
+    vivier, puis toutes les étapes suivantes) ou dès `max_requests` appels.
+    Une requête par ligne JSONL, un lot par modèle (exigence de l'API Batch).
+    """
+
+    name = "batch"
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        directory: str,
+        max_requests: int = 50000,
+        flush_seconds: float = 2.0,
+        poll_seconds: float = 30.0,
+    ):
+        self.backend = backend
+        self.directory = directory
+        self.max_requests = max(1, max_requests)
+        self.flush_seconds = flush_seconds
+        self.poll_seconds = poll_seconds
+        self.submitted = 0  # lots envoyés
+        self._pending: dict[str, list[_PendingRequest]] = {}
+        self._sequence = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._batches: set[asyncio.Task] = set()
+        os.makedirs(directory, exist_ok=True)
+
+    async def complete(self, stage, model, messages, json_mode=True, temperature=None, json_schema=None) -> LLMResponse:
+        self._sequence += 1
+        body = chat_request_body(model, messages, json_mode, temperature, json_schema)
+        request = _PendingRequest(
+            custom_id=f"{stage}-{self._sequence:07d}",
+            body=body,
+            future=asyncio.get_running_loop().create_future(),
+            size=len(json.dumps(body, ensure_ascii=False).encode("utf-8")),
+        )
+        queue = self._pending.setdefault(model, [])
+        queue.append(request)
+        if len(queue) >= self.max_requests or sum(r.size for r in queue) >= MAX_BATCH_FILE_BYTES:
+            self._flush_model(model)
+        else:
+            # Regroupement : le lot part après flush_seconds sans nouvel appel
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self.flush)
+        return await request.future
+
+    def flush(self) -> None:
+        self._timer = None
+        for model in list(self._pending):
+            self._flush_model(model)
+
+    def _flush_model(self, model: str) -> None:
+        requests = self._pending.pop(model, [])
+        if not requests:
+            return
+        task = asyncio.ensure_future(self._run_batch(model, requests))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, model: str, requests: list[_PendingRequest]) -> None:
+        self.submitted += 1
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}-input.jsonl")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for request in requests:
+                    line = {"custom_id": request.custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": request.body}
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            batch_id = await self.backend.submit(path, f"cv-analyzer: {len(requests)} requêtes {model}")
+            logger.info(f"Lot {batch_id} soumis ({len(requests)} requêtes, {model})")
+
+            state = await self.backend.retrieve(batch_id)
+            while state.status not in TERMINAL_STATUSES:
+                await asyncio.sleep(self.poll_seconds)
+                state = await self.backend.retrieve(batch_id)
+            logger.info(f"Lot {batch_id} {state.status} ({state.completed} ok, {state.failed} en erreur)")
+            lines = await self.backend.results(state)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(BatchRequestError(f"Lot en échec: {e}"))
+            return
+
+        by_id = {line.get("custom_id"): line for line in lines}
+        for request in requests:
+            if request.future.done():
+                continue
+            line = by_id.get(request.custom_id)
+            try:
+                request.future.set_result(_response_from_line(line, model, state.status))
+            except BatchRequestError as e:
+                request.future.set_exception(e)
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        for task in list(self._batches):
+            task.cancel()
+        await self.backend.close()
+
+
+def _response_from_line(line: dict | None, model: str, batch_status: str) -> LLMResponse:
+    if line is None:
+        raise BatchRequestError(f"Requête sans réponse (lot {batch_status}).")
+    if line.get("error"):
+        error = line["error"]
+        raise BatchRequestError(f"Requête en erreur: {error.get('message') or error.get('code')}")
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        message = ((response.get("body") or {}).get("error") or {}).get("message")
+        raise BatchRequestError(f"Requête en erreur (HTTP {response.get('status_code')}): {message}")
+    body = response["body"]
+    choices = body.get("choices") or []
+    usage = body.get("usage") or {}
+    return LLMResponse(
+        content=choices[0]["message"].get("content") if choices else None,
+        model=body.get("model") or model,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+    )
+
+
+def make_batch_backend(kind: str) -> BatchBackend:
+    kind = (kind or "openai").lower()
+    if kind == "openai":
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("BATCH_API_BACKEND=openai nécessite OPENAI_API_KEY.")
+        return OpenAIBatchBackend(settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL)
+    if kind == "local":
+        if llm.provider is None:
+            raise ValueError("BATCH_API_BACKEND=local nécessite un fournisseur LLM configuré (LLM_PROVIDER).")
+        return LocalBatchBackend(
+            os.path.join(settings.BATCH_API_DIR, "local"), llm.provider, settings.BATCH_MAX_CONCURRENCY
+        )
+    raise ValueError(f"BATCH_API_BACKEND inconnu: {kind}")
+
+
+@asynccontextmanager
+async def batch_api_session() -> AsyncIterator[BatchingProvider]:
+    """
+    Session de lot : dans ce contexte (et les tâches qu'il crée), les appels
+    LLM passent par l'API Batch au lieu du fournisseur interactif.
+    """
+    if llm.provider is None:
+        raise ValueError("Aucun fournisseur LLM configuré (OPENAI_API_KEY manquant).")
+    batching = BatchingProvider(
+        make_batch_backend(settings.BATCH_API_BACKEND),
+        settings.BATCH_API_DIR,
+        max_requests=settings.BATCH_API_MAX_REQUESTS,
+        flush_seconds=settings.BATCH_API_FLUSH_SECONDS,
+        poll_seconds=settings.BATCH_API_POLL_SECONDS,
+    )
+    token = llm.provider_override.set(batching)
+    try:
+        yield batching
+    finally:
+        llm.provider_override.reset(token)
+        await batching.close()
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Protocol, Type, TypeVar
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.models.cv import CVCanonical, JobMatching, JobProfile, KeywordMatching
+from app.services.metrics import record_cache_lookup
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def cache_key(*parts: str | bytes) -> str:
+    """Clé stable (SHA-256) à partir de plusieurs morceaux (texte ou octets)."""
+    h = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        # Préfixe de longueur : ("ab", "c") et ("a", "bc") ne collisionnent pas
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def normalize_job_description(job_description: str) -> str:
+    """Forme normalisée d'une offre (espaces) pour les clés de cache."""
+    return " ".join(job_description.split())
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def delete(self, key: str) -> str | None:
+        """Supprime l'entrée et renvoie sa valeur (None si absente)."""
+        ...
+
+    def delete_value(self, value: str) -> int:
+        """Supprime toutes les entrées de cette valeur ; renvoie leur nombre."""
+        ...
+
+    def clear(self) -> None: ...
+
+    def __len__(self) -> int: ...
+
+
+class NullCache:
+    """Backend désactivé : ne stocke rien."""
+
+    def get(self, key: str) -> str | None:
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def delete(self, key: str) -> str | None:
+        return None
+
+    def delete_value(self, value: str) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryLRUCache:
+    """Cache en mémoire du processus, borné en taille (LRU) avec TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float | None, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def delete_value(self, value: str) -> int:
+        with self._lock:
+            keys = [key for key, (_, stored) in self._data.items() if stored == value]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Cache persistant sur disque (SQLite), partagé entre workers et redémarrages."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float | None = None,
+        table: str = "cache",
+        max_entries: int | None = None,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, "
+                "stored_at REAL NOT NULL DEFAULT 0)"
+            )
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, stored_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time()),
+            )
+            if self.max_entries:
+                # Éviction des entrées les plus anciennes au-delà de la borne
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete(self, key: str) -> str | None:
+        with self._lock, self._conn:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    def delete_value(self, value: str) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(f"DELETE FROM {self.table} WHERE value = ?", (value,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def make_backend(
+    kind: str,
+    max_entries: int = 1000,
+    ttl_seconds: float | None = None,
+    path: str | None = None,
+    table: str = "cache",
+) -> CacheBackend:
+    kind = (kind or "none").lower()
+    if kind == "memory":
+        return MemoryLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("Chemin SQLite requis pour le backend de cache 'sqlite'.")
+        return SQLiteCache(path, ttl_seconds=ttl_seconds, table=table, max_entries=max_entries)
+    if kind == "none":
+        return NullCache()
+    raise ValueError(f"Backend de cache inconnu: {kind}")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ModelCache(Generic[M]):
+    """
+    Cache de modèles Pydantic sérialisés en JSON au-dessus d'un backend.
+    Chaque lecture renvoie une copie neuve : l'appelant peut la modifier.
+    """
+
+    def __init__(self, name: str, model: Type[M], backend: CacheBackend):
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> M | None:
+        raw = self.backend.get(key)
+        if raw is None:
+            self.stats.misses += 1
+            record_cache_lookup(self.name, hit=False)
+            return None
+        try:
+            value = self.model.model_validate_json(raw)
+        except Exception:
+            # Entrée illisible (schéma modifié) : on la traite comme absente
+            self.stats.misses += 1
+            record_cache_lookup(self.name, hit=False)
+            return None
+        self.stats.hits += 1
+        record_cache_lookup(self.name, hit=True)
+        return value
+
+    def set(self, key: str, value: M) -> None:
+        self.backend.set(key, value.model_dump_json())
+
+    def forget(self, key: str) -> int:
+        """
+        Supprime l'entrée `key` et celles de même valeur (même résultat mis en
+        cache sous une autre clé) ; renvoie le nombre d'entrées supprimées.
+        """
+        raw = self.backend.delete(key)
+        if raw is None:
+            return 0
+        return 1 + self.backend.delete_value(raw)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def describe(self) -> dict:
+        return {
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_ratio": round(self.stats.hit_ratio, 3),
+            "entries": len(self.backend),
+        }
+
+
+canonical_cache: ModelCache[CVCanonical] = ModelCache(
+    "canonical",
+    CVCanonical,
+    make_backend(
+        settings.CANONICAL_CACHE_BACKEND,
+        max_entries=settings.CANONICAL_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.CANONICAL_CACHE_TTL_SECONDS,
+        path=settings.CACHE_SQLITE_PATH,
+        table="canonical_cache",
+    ),
+)
+
+
+def _result_backend(table: str) -> CacheBackend:
+    return make_backend(
+        settings.RESULT_CACHE_BACKEND,
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        path=settings.CACHE_SQLITE_PATH,
+        table=table,
+    )
+
+
+job_matching_cache: ModelCache[JobMatching] = ModelCache(
+    "job_matching", JobMatching, _result_backend("job_matching_cache")
+)
+keyword_matching_cache: ModelCache[KeywordMatching] = ModelCache(
+    "keyword_matching", KeywordMatching, _result_backend("keyword_matching_cache")
+)
+job_profile_cache: ModelCache[JobProfile] = ModelCache(
+    "job_profile",
+    JobProfile,
+    make_backend(
+        settings.JOB_PROFILE_CACHE_BACKEND,
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        path=settings.CACHE_SQLITE_PATH,
+        table="job_profile_cache",
+    ),
+)
+
+
+def cache_stats() -> dict:
+    """Compteurs hits/misses de tous les caches applicatifs."""
+    caches = (canonical_cache, job_matching_cache, keyword_matching_cache, job_profile_cache)
+    return {cache.name: cache.describe() for cache in caches}
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+from app.models.candidates import (
+    CandidateFilters,
+    CandidateRecord,
+    CandidateSearchResult,
+    CandidateSummary,
+)
+from app.models.cv import CVAnalysisResponse, CVCanonical, DateRange
+from app.services.embeddings import canonical_fingerprint, get_cv_index
+from app.services.keywords import canonical_term, fold, tokenize
+from app.services.scoring import is_canonical_empty
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Années d'expérience (à partir des DateRange)
+# =========================
+
+_YEAR_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+_NUMERIC_MONTH_RE = re.compile(r"(?<!\d)(\d{1,2})\s*[/.-]\s*(?:19|20)\d{2}|(?:19|20)\d{2}\s*[/.-]\s*(\d{1,2})(?!\d)")
+_MONTHS = {
+    "jan": 1, "fev": 2, "feb": 2, "mar": 3, "avr": 4, "apr": 4, "mai": 5, "may": 5, "juin": 6, "jun": 6,
+    "juil": 7, "jul": 7, "aou": 8, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_CURRENT_RE = re.compile(r"present|aujourd|actuel|en cours|ce jour|now|current|today", re.I)
+
+
+def _month_index(text: str | None) -> int | None:
+    """Mois absolu (année * 12 + mois - 1) d'une date libre ("03/2019", "mars 2019", "2019")."""
+    if not text:
+        return None
+    folded = fold(text)
+    year = _YEAR_RE.search(folded)
+    if not year:
+        return None
+    month = 1
+    numeric = _NUMERIC_MONTH_RE.search(folded)
+    if numeric and 1 <= int(numeric.group(1) or numeric.group(2)) <= 12:
+        month = int(numeric.group(1) or numeric.group(2))
+    else:
+        # "juillet" avant "juin" : on garde le préfixe le plus long trouvé
+        found = [(len(p), m) for p, m in _MONTHS.items() if re.search(rf"\b{p}", folded)]
+        if found:
+            month = max(found)[1]
+    return int(year.group(1)) * 12 + month - 1
+
+
+def _interval(dates: DateRange | None, now: int) -> tuple[int, int] | None:
+    if dates is None:
+        return None
+    start = _month_index(dates.start)
+    if start is None:
+        return None
+    current = dates.is_current or (dates.end is not None and _CURRENT_RE.search(fold(dates.end)))
+    end = now if current else _month_index(dates.end)
+    if end is None or end < start:
+        end = start
+    # Mois de fin inclus : "01/2020 - 12/2020" = 12 mois
+    return start, min(end, now) + 1
+
+
+def years_of_experience(canonical: CVCanonical) -> float:
+    """Années d'expérience professionnelle, périodes qui se chevauchent comptées une fois."""
+    today = datetime.date.today()
+    now = today.year * 12 + today.month - 1
+    intervals = sorted(filter(None, (_interval(exp.dates, now) for exp in canonical.experiences)))
+    months = 0
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                months += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        months += current_end - current_start
+    return round(months / 12, 1)
+
+
+def candidate_skills(canonical: CVCanonical) -> list[str]:
+    """Compétences et outils du CV, dédoublonnés sur leur forme canonique (synonymes inclus)."""
+    skills: dict[str, str] = {}
+    for skill in canonical.hard_skills + canonical.tools + [s for exp in canonical.experiences for s in exp.skills]:
+        term = canonical_term(skill)
+        if term and term not in skills:
+            skills[term] = skill.strip()
+    return list(skills.values())
+
+
+# =========================
+# Stockage SQLite (index + FTS5)
+# =========================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL DEFAULT '',
+    full_name TEXT,
+    headline TEXT,
+    location TEXT,
+    location_norm TEXT NOT NULL DEFAULT '',
+    years_experience REAL NOT NULL DEFAULT 0,
+    ats_score INTEGER,
+    job_matching_score INTEGER,
+    skills TEXT NOT NULL DEFAULT '[]',
+    canonical TEXT NOT NULL,
+    analysis TEXT,
+    job_description TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS candidates_location ON candidates (location_norm);
+CREATE INDEX IF NOT EXISTS candidates_years ON candidates (years_experience);
+CREATE INDEX IF NOT EXISTS candidates_ats ON candidates (ats_score);
+CREATE INDEX IF NOT EXISTS candidates_updated ON candidates (updated_at);
+CREATE TABLE IF NOT EXISTS candidate_skills (
+    candidate_id TEXT NOT NULL REFERENCES candidates (id) ON DELETE CASCADE,
+    skill TEXT NOT NULL,
+    PRIMARY KEY (skill, candidate_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5 (
+    candidate_id UNINDEXED, full_name, headline, summary, experiences, skills,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_SUMMARY_COLUMNS = (
+    "id, filename, full_name, headline, location, years_experience, ats_score, "
+    "job_matching_score, skills, created_at, updated_at"
+)
+
+SORTS = {
+    "recent": "c.updated_at DESC",
+    "ats": "c.ats_score IS NULL, c.ats_score DESC, c.updated_at DESC",
+    "experience": "c.years_experience DESC, c.updated_at DESC",
+    "relevance": "bm25(candidates_fts), c.updated_at DESC",
+}
+
+
+def _fts_query(text: str) -> str:
+    # Chaque terme entre guillemets (pas d'opérateurs FTS5 injectés), préfixe sur le dernier
+    terms = [f'"{t}"' for t in tokenize(text)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _prefix_range(prefix: str) -> tuple[str, str]:
+    # Recherche par préfixe servie par l'index B-tree : prefix <= x < prefix_suivant
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _summary_from_row(row: tuple) -> CandidateSummary:
+    (candidate_id, filename, full_name, headline, location, years, ats, job_score, skills, created, updated) = row
+    return CandidateSummary(
+        candidate_id=candidate_id,
+        filename=filename,
+        full_name=full_name,
+        headline=headline,
+        location=location,
+        years_experience=years,
+        skills=json.loads(skills),
+        ats_score=ats,
+        job_matching_score=job_score,
+        created_at=created,
+        updated_at=updated,
+    )
+
+
+class CandidateStore:
+    """
+    CV canoniques et dernières analyses, persistés dans SQLite : index sur
+    compétences (table dédiée), localisation, années d'expérience et score
+    ATS, recherche plein texte FTS5. Les filtres sont servis par les index
+    (quelques millisecondes pour des milliers de CV).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL reste cohérent après un crash (seules les dernières écritures peuvent manquer)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+
+    def save(
+        self,
+        candidate_id: str,
+        filename: str,
+        canonical: CVCanonical,
+        analysis: CVAnalysisResponse | None = None,
+        job_description: str | None = None,
+    ) -> None:
+        """
+        Enregistre (ou met à jour) un CV. Sans `analysis`, la dernière analyse
+        connue est conservée : une comparaison ne l'efface pas.
+        """
+        now = time.time()
+        skills = candidate_skills(canonical)
+        job_score = analysis.job_matching.overall_score if analysis and analysis.job_matching else None
+        experiences = "\n".join(
+            " ".join(filter(None, [exp.title, exp.company, *exp.bullets])) for exp in canonical.experiences
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO candidates (
+                    id, filename, full_name, headline, location, location_norm, years_experience,
+                    ats_score, job_matching_score, skills, canonical, analysis, job_description,
+                    created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    filename = excluded.filename,
+                    full_name = excluded.full_name,
+                    headline = excluded.headline,
+                    location = excluded.location,
+                    location_norm = excluded.location_norm,
+                    years_experience = excluded.years_experience,
+                    skills = excluded.skills,
+                    canonical = excluded.canonical,
+                    ats_score = COALESCE(excluded.ats_score, ats_score),
+                    job_matching_score = CASE WHEN excluded.analysis IS NULL
+                        THEN job_matching_score ELSE excluded.job_matching_score END,
+                    analysis = COALESCE(excluded.analysis, analysis),
+                    job_description = CASE WHEN excluded.analysis IS NULL
+                        THEN job_description ELSE excluded.job_description END,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    candidate_id,
+                    filename,
+                    canonical.full_name,
+                    canonical.headline,
+                    canonical.location,
+                    fold(canonical.location or ""),
+                    years_of_experience(canonical),
+                    analysis.ats.total_score if analysis else None,
+                    job_score,
+                    json.dumps(skills, ensure_ascii=False),
+                    canonical.model_dump_json(),
+                    analysis.model_dump_json() if analysis else None,
+                    job_description if analysis else None,
+                    now,
+                    now,
+                ),
+            )
+            self._conn.execute("DELETE FROM candidate_skills WHERE candidate_id = ?", (candidate_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO candidate_skills (candidate_id, skill) VALUES (?, ?)",
+                [(candidate_id, canonical_term(skill)) for skill in skills],
+            )
+            self._conn.execute("DELETE FROM candidates_fts WHERE candidate_id = ?", (candidate_id,))
+            self._conn.execute(
+                "INSERT INTO candidates_fts (candidate_id, full_name, headline, summary, experiences, skills) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    candidate_id,
+                    canonical.full_name or "",
+                    canonical.headline or "",
+                    canonical.summary or "",
+                    experiences,
+                    " ".join(skills + canonical.soft_skills),
+                ),
+            )
+
+    def get(self, candidate_id: str) -> CandidateRecord | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, canonical, analysis, job_description FROM candidates WHERE id = ?",
+                (candidate_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        summary = _summary_from_row(row[:11])
+        canonical, analysis, job_description = row[11:]
+        return CandidateRecord(
+            **summary.model_dump(),
+            canonical=CVCanonical.model_validate_json(canonical),
+            analysis=CVAnalysisResponse.model_validate_json(analysis) if analysis else None,
+            job_description=job_description,
+        )
+
+    def delete(self, candidate_id: str) -> bool:
+        """Supprime le CV, son analyse et ses vecteurs de l'index d'embeddings persisté."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT canonical FROM candidates WHERE id = ?", (candidate_id,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM candidates_fts WHERE candidate_id = ?", (candidate_id,))
+            self._conn.execute("DELETE FROM candidates WHERE id = ?", (candidate_id,))
+        if settings.EMBEDDING_INDEX_DIR:
+            # Vecteurs d'un CV identique encore stocké : recalculés à la prochaine shortlist
+            get_cv_index().remove([canonical_fingerprint(CVCanonical.model_validate_json(row[0]))])
+        return True
+
+    def _where(self, filters: CandidateFilters) -> tuple[str, str, list]:
+        joins, clauses, params = "", [], []
+        fts = _fts_query(filters.q) if filters.q else ""
+        if fts:
+            joins = " JOIN candidates_fts ON candidates_fts.candidate_id = c.id"
+            clauses.append("candidates_fts MATCH ?")
+            params.append(fts)
+        skills = sorted({canonical_term(s) for s in filters.skills} - {""})
+        if skills:
+            clauses.append(
+                "c.id IN (SELECT candidate_id FROM candidate_skills WHERE skill IN "
+                f"({', '.join('?' * len(skills))}) GROUP BY candidate_id HAVING COUNT(*) = ?)"
+            )
+            params += [*skills, len(skills)]
+        location = fold(filters.location or "")
+        if location:
+            clauses.append("c.location_norm >= ? AND c.location_norm < ?")
+            params += list(_prefix_range(location))
+        for column, op, value in (
+            ("years_experience", ">=", filters.min_years),
+            ("years_experience", "<=", filters.max_years),
+            ("ats_score", ">=", filters.min_ats),
+            ("ats_score", "<=", filters.max_ats),
+        ):
+            if value is not None:
+                clauses.append(f"c.{column} {op} ?")
+                params.append(value)
+        return joins, (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search(
+        self,
+        filters: CandidateFilters,
+        sort: str = "recent",
+        limit: int = 20,
+        offset: int = 0,
+    ) -> CandidateSearchResult:
+        joins, where, params = self._where(filters)
+        if sort == "relevance" and not joins:
+            sort = "recent"
+        columns = ", ".join(f"c.{c.strip()}" for c in _SUMMARY_COLUMNS.split(","))
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM candidates c{joins}{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM candidates c{joins}{where} ORDER BY {SORTS[sort]} LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return CandidateSearchResult(total=total, candidates=[_summary_from_row(row) for row in rows])
+
+    def canonicals(self, filters: CandidateFilters) -> list[tuple[CandidateSummary, CVCanonical]]:
+        """Tous les CV répondant aux filtres, avec leur CV canonique (présélection sur une offre)."""
+        joins, where, params = self._where(filters)
+        columns = ", ".join(f"c.{c.strip()}" for c in _SUMMARY_COLUMNS.split(","))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {columns}, c.canonical FROM candidates c{joins}{where}", params).fetchall()
+        return [(_summary_from_row(row[:11]), CVCanonical.model_validate_json(row[11])) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+
+_store: CandidateStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_candidate_store() -> CandidateStore | None:
+    """Store partagé (créé au premier usage), None si CANDIDATE_STORE_PATH n'est pas défini."""
+    global _store
+    if not settings.CANDIDATE_STORE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = CandidateStore(settings.CANDIDATE_STORE_PATH)
+        return _store
+
+
+def remember_candidate(
+    candidate_id: str,
+    filename: str,
+    canonical: CVCanonical,
+    analysis: CVAnalysisResponse | None = None,
+    job_description: str | None = None,
+) -> None:
+    """Enregistre un CV analysé ; une erreur de stockage n'interrompt jamais l'analyse."""
+    if is_canonical_empty(canonical):
+        # Document illisible ou canonicalisation en échec : rien à rechercher
+        return
+    try:
+        store = get_candidate_store()
+        if store is not None:
+            store.save(candidate_id, filename, canonical, analysis, job_description)
+    except Exception as e:
+        logger.warning(f"Store candidats: enregistrement de {filename} impossible ({e})")
+
+
+async def shortlist_candidates(
+    job_description: str,
+    filters: CandidateFilters,
+    limit: int = 20,
+) -> CandidateSearchResult:
+    """
+    CV stockés les plus proches d'une offre : filtres SQL puis similarité par
+    embeddings (services/embeddings.py), sans appel LLM ni nouvel envoi.
+    """
+    store = get_candidate_store()
+    if store is None:
+        return CandidateSearchResult()
+    rows = await asyncio.to_thread(store.canonicals, filters)
+    if not rows:
+        return CandidateSearchResult()
+
+    index = get_cv_index()
+    keys = [canonical_fingerprint(canonical) for _, canonical in rows]
+    await asyncio.to_thread(index.add, zip(keys, (canonical for _, canonical in rows)))
+    ranked = await asyncio.to_thread(index.search, job_description, limit, list(dict.fromkeys(keys)))
+
+    by_key: dict[str, list[CandidateSummary]] = {}
+    for key, (summary, _) in zip(keys, rows):
+        by_key.setdefault(key, []).append(summary)
+    candidates = []
+    for key, score in ranked:
+        for summary in by_key[key]:
+            candidates.append(summary.model_copy(update={"similarity": round(score, 4)}))
+    return CandidateSearchResult(total=len(rows), candidates=candidates[:limit])
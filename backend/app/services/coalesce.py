@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Generic, Type, TypeVar
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.metrics import record_coalesced
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+# =========================
+# Verrous partagés entre workers (SQLite)
+# =========================
+
+class SQLiteFlightStore:
+    """
+    Verrous et résultats des exécutions en cours, partagés entre les workers
+    d'une même machine : un seul worker exécute une clé, les autres attendent
+    son résultat. Le verrou est prolongé (renew) tant que l'exécution dure ;
+    un verrou expiré (worker tombé) peut être repris.
+    """
+
+    def __init__(self, path: str, result_ttl_seconds: float = 60.0):
+        self.result_ttl_seconds = result_ttl_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS inflight_locks "
+                "(key TEXT PRIMARY KEY, owner TEXT NOT NULL, started_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS inflight_results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def acquire(self, key: str, owner: str, ttl_seconds: float) -> tuple[bool, float]:
+        """(verrou obtenu, début de l'exécution en cours pour cette clé)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM inflight_locks WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO inflight_locks (key, owner, started_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, owner, now, now + ttl_seconds),
+            )
+            if cursor.rowcount == 1:
+                return True, now
+            row = self._conn.execute("SELECT started_at FROM inflight_locks WHERE key = ?", (key,)).fetchone()
+        return False, row[0] if row else now
+
+    def renew(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """Repousse l'expiration du verrou ; False s'il a été perdu (expiré et repris)."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE inflight_locks SET expires_at = ? WHERE key = ? AND owner = ?",
+                (time.time() + ttl_seconds, key, owner),
+            )
+        return cursor.rowcount == 1
+
+    def is_locked(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM inflight_locks WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row is not None
+
+    def result(self, key: str, since: float) -> str | None:
+        """Résultat publié depuis `since` (début de l'exécution attendue), sinon None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM inflight_results WHERE key = ? AND stored_at >= ?", (key, since)
+            ).fetchone()
+        return row[0] if row else None
+
+    def publish(self, key: str, owner: str, value: str) -> None:
+        """Publie le résultat et libère le verrou dans la même transaction (pas de fenêtre sans l'un ni l'autre)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM inflight_results WHERE stored_at < ?", (now - self.result_ttl_seconds,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inflight_results (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            self._conn.execute("DELETE FROM inflight_locks WHERE key = ? AND owner = ?", (key, owner))
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM inflight_locks WHERE key = ? AND owner = ?", (key, owner))
+
+
+# =========================
+# Regroupement des exécutions identiques
+# =========================
+
+class SingleFlight(Generic[M]):
+    """
+    Exécutions identiques simultanées regroupées : les appelants d'une même clé
+    attendent une seule exécution et en reçoivent chacun une copie. Avec un
+    store, l'exécution est aussi unique entre workers (les autres attendent
+    le résultat publié, ou reprennent si l'exécutant échoue).
+    """
+
+    def __init__(self, name: str, model: Type[M], store: SQLiteFlightStore | None = None):
+        self.name = name
+        self.model = model
+        self.store = store
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[M]],
+        on_finish: Callable[[], None] | None = None,
+    ) -> M:
+        """
+        `on_finish` libère les ressources de `func` (ex. fichier temporaire) : appelé
+        à la fin de l'exécution partagée si cet appel la lance, sinon tout de suite.
+        L'exécution peut survivre à l'appelant (client déconnecté), elle en est donc
+        seule propriétaire.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lead(key, func))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+            if on_finish is not None:
+                task.add_done_callback(lambda _done: on_finish())
+        else:
+            record_coalesced(self.name, "process")
+            if on_finish is not None:
+                on_finish()
+        # shield : un client déconnecté n'interrompt pas l'exécution des autres
+        result = await asyncio.shield(task)
+        return result.model_copy(deep=True)
+
+    async def _lead(self, key: str, func: Callable[[], Awaitable[M]]) -> M:
+        if self.store is None:
+            return await func()
+        owner = uuid.uuid4().hex
+        ttl = settings.COALESCE_LOCK_TTL_SECONDS
+        while True:
+            try:
+                acquired, started_at = await asyncio.to_thread(self.store.acquire, key, owner, ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Regroupement {self.name}: store indisponible ({e}), exécution locale")
+                return await func()
+
+            if acquired:
+                # Verrou prolongé tant que l'exécution dure (durée non bornée en mode API Batch)
+                heartbeat = asyncio.create_task(self._keep_lock(key, owner, ttl))
+                try:
+                    value = await func()
+                except BaseException:
+                    heartbeat.cancel()
+                    await self._release(key, owner)
+                    raise
+                heartbeat.cancel()
+                try:
+                    await asyncio.to_thread(self.store.publish, key, owner, value.model_dump_json())
+                except sqlite3.Error as e:
+                    logger.warning(f"Regroupement {self.name}: publication impossible ({e})")
+                    await self._release(key, owner)
+                return value
+
+            # Un autre worker exécute la même clé : attente de son résultat
+            record_coalesced(self.name, "worker")
+            value = await self._wait(key, started_at)
+            if value is not None:
+                return value
+            # Exécutant en échec ou verrou expiré : nouvelle tentative d'acquisition
+
+    async def _keep_lock(self, key: str, owner: str, ttl: float) -> None:
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                if not await asyncio.to_thread(self.store.renew, key, owner, ttl):
+                    logger.warning(f"Regroupement {self.name}: verrou perdu, exécution possiblement dupliquée")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Regroupement {self.name}: prolongation du verrou impossible ({e})")
+
+    def _poll(self, key: str, started_at: float) -> tuple[bool, str | None]:
+        # Verrou lu avant le résultat : publication et libération sont atomiques
+        return self.store.is_locked(key), self.store.result(key, started_at)
+
+    async def _wait(self, key: str, started_at: float) -> M | None:
+        while True:
+            await asyncio.sleep(settings.COALESCE_POLL_INTERVAL_SECONDS)
+            try:
+                locked, raw = await asyncio.to_thread(self._poll, key, started_at)
+            except sqlite3.Error:
+                return None
+            if raw is not None:
+                try:
+                    return self.model.model_validate_json(raw)
+                except Exception:
+                    return None
+            if not locked:
+                return None
+
+    async def _release(self, key: str, owner: str) -> None:
+        try:
+            await asyncio.to_thread(self.store.release, key, owner)
+        except sqlite3.Error as e:
+            logger.warning(f"Regroupement {self.name}: libération du verrou impossible ({e})")
+
+
+def make_flight_store(kind: str) -> SQLiteFlightStore | None:
+    kind = (kind or "memory").lower()
+    if kind == "sqlite":
+        return SQLiteFlightStore(settings.CACHE_SQLITE_PATH, result_ttl_seconds=settings.COALESCE_LOCK_TTL_SECONDS)
+    if kind in ("memory", "none"):
+        return None
+    raise ValueError(f"Backend de regroupement inconnu: {kind}")
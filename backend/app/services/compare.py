@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.models.cv import CVCanonical, CVComparisonResult
+from app.services.analyze import canonicalize_document
+from app.services.candidates import remember_candidate
+from app.services.keywords import match_keywords
+from app.services.metrics import timed
+from app.services.pipeline import gather_bounded
+from app.services.ranking import rank_cvs
+from app.services.uploads import UploadedDocument
+
+logger = logging.getLogger(__name__)
+
+
+class ComparisonError(ValueError):
+    """La comparaison ne peut pas avoir lieu (pas assez de CV exploitables)."""
+
+
+async def compare_cvs(
+    documents: list[UploadedDocument],
+    job_description: str,
+) -> CVComparisonResult:
+    """
+    Compare plusieurs CV pour une même offre.
+
+    Les deux phases par CV (canonicalisation, puis matching mots-clés) sont
+    lancées en parallèle avec au plus COMPARE_MAX_CONCURRENCY appels en vol.
+    Un CV en échec est écarté (avec un avertissement) sans bloquer les autres.
+
+    Args:
+        documents: CV reçus (en mémoire ou sur disque)
+        job_description: Texte de l'offre d'emploi
+    """
+    limit = settings.COMPARE_MAX_CONCURRENCY
+    warnings: list[str] = []
+
+    with timed("canonicalize"):
+        canonicals = await gather_bounded(documents, canonicalize_document, limit)
+
+    cvs_data: list[tuple[str, str, CVCanonical]] = []
+    for document, canonical in zip(documents, canonicals):
+        filename = document.filename
+        if isinstance(canonical, BaseException):
+            logger.warning(f"Erreur extraction pour {filename}: {canonical}")
+            warnings.append(f"{filename} ignoré (erreur extraction: {str(canonical)[:200]})")
+            continue
+        # Identifiant dérivé du contenu : prompts (et fixtures rejouées) reproductibles
+        cv_id = document.content_hash[:8]
+        if any(cv_id == existing for existing, _, _ in cvs_data):
+            cv_id = f"{cv_id}-{len(cvs_data)}"
+        cvs_data.append((cv_id, filename, canonical))
+        # Écriture SQLite hors event loop
+        await asyncio.to_thread(remember_candidate, document.content_hash, filename, canonical)
+
+    if len(cvs_data) < 2:
+        raise ComparisonError(
+            "Au moins 2 CV exploitables sont nécessaires pour une comparaison. "
+            + " ".join(warnings)
+        )
+
+    with timed("compare"):
+        result = await rank_cvs(cvs_data, job_description)
+
+    # Enrichir chaque CV avec matching mots-clés (déjà fait par le classement map/reduce)
+    missing = [cv_item for cv_item in result.cvs if cv_item.keyword_matching is None]
+
+    async def keyword_matching(cv_item):
+        return await match_keywords(cv_item.canonical, job_description)
+
+    with timed("keyword_matching"):
+        keyword_results = await gather_bounded(missing, keyword_matching, limit)
+    for cv_item, keyword_result in zip(missing, keyword_results):
+        if isinstance(keyword_result, BaseException):
+            logger.warning(f"Erreur analyse mots-clés pour {cv_item.filename}: {keyword_result}")
+            continue
+        cv_item.keyword_matching = keyword_result
+
+    result.warnings = warnings + result.warnings
+    return result
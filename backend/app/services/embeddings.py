@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Iterable, Protocol
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.cv import CVCanonical
+from app.services.cache import cache_key
+from app.services.keywords import tokenize
+
+try:  # verrou de fichier entre processus (POSIX uniquement)
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Sections embarquées séparément : une offre peut ressembler aux compétences
+# d'un CV sans ressembler à son résumé, et inversement
+SECTIONS = ("summary", "experiences", "skills")
+
+# Mots vides ignorés par le vectoriseur par hachage (pas d'IDF sans corpus)
+_STOP_WORDS = frozenset(
+    "a au aux avec ce ces dans de des du elle en et etc il ils je la le les leur lui mais me mes "
+    "ne nos notre nous ou par pas pour qu que qui sa se ses son sur ta te tes ton tu un une vos "
+    "votre vous an ans the and or of to in for with on at by an be is are as from this that".split()
+)
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Matrice (len(texts), dim) float32, lignes normées (L2) ; texte vide -> vecteur nul."""
+        ...
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class HashingEmbedder:
+    """
+    Vectoriseur par hachage signé (unigrammes et bigrammes, tf sous-linéaire) :
+    déterministe d'un processus à l'autre, sans modèle ni réseau.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> dict[str, int]:
+        tokens = [t for t in tokenize(text) if t not in _STOP_WORDS]
+        counts: dict[str, int] = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                matrix[row, (digest >> 1) % self.dim] += sign * (1.0 + math.log(count))
+        return _normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Modèle d'embedding local (sentence-transformers, dépendance optionnelle)."""
+
+    name = "local"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.name = f"local:{model_name}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        # Textes vides : vecteur nul (similarité 0) plutôt que l'embedding de ""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        rows = [i for i, text in enumerate(texts) if text.strip()]
+        if rows:
+            vectors = self.model.encode([texts[i] for i in rows], normalize_embeddings=True)
+            matrix[rows] = np.asarray(vectors, dtype=np.float32)
+        return matrix
+
+
+def make_embedder() -> Embedder:
+    """
+    Embedder configuré par EMBEDDING_BACKEND : "hashing" (défaut, hors ligne)
+    ou "local" (EMBEDDING_MODEL via sentence-transformers). Repli sur le
+    hachage si le modèle local est indisponible.
+    """
+    if settings.EMBEDDING_BACKEND.lower() == "local":
+        try:
+            return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+        except Exception as e:
+            logger.warning(f"Modèle d'embedding local indisponible ({e}), repli sur le hachage")
+    return HashingEmbedder(settings.EMBEDDING_DIM)
+
+
+def section_texts(canonical: CVCanonical) -> dict[str, str]:
+    """Texte de chaque section embarquée d'un CV canonique."""
+    experiences = []
+    for exp in canonical.experiences:
+        experiences += [exp.title or "", *exp.bullets, " ".join(exp.skills)]
+    education = [f"{edu.degree or ''} {edu.school or ''}" for edu in canonical.education]
+    return {
+        "summary": " ".join(filter(None, [canonical.headline, canonical.summary])),
+        "experiences": "\n".join(filter(None, experiences + education)),
+        "skills": ", ".join(canonical.hard_skills + canonical.tools + canonical.soft_skills + canonical.certifications),
+    }
+
+
+def canonical_fingerprint(canonical: CVCanonical) -> str:
+    """Clé d'un CV dans l'index : hash du CV canonique (un même CV n'est embarqué qu'une fois)."""
+    return cache_key("embedding", canonical.model_dump_json())
+
+
+def _section_weights() -> np.ndarray:
+    weights = np.array([max(0.0, settings.EMBEDDING_SECTION_WEIGHTS.get(s, 0.0)) for s in SECTIONS], dtype=np.float32)
+    total = weights.sum()
+    return weights / total if total > 0 else np.full(len(SECTIONS), 1 / len(SECTIONS), dtype=np.float32)
+
+
+class _DirectoryLock:
+    """
+    Verrou exclusif sur `<directory>/.lock`, partagé entre les processus d'une
+    même machine (flock POSIX) ; sans fcntl (Windows), limité au processus.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, ".lock")
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self) -> "_DirectoryLock":
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class EmbeddingIndex:
+    """
+    Vecteurs des CV, une matrice NumPy (n, dim) par section.
+
+    Avec `directory`, l'index est persisté par blocs en ajout seul : chaque
+    `add` écrit un bloc (`<bloc>.<section>.npy` + `<bloc>.keys.json`) avec ses
+    seuls nouveaux vecteurs, sous un verrou de fichier. Les processus qui
+    partagent le répertoire relisent les blocs des autres au lieu d'écraser
+    leurs clés ; au-delà de EMBEDDING_INDEX_MAX_CHUNKS blocs, ils sont fusionnés.
+    Les blocs sont rechargés en mémoire mappée : des milliers de CV sans tout
+    charger en RAM.
+    Le score d'un CV est la moyenne pondérée (EMBEDDING_SECTION_WEIGHTS) des
+    similarités cosinus de ses sections avec l'offre, calculée pour tous les
+    CV en un produit matrice-vecteur par section et par bloc.
+    """
+
+    def __init__(self, embedder: Embedder, directory: str | None = None):
+        self.embedder = embedder
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._keys: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._chunks: list[str] = []
+        self._parts: dict[str, list[np.ndarray]] = {s: [] for s in SECTIONS}
+        self._file_lock: _DirectoryLock | None = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._file_lock = _DirectoryLock(directory)
+            with self._file_lock:
+                self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _meta(self) -> dict:
+        return {"embedder": self.embedder.name, "dim": self.embedder.dim}
+
+    def _chunk_path(self, chunk: str, part: str) -> str:
+        return os.path.join(self.directory, f"{chunk}.{part}")
+
+    def _stored_chunks(self) -> list[str]:
+        """Blocs complets (fichier de clés écrit en dernier), du plus ancien au plus récent."""
+        suffix = ".keys.json"
+        return sorted(name[: -len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix))
+
+    def _read_chunk(self, chunk: str) -> tuple[list[str], dict[str, np.ndarray]] | None:
+        try:
+            with open(self._chunk_path(chunk, "keys.json"), encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("meta") != self._meta():
+                return None
+            keys = list(stored["keys"])
+            matrices = {s: np.load(self._chunk_path(chunk, f"{s}.npy"), mmap_mode="r") for s in SECTIONS}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Index d'embeddings {self.directory}: bloc {chunk} illisible ({e}), ignoré")
+            return None
+        if any(m.shape != (len(keys), self.embedder.dim) for m in matrices.values()):
+            logger.warning(f"Index d'embeddings {self.directory}: bloc {chunk} incohérent, ignoré")
+            return None
+        return keys, matrices
+
+    def _refresh(self) -> None:
+        """Recharge la liste des blocs si un autre processus l'a modifiée (appelé sous le verrou de fichier)."""
+        chunks = self._stored_chunks()
+        if chunks == self._chunks:
+            return
+        keys: list[str] = []
+        rows: dict[str, int] = {}
+        parts: dict[str, list[np.ndarray]] = {s: [] for s in SECTIONS}
+        for chunk in chunks:
+            loaded = self._read_chunk(chunk)
+            if loaded is None:
+                continue
+            chunk_keys, matrices = loaded
+            for key in chunk_keys:
+                rows.setdefault(key, len(keys))
+                keys.append(key)
+            for section in SECTIONS:
+                parts[section].append(matrices[section])
+        self._chunks, self._keys, self._rows, self._parts = chunks, keys, rows, parts
+
+    def _write_chunk(self, keys: list[str], matrices: dict[str, np.ndarray]) -> str:
+        """Écrit un bloc ; son fichier de clés, renommé en dernier, le rend visible aux lecteurs."""
+        chunk = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        for section in SECTIONS:
+            tmp = self._chunk_path(chunk, f"{section}.tmp.npy")
+            np.save(tmp, matrices[section])
+            os.replace(tmp, self._chunk_path(chunk, f"{section}.npy"))
+        tmp = self._chunk_path(chunk, "keys.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"meta": self._meta(), "keys": keys}, f)
+        os.replace(tmp, self._chunk_path(chunk, "keys.json"))
+        return chunk
+
+    def _compact(self, exclude: set[str] = frozenset()) -> None:
+        """
+        Fusionne les blocs en un seul, sans les clés `exclude` (appelé sous le
+        verrou de fichier, après _refresh).
+        """
+        merged_keys = [key for key in self._rows if key not in exclude]
+        rows = [self._rows[key] for key in merged_keys]
+        merged = {s: np.concatenate(self._parts[s])[rows] for s in SECTIONS}
+        self._write_chunk(merged_keys, merged)
+        # Les processus qui mappent encore les anciens fichiers gardent leur copie jusqu'au rechargement
+        for chunk in self._chunks:
+            for part in ("keys.json", *(f"{s}.npy" for s in SECTIONS)):
+                try:
+                    os.remove(self._chunk_path(chunk, part))
+                except OSError:
+                    pass
+        self._refresh()
+
+    def add(self, items: Iterable[tuple[str, CVCanonical]]) -> int:
+        """Embarque les CV absents de l'index (par clé) ; renvoie le nombre ajouté."""
+        items = list(items)
+        with self._lock:
+            if self._file_lock is None:
+                return self._add(items)
+            with self._file_lock:
+                self._refresh()
+                return self._add(items)
+
+    def _add(self, items: list[tuple[str, CVCanonical]]) -> int:
+        new: dict[str, CVCanonical] = {}
+        for key, canonical in items:
+            if key not in self._rows and key not in new:
+                new[key] = canonical
+        if not new:
+            return 0
+
+        texts = [section_texts(canonical) for canonical in new.values()]
+        vectors = {s: self.embedder.embed([t[s] for t in texts]) for s in SECTIONS}
+        if not self.directory:
+            for key in new:
+                self._rows[key] = len(self._keys)
+                self._keys.append(key)
+            for section in SECTIONS:
+                self._parts[section].append(vectors[section])
+            return len(new)
+
+        self._write_chunk(list(new), vectors)
+        self._refresh()
+        if len(self._chunks) > settings.EMBEDDING_INDEX_MAX_CHUNKS:
+            self._compact()
+        return len(new)
+
+    def remove(self, keys: Iterable[str]) -> int:
+        """Retire des CV de l'index (droit à l'effacement) ; renvoie le nombre retiré."""
+        with self._lock:
+            if self._file_lock is None:
+                return self._remove(set(keys))
+            with self._file_lock:
+                self._refresh()
+                removed = {key for key in keys if key in self._rows}
+                if removed:
+                    # Blocs réécrits sans ces vecteurs : plus aucune copie sur disque
+                    self._compact(removed)
+                return len(removed)
+
+    def _remove(self, keys: set[str]) -> int:
+        removed = keys & self._rows.keys()
+        if not removed:
+            return 0
+        kept = [key for key in self._keys if key not in removed]
+        rows = [self._rows[key] for key in kept]
+        self._parts = {s: [np.concatenate(self._parts[s])[rows]] for s in SECTIONS}
+        self._keys = kept
+        self._rows = {key: i for i, key in enumerate(kept)}
+        return len(removed)
+
+    def score(self, job_description: str, keys: list[str] | None = None) -> np.ndarray:
+        """Similarité pondérée de chaque CV (ou de `keys`, dans cet ordre) avec l'offre."""
+        query = self.embedder.embed([job_description])[0]
+        with self._lock:
+            if self._file_lock is not None:
+                with self._file_lock:
+                    self._refresh()
+            rows = None if keys is None else np.array([self._rows[k] for k in keys], dtype=np.int64)
+            parts = {s: list(self._parts[s]) for s in SECTIONS}
+            count = len(self._keys)
+        scores = np.zeros(count, dtype=np.float32)
+        for weight, section in zip(_section_weights(), SECTIONS):
+            if not weight:
+                continue
+            offset = 0
+            for matrix in parts[section]:
+                if len(matrix):
+                    scores[offset:offset + len(matrix)] += weight * (matrix @ query)
+                offset += len(matrix)
+        return scores if rows is None else scores[rows]
+
+    def search(self, job_description: str, top_k: int, keys: list[str] | None = None) -> list[tuple[str, float]]:
+        """Les `top_k` CV les plus proches de l'offre (parmi `keys` si fourni), par score décroissant."""
+        if keys is None:
+            with self._lock:
+                candidates = list(self._keys)
+            scores = self.score(job_description)[: len(candidates)]
+        else:
+            candidates = keys
+            scores = self.score(job_description, keys)
+        if not len(scores):
+            return []
+        top_k = min(top_k, len(scores))
+        # Sélection partielle O(n) puis tri des seuls k retenus
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(candidates[i], float(scores[i])) for i in best]
+
+
+_embedder: Embedder | None = None
+_shared_index: EmbeddingIndex | None = None
+_init_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    with _init_lock:
+        if _embedder is None:
+            _embedder = make_embedder()
+        return _embedder
+
+
+def get_cv_index() -> EmbeddingIndex:
+    """
+    Index partagé persisté dans EMBEDDING_INDEX_DIR (chaque CV n'y est embarqué
+    qu'une fois, d'une requête et d'un redémarrage à l'autre) ; sans répertoire
+    configuré, un index éphémère propre à l'appel.
+    """
+    global _shared_index
+    if not settings.EMBEDDING_INDEX_DIR:
+        return EmbeddingIndex(get_embedder())
+    embedder = get_embedder()
+    with _init_lock:
+        if _shared_index is None:
+            _shared_index = EmbeddingIndex(embedder, settings.EMBEDDING_INDEX_DIR)
+        return _shared_index
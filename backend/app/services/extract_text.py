@@ -1,25 +1,480 @@
-from typing import Tuple, List
+from typing import Optional, Tuple, List
+import asyncio
 import io
+import logging
+import os
+import re
+import tempfile
+import unicodedata
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
 
-def extract_text_from_file(data: bytes, filename: str) -> Tuple[str, List[str]]:
-    warnings: List[str] = []
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UnreadableDocumentError(ValueError):
+    """Document écarté par le tri avant tout appel LLM (scan sans texte, vide, encodage cassé)."""
+
+    def __init__(self, message: str, warnings: List[str]):
+        super().__init__(message)
+        self.warnings = warnings
+
+
+@dataclass
+class ExtractionQuality:
+    """Indicateurs de tri calculés sur le texte extrait, sans appel LLM."""
+
+    pages: int = 1
+    chars: int = 0  # caractères hors espaces
+    glyph_ratio: float = 1.0  # part de caractères lisibles (lettres, chiffres, ponctuation)
+    image_coverage: float = 0.0  # part de la surface des pages couverte par des images (PDF)
+    score: float = 0.0  # glyph_ratio x densité de texte par page, entre 0 et 1
+
+    @property
+    def unreadable(self) -> bool:
+        return self.score < settings.EXTRACTION_TRIAGE_MIN_SCORE
+
+
+@dataclass
+class ExtractedDocument:
+    text: str
+    warnings: List[str] = field(default_factory=list)
+    quality: ExtractionQuality = field(default_factory=ExtractionQuality)
+
+
+@dataclass
+class PageText:
+    """Texte d'une page PDF, en blocs dans l'ordre de lecture : (zone, texte), zone "header", "body" ou "footer"."""
+
+    blocks: List[Tuple[str, str]]
+    image_coverage: float = 0.0
+
+
+# Bandes haute et basse de la page (part de la hauteur) où chercher en-têtes et pieds de page
+MARGIN_RATIO = 0.08
+# Gouttière entre deux colonnes : au plus GUTTER_CROSSING_RATIO de la hauteur de texte la
+# traverse (titre pleine largeur), au moins COLUMN_MIN_RATIO de chaque côté
+GUTTER_CROSSING_RATIO = 0.25
+COLUMN_MIN_RATIO = 0.15
+# Blocs alignés sur une même ligne (points) : intitulé à gauche, dates à droite
+ROW_TOLERANCE = 3.0
+_PAGE_NUMBER_RE = re.compile(r"\d+")
+
+
+# =========================
+# PDF : blocs, colonnes, en-têtes et pieds de page
+# =========================
+
+def _find_gutter(blocks: list) -> float | None:
+    """
+    Abscisse de la gouttière d'une mise en page à deux colonnes (CV avec barre
+    latérale), d'après la hauteur de texte de part et d'autre ; None sinon.
+    """
+    total = sum(b[3] - b[1] for b in blocks)
+    if not total:
+        return None
+    best: tuple[float, float] | None = None
+    for x in sorted({b[2] + 0.5 for b in blocks}):
+        left = sum(b[3] - b[1] for b in blocks if b[2] <= x)
+        right = sum(b[3] - b[1] for b in blocks if b[0] >= x)
+        crossing = total - left - right
+        if min(left, right) >= total * COLUMN_MIN_RATIO and crossing <= total * GUTTER_CROSSING_RATIO:
+            if best is None or crossing < best[1]:
+                best = (x, crossing)
+    return best[0] if best else None
+
+
+def _reading_order(blocks: list) -> list:
+    """
+    Ordre de lecture des blocs (x0, y0, x1, y1, texte) : en mise en page à
+    colonnes (CV avec barre latérale), chaque colonne est lue de haut en bas
+    entre deux blocs pleine largeur, au lieu d'alterner ligne à ligne.
+    """
+    by_position = sorted(blocks, key=lambda b: (round(b[1]), b[0]))
+    gutter = _find_gutter(blocks)
+    if gutter is None:
+        return by_position
+
+    def column_of(block) -> int | None:
+        if block[2] <= gutter:
+            return 0
+        if block[0] >= gutter:
+            return 1
+        return None  # à cheval sur la gouttière : pleine largeur
+
+    # Mise en page en lignes (poste à gauche, dates à droite) plutôt qu'en colonnes :
+    # la plupart des blocs hors première colonne ont un voisin sur la même ligne
+    # (deux colonnes qui commencent à la même hauteur ne suffisent pas)
+    placed = [(column_of(b), b) for b in blocks if column_of(b) is not None]
+    others = [b for index, b in placed if index > 0]
+    aligned = sum(
+        1
+        for index, block in placed
+        if index > 0 and any(i != index and abs(b[1] - block[1]) <= ROW_TOLERANCE for i, b in placed)
+    )
+    if not others or (aligned >= 2 and aligned * 2 > len(others)):
+        return by_position
+
+    ordered: list = []
+    pending: list = []
+    for block in by_position:
+        if column_of(block) is None:
+            ordered += sorted(pending, key=lambda b: (column_of(b), b[1]))
+            ordered.append(block)
+            pending = []
+        else:
+            pending.append(block)
+    ordered += sorted(pending, key=lambda b: (column_of(b), b[1]))
+    return ordered
+
+
+def _image_coverage(page) -> float:
+    area = page.rect.width * page.rect.height
+    if not area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        covered += max(0.0, min(x1, page.rect.x1) - max(x0, page.rect.x0)) * max(
+            0.0, min(y1, page.rect.y1) - max(y0, page.rect.y0)
+        )
+    return min(1.0, covered / area)
+
+
+def _page_text(page) -> PageText:
+    height = page.rect.height
+    blocks = [
+        (x0, y0, x1, y1, text.strip())
+        for x0, y0, x1, y1, text, _no, block_type in page.get_text("blocks")
+        if block_type == 0 and text.strip()
+    ]
+    # En-têtes et pieds de page hors colonnes : lus avant et après le corps de la page
+    header = [b for b in blocks if b[3] <= height * MARGIN_RATIO]
+    footer = [b for b in blocks if b[1] >= height * (1 - MARGIN_RATIO) and b not in header]
+    body = [b for b in blocks if b not in header and b not in footer]
+    zoned = (
+        [("header", b[4]) for b in sorted(header, key=lambda b: (round(b[1]), b[0]))]
+        + [("body", b[4]) for b in _reading_order(body)]
+        + [("footer", b[4]) for b in sorted(footer, key=lambda b: (round(b[1]), b[0]))]
+    )
+    return PageText(blocks=zoned, image_coverage=_image_coverage(page))
+
+
+def extract_pdf_pages(
+    data: Optional[bytes],
+    path: Optional[str],
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Tuple[int, List[PageText]]:
+    """Pages [start, stop) d'un PDF ; renvoie aussi le nombre total de pages (répartition entre workers)."""
+    import fitz  # PyMuPDF
+    doc = fitz.open(path, filetype="pdf") if data is None else fitz.open(stream=data, filetype="pdf")
+    with doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        return doc.page_count, [_page_text(doc[number]) for number in range(start, stop)]
+
+
+def _margin_key(text: str) -> str:
+    # "Page 2 / 3" et "Page 3 / 3" sont le même pied de page
+    return _PAGE_NUMBER_RE.sub("#", " ".join(text.casefold().split()))
+
+
+def assemble_pdf_text(pages: List[PageText]) -> Tuple[str, float]:
+    """
+    Texte du document (blocs séparés par une ligne vide) : les en-têtes et pieds
+    de page répétés sur au moins la moitié des pages ne sont gardés qu'une fois.
+    Renvoie aussi la couverture moyenne des pages par des images.
+    """
+    repeated: set[str] = set()
+    if len(pages) >= 2:
+        counts = Counter(
+            key
+            for page in pages
+            for key in {_margin_key(text) for zone, text in page.blocks if zone != "body"}
+        )
+        threshold = max(2, (len(pages) + 1) // 2)
+        repeated = {key for key, count in counts.items() if count >= threshold}
+
+    seen: set[str] = set()
+    texts = []
+    for page in pages:
+        blocks = []
+        for zone, text in page.blocks:
+            if zone != "body" and (key := _margin_key(text)) in repeated:
+                if key in seen:
+                    continue
+                seen.add(key)
+            blocks.append(text)
+        texts.append("\n\n".join(blocks))
+    coverage = sum(page.image_coverage for page in pages) / len(pages) if pages else 0.0
+    return "\n\n".join(t for t in texts if t).strip(), coverage
+
+
+# =========================
+# Tri des documents (avant tout appel LLM)
+# =========================
+
+def _glyph_ratio(text: str) -> float:
+    """Part de caractères lisibles ; une police sans table d'encodage donne des U+FFFD ou zones privées."""
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return 0.0
+    readable = sum(
+        1 for c in visible if c != "\ufffd" and unicodedata.category(c)[0] in "LNPS" and unicodedata.category(c) != "Co"
+    )
+    return readable / len(visible)
+
+
+def triage(
+    text: str,
+    pages: int = 1,
+    image_coverage: float = 0.0,
+    text_pages: Optional[int] = None,
+) -> ExtractionQuality:
+    """
+    Score de tri : part de caractères lisibles x densité (caractères par page
+    portant du texte, rapportés à EXTRACTION_MIN_CHARS). Des annexes scannées
+    ne diluent donc pas un CV texte.
+    """
+    chars = sum(1 for c in text if not c.isspace())
+    glyph_ratio = _glyph_ratio(text)
+    text_pages = pages if text_pages is None else text_pages
+    density = min(1.0, chars / max(text_pages, 1) / max(settings.EXTRACTION_MIN_CHARS, 1))
+    return ExtractionQuality(
+        pages=pages,
+        chars=chars,
+        glyph_ratio=round(glyph_ratio, 3),
+        image_coverage=round(image_coverage, 3),
+        score=round(glyph_ratio * density, 3),
+    )
+
+
+def _quality_warnings(kind: str, quality: ExtractionQuality) -> List[str]:
+    if quality.unreadable:
+        if quality.chars and quality.glyph_ratio < 0.5:
+            return [f"Extraction {kind} illisible (encodage des polices non exploitable) : CV non analysé."]
+        if kind == "PDF" and quality.image_coverage >= 0.3:
+            return ["PDF scanné (image sans couche texte) : CV non analysé, fournis un PDF texte ou un DOCX."]
+        return [f"Extraction {kind} vide : CV non analysé."]
+    if quality.chars < settings.EXTRACTION_MIN_CHARS:
+        if kind == "PDF":
+            return ["Extraction PDF très faible (PDF image ou mise en page complexe)."]
+        return ["Extraction DOCX très faible (document vide ou contenu non standard)."]
+    return []
+
+
+def finish_pdf_extraction(pages: List[PageText]) -> ExtractedDocument:
+    text, coverage = assemble_pdf_text(pages)
+    text_pages = sum(1 for page in pages if any(block.strip() for _zone, block in page.blocks))
+    quality = triage(text, len(pages), coverage, text_pages=text_pages)
+    return ExtractedDocument(text=text, warnings=_quality_warnings("PDF", quality), quality=quality)
+
+
+def extract_document(
+    data: Optional[bytes],
+    filename: str,
+    path: Optional[str] = None,
+) -> ExtractedDocument:
+    """Texte d'un CV, lu depuis `data` ou, pour les gros envois écrits sur disque, depuis `path`, avec son tri."""
     lower = filename.lower()
 
     if lower.endswith(".pdf"):
-        import fitz  # PyMuPDF
-        doc = fitz.open(stream=data, filetype="pdf")
-        text = "\n".join([page.get_text("text") for page in doc]).strip()
-        if len(text) < 200:
-            warnings.append("Extraction PDF très faible (PDF image ou mise en page complexe).")
-        return text, warnings
+        _count, pages = extract_pdf_pages(data, path)
+        return finish_pdf_extraction(pages)
 
     if lower.endswith(".docx") or lower.endswith(".doc"):
         import docx
-        f = io.BytesIO(data)
-        d = docx.Document(f)
+        d = docx.Document(path if data is None else io.BytesIO(data))
         text = "\n".join([p.text for p in d.paragraphs]).strip()
-        if len(text) < 200:
-            warnings.append("Extraction DOCX très faible (document vide ou contenu non standard).")
-        return text, warnings
+        quality = triage(text)
+        return ExtractedDocument(text=text, warnings=_quality_warnings("DOCX", quality), quality=quality)
 
     raise ValueError("Extension non supportée (PDF/DOCX uniquement).")
+
+
+def extract_text_from_file(
+    data: Optional[bytes],
+    filename: str,
+    path: Optional[str] = None,
+) -> Tuple[str, List[str]]:
+    """Texte d'un CV et avertissements d'extraction (voir extract_document)."""
+    document = extract_document(data, filename, path)
+    return document.text, document.warnings
+
+
+# =========================
+# Exécution hors event loop
+# =========================
+
+class ExtractionTimeoutError(TimeoutError):
+    """L'extraction d'un document a dépassé EXTRACTION_TIMEOUT_SECONDS."""
+
+
+_executor: Executor | None = None
+
+
+def _limit_worker_memory(max_memory_mb: int) -> None:
+    """
+    Initialiseur des workers : plafonne la mémoire adressable du processus
+    pour qu'un document piégé lève MemoryError au lieu de faire tomber la machine.
+    """
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource  # indisponible sous Windows
+    except ImportError:
+        return
+    limit = max_memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def _create_executor() -> Executor:
+    workers = settings.EXTRACTION_MAX_WORKERS or None
+    if settings.EXTRACTION_EXECUTOR.lower() == "process":
+        try:
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_limit_worker_memory,
+                initargs=(settings.EXTRACTION_MAX_MEMORY_MB,),
+            )
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"Pool de processus indisponible, repli sur un pool de threads: {e}")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+
+
+def get_extraction_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = _create_executor()
+    return _executor
+
+
+def shutdown_extraction_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _terminate_workers(processes: list) -> None:
+    """Tue les processus encore vivants d'un pool retiré."""
+    for process in processes:
+        if process.is_alive():
+            logger.warning(f"Worker d'extraction {process.pid} bloqué : arrêt forcé")
+            process.terminate()
+
+
+def _recycle_executor(executor: Executor) -> None:
+    """
+    Après un dépassement de délai, le worker bloqué garde sa place dans le pool :
+    les extractions suivantes partent sur un pool neuf, l'ancien termine ses
+    tâches en cours puis ses processus restants (donc bloqués) sont tués après
+    EXTRACTION_TIMEOUT_SECONDS. Un thread bloqué ne peut pas être tué : il est
+    seulement abandonné avec son pool.
+    """
+    global _executor
+    if _executor is not executor:
+        return  # déjà recyclé par une autre extraction
+    _executor = None
+    # Processus relevés avant shutdown, qui les oublie (pas d'API publique : attribut interne)
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    if processes:
+        asyncio.get_running_loop().call_later(settings.EXTRACTION_TIMEOUT_SECONDS, _terminate_workers, processes)
+
+
+async def _extract_pdf_parallel(
+    executor: Executor,
+    data: Optional[bytes],
+    path: Optional[str],
+) -> ExtractedDocument:
+    """
+    PDF réparti par tranches de EXTRACTION_PAGES_PER_TASK pages entre les
+    workers : la première tranche donne aussi le nombre de pages, les suivantes
+    partent en parallèle. L'assemblage (colonnes déjà ordonnées, en-têtes) est local.
+    Les tranches suivantes reçoivent un chemin, pas les octets : un PDF en mémoire
+    est écrit une fois sur disque au lieu d'être sérialisé vers chaque tâche.
+    """
+    loop = asyncio.get_running_loop()
+    size = max(settings.EXTRACTION_PAGES_PER_TASK, 1)
+    page_count, pages = await loop.run_in_executor(executor, extract_pdf_pages, data, path, 0, size)
+    if page_count <= size:
+        return finish_pdf_extraction(pages)
+
+    spooled = None
+    if path is None:
+        spooled = await asyncio.to_thread(_spool_pdf, data)
+        path = spooled
+    try:
+        rest = await asyncio.gather(*(
+            loop.run_in_executor(executor, extract_pdf_pages, None, path, start, start + size)
+            for start in range(size, page_count, size)
+        ))
+    finally:
+        if spooled is not None:
+            try:
+                os.remove(spooled)
+            except OSError:
+                pass
+    for _count, chunk in rest:
+        pages += chunk
+    return finish_pdf_extraction(pages)
+
+
+def _spool_pdf(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(prefix="cv-", suffix=".pdf", dir=settings.UPLOAD_TMP_DIR, delete=False) as f:
+        f.write(data)
+    return f.name
+
+
+async def extract_document_async(
+    data: Optional[bytes],
+    filename: str,
+    path: Optional[str] = None,
+) -> ExtractedDocument:
+    """
+    Version asynchrone de extract_document : le parsing (CPU) tourne dans
+    le pool configuré (processus par défaut) sans bloquer l'event loop.
+    Un fichier sur disque est transmis au worker par son chemin, sans copie.
+    Avec un pool de processus, les pages d'un long PDF sont extraites en parallèle
+    (PyMuPDF ne se partage pas entre threads : un seul appel en pool de threads).
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    executor = get_extraction_executor()
+    if filename.lower().endswith(".pdf") and isinstance(executor, ProcessPoolExecutor):
+        work = _extract_pdf_parallel(executor, data, path)
+    else:
+        work = loop.run_in_executor(executor, extract_document, data, filename, path)
+    try:
+        return await asyncio.wait_for(work, timeout=settings.EXTRACTION_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _recycle_executor(executor)
+        raise ExtractionTimeoutError(
+            f"Extraction de {filename} interrompue (délai de {settings.EXTRACTION_TIMEOUT_SECONDS:g} s dépassé)."
+        )
+    except MemoryError:
+        raise ValueError(f"Extraction de {filename} interrompue (limite mémoire dépassée).")
+    except BrokenProcessPool:
+        # Un worker a été tué (OOM, crash natif) : le pool est recréé pour les suivants
+        if _executor is executor:
+            _executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise ValueError(f"Extraction de {filename} impossible (document illisible ou trop lourd).")
+
+
+async def extract_text_async(
+    data: Optional[bytes],
+    filename: str,
+    path: Optional[str] = None,
+) -> Tuple[str, List[str]]:
+    """Texte et avertissements d'extraction (voir extract_document_async)."""
+    document = await extract_document_async(data, filename, path)
+    return document.text, document.warnings
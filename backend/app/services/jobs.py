@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Protocol
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.models.cv import CVAnalysisResponse, CVComparisonResult
+from app.models.jobs import JobInfo, JobKind, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[[], Awaitable[BaseModel]]
+
+_RESULT_MODELS = {
+    JobKind.ANALYZE: CVAnalysisResponse,
+    JobKind.COMPARE: CVComparisonResult,
+}
+
+
+class JobQueueFullError(RuntimeError):
+    """La file des jobs est pleine : le client doit réessayer plus tard."""
+
+
+# Erreur des jobs dont le worker s'est arrêté avant la fin (leur exécution ne peut pas reprendre)
+INTERRUPTED_JOB_ERROR = "Job interrompu par l'arrêt du serveur : soumettez-le à nouveau."
+
+
+def _fail(job: JobInfo, error: str) -> JobInfo:
+    job.status = JobStatus.FAILED
+    job.error = error
+    job.finished_at = time.time()
+    return job
+
+
+# =========================
+# Stockage des jobs
+# =========================
+
+class JobStore(Protocol):
+    def save(self, job: JobInfo) -> None: ...
+
+    def get(self, job_id: str) -> JobInfo | None: ...
+
+    def purge(self, older_than: float) -> None: ...
+
+    def renew(self) -> None:
+        """Prolonge le bail des jobs non terminés de ce processus."""
+        ...
+
+    def fail_orphans(self, error: str) -> int:
+        """Passe en échec les jobs non terminés dont le bail a expiré (processus exécutant disparu)."""
+        ...
+
+
+class MemoryJobStore:
+    def __init__(self):
+        self._jobs: dict[str, JobInfo] = {}
+
+    def save(self, job: JobInfo) -> None:
+        self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> JobInfo | None:
+        return self._jobs.get(job_id)
+
+    def purge(self, older_than: float) -> None:
+        for job_id, job in list(self._jobs.items()):
+            if job.is_done and (job.finished_at or 0) < older_than:
+                del self._jobs[job_id]
+
+    def renew(self) -> None:
+        pass
+
+    def fail_orphans(self, error: str) -> int:
+        return 0  # les jobs disparaissent avec le processus
+
+
+# Identifiant de ce processus (ni le hostname ni le PID ne sont fiables en conteneur)
+INSTANCE_ID = uuid.uuid4().hex
+
+
+class SQLiteJobStore:
+    """
+    Stockage persistant : les jobs restent consultables depuis tous les workers.
+    Chaque job non terminé porte l'instance qui l'exécute (`owner`) et un bail
+    (`lease_until`) prolongé périodiquement par JobManager : les jobs d'un
+    processus arrêté sans nettoyage (crash, kill) passent en échec à l'expiration.
+    """
+
+    def __init__(self, path: str, lease_seconds: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs "
+                "(job_id TEXT PRIMARY KEY, data TEXT NOT NULL, finished_at REAL, owner TEXT, lease_until REAL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "lease_until" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    def save(self, job: JobInfo) -> None:
+        owner, lease_until = (None, None) if job.is_done else (INSTANCE_ID, time.time() + self.lease_seconds)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, finished_at, owner, lease_until) VALUES (?, ?, ?, ?, ?)",
+                (job.job_id, job.model_dump_json(), job.finished_at, owner, lease_until),
+            )
+
+    def renew(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND finished_at IS NULL",
+                (time.time() + self.lease_seconds, INSTANCE_ID),
+            )
+
+    def get(self, job_id: str) -> JobInfo | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        result = data.pop("result", None)
+        job = JobInfo(**data)
+        if result is not None:
+            job.result = _RESULT_MODELS[job.kind].model_validate(result)
+        return job
+
+    def purge(self, older_than: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (older_than,),
+            )
+
+    def fail_orphans(self, error: str) -> int:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NULL AND (lease_until IS NULL OR lease_until < ?)",
+                (time.time(),),
+            ).fetchall()
+        orphans = [job_id for (job_id,) in rows]
+        for job_id in orphans:
+            job = self.get(job_id)
+            if job is not None and not job.is_done:
+                self.save(_fail(job, error))
+        return len(orphans)
+
+
+def make_job_store(kind: str) -> JobStore:
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore(settings.JOBS_SQLITE_PATH, settings.JOBS_LEASE_SECONDS)
+    raise ValueError(f"Stockage de jobs inconnu: {kind}")
+
+
+# =========================
+# File + pool de workers
+# =========================
+
+class JobManager:
+    """
+    File bornée de jobs exécutés par un pool de workers asyncio.
+    Quand la file est pleine, submit() lève JobQueueFullError (HTTP 429).
+
+    La file est propre au processus : un job s'exécute dans le worker uvicorn
+    qui l'a reçu. Avec le stockage "memory" et plusieurs workers, GET /jobs/{id}
+    répond 404 quand la requête arrive sur un autre worker ; JOBS_STORE_BACKEND
+    "sqlite" rend les jobs consultables depuis tous les workers.
+    Un job interrompu (arrêt du serveur, crash) ne reprend pas : ses fichiers
+    ne sont plus disponibles, il passe en échec (INTERRUPTED_JOB_ERROR).
+    Le bail des jobs de ce processus est prolongé toutes les `lease_seconds / 3` ;
+    les jobs dont le bail a expiré (autre processus disparu) passent en échec.
+    """
+
+    def __init__(self, store: JobStore, workers: int, queue_size: int, ttl_seconds: float, lease_seconds: float):
+        self.store = store
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._queue: asyncio.Queue[tuple[str, JobRunner]] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._events: dict[str, asyncio.Event] = {}
+        self._cleanups: dict[str, Callable[[], None]] = {}
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(max(1, self.workers))
+        ]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="job-heartbeat"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        # Jobs de ce processus en file ou en cours : ils ne reprendront pas
+        for job_id, event in list(self._events.items()):
+            job = self.store.get(job_id)
+            if job is not None and not job.is_done:
+                self.store.save(_fail(job, INTERRUPTED_JOB_ERROR))
+            event.set()
+        self._events.clear()
+        # Jobs restés en file : leurs fichiers temporaires ne seront jamais lus
+        for cleanup in self._cleanups.values():
+            cleanup()
+        self._cleanups.clear()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.store.renew)
+                orphans = await asyncio.to_thread(self.store.fail_orphans, INTERRUPTED_JOB_ERROR)
+                if orphans:
+                    logger.warning(f"{orphans} job(s) d'un processus arrêté sans nettoyage passé(s) en échec")
+            except Exception as e:
+                logger.warning(f"Bail des jobs non renouvelé: {e}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, kind: JobKind, runner: JobRunner, cleanup: Callable[[], None] | None = None) -> JobInfo:
+        """
+        Met le job en file. `cleanup` est appelé une fois le job terminé, ou à
+        l'arrêt du gestionnaire s'il n'a jamais été exécuté.
+        """
+        if self._queue is None:
+            raise RuntimeError("Le gestionnaire de jobs n'est pas démarré.")
+        if self._queue.full():
+            raise JobQueueFullError(
+                f"File d'attente pleine ({self.queue_size} jobs). Réessayez dans quelques instants."
+            )
+
+        self.store.purge(time.time() - self.ttl_seconds)
+        job = JobInfo(job_id=uuid.uuid4().hex, kind=kind, created_at=time.time())
+        self.store.save(job)
+        self._events[job.job_id] = asyncio.Event()
+        if cleanup is not None:
+            self._cleanups[job.job_id] = cleanup
+        self._queue.put_nowait((job.job_id, runner))
+        return job
+
+    def get(self, job_id: str) -> JobInfo | None:
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> JobInfo | None:
+        """
+        Attend (long-polling) que le job se termine ou que `timeout` expire.
+        Le store est relu périodiquement : fonctionne aussi quand le job tourne
+        dans un autre worker (stockage SQLite).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.is_done or remaining <= 0:
+                return job
+            event = self._events.get(job_id)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, 1.0))
+                else:
+                    await asyncio.sleep(min(remaining, 0.5))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id, runner = await self._queue.get()
+            try:
+                await self._run(job_id, runner)
+            finally:
+                cleanup = self._cleanups.pop(job_id, None)
+                if cleanup is not None:
+                    cleanup()
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, runner: JobRunner) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        self.store.save(job)
+
+        try:
+            job.result = await runner()
+            job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job_id} en échec: {e}", exc_info=True)
+            job.status = JobStatus.FAILED
+            job.error = str(e)[:500]
+        job.finished_at = time.time()
+        self.store.save(job)
+
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+
+job_manager = JobManager(
+    store=make_job_store(settings.JOBS_STORE_BACKEND),
+    workers=settings.JOBS_WORKERS,
+    queue_size=settings.JOBS_QUEUE_SIZE,
+    ttl_seconds=settings.JOBS_TTL_SECONDS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+)
@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.models.cv import (
+    CVCanonical,
+    KeywordCategory,
+    KeywordMatch,
+    KeywordMatching,
+    KeywordMatchStatus,
+)
+from app.services.llm import llm_keyword_matching, llm_resolve_keywords
+
+# =========================
+# Normalisation
+# =========================
+
+_TOKEN_RE = re.compile(r"(?:\.(?=net))?[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9][+#]*")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents, espaces normalisés ("Développeur  Back-End" -> "developpeur back-end")."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+def normalize_term(text: str) -> str:
+    """Forme de comparaison d'un terme : tokens pliés ("Esprit d'équipe" -> "esprit d equipe")."""
+    return " ".join(tokenize(text))
+
+
+# =========================
+# Dictionnaire de compétences et synonymes
+# =========================
+
+# terme canonique -> (catégorie, alias). Les alias sont comparés après normalize_term().
+SKILL_DICTIONARY: dict[str, tuple[KeywordCategory, tuple[str, ...]]] = {
+    # Langages / technologies
+    "Python": (KeywordCategory.TECHNICAL_SKILL, ("python3", "py")),
+    "Java": (KeywordCategory.TECHNICAL_SKILL, ("j2ee", "jee")),
+    "JavaScript": (KeywordCategory.TECHNICAL_SKILL, ("js", "ecmascript", "es6")),
+    "TypeScript": (KeywordCategory.TECHNICAL_SKILL, ("ts",)),
+    "C#": (KeywordCategory.TECHNICAL_SKILL, ("csharp", "c sharp")),
+    "C++": (KeywordCategory.TECHNICAL_SKILL, ("cpp",)),
+    "Go": (KeywordCategory.TECHNICAL_SKILL, ("golang",)),
+    "PHP": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Ruby": (KeywordCategory.TECHNICAL_SKILL, ("ruby on rails", "rails")),
+    "Rust": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Kotlin": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Swift": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Scala": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "R": (KeywordCategory.TECHNICAL_SKILL, ("langage r",)),
+    "SQL": (KeywordCategory.TECHNICAL_SKILL, ("t-sql", "pl/sql", "plsql", "requetes sql")),
+    "HTML/CSS": (KeywordCategory.TECHNICAL_SKILL, ("html", "css", "html5", "css3")),
+    "React": (KeywordCategory.TECHNICAL_SKILL, ("reactjs", "react.js")),
+    "Angular": (KeywordCategory.TECHNICAL_SKILL, ("angularjs",)),
+    "Vue.js": (KeywordCategory.TECHNICAL_SKILL, ("vue", "vuejs")),
+    "Node.js": (KeywordCategory.TECHNICAL_SKILL, ("node", "nodejs")),
+    "Django": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Flask": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "FastAPI": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Spring": (KeywordCategory.TECHNICAL_SKILL, ("spring boot", "springboot")),
+    ".NET": (KeywordCategory.TECHNICAL_SKILL, ("dotnet", "asp.net", ".net core")),
+    "API REST": (KeywordCategory.TECHNICAL_SKILL, ("rest", "restful", "api rest", "rest api", "apis rest")),
+    "GraphQL": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "Microservices": (KeywordCategory.TECHNICAL_SKILL, ("micro-services", "microservice")),
+    "Machine Learning": (KeywordCategory.TECHNICAL_SKILL, ("ml", "apprentissage automatique")),
+    "Deep Learning": (KeywordCategory.TECHNICAL_SKILL, ("apprentissage profond",)),
+    "Data Science": (KeywordCategory.TECHNICAL_SKILL, ("science des donnees",)),
+    "NLP": (KeywordCategory.TECHNICAL_SKILL, ("traitement du langage naturel", "natural language processing")),
+    "Intelligence artificielle": (KeywordCategory.TECHNICAL_SKILL, ("ia", "ai", "artificial intelligence")),
+    "DevOps": (KeywordCategory.TECHNICAL_SKILL, ()),
+    "CI/CD": (KeywordCategory.TECHNICAL_SKILL, ("integration continue", "continuous integration", "ci", "cd")),
+    "Cybersécurité": (KeywordCategory.TECHNICAL_SKILL, ("securite informatique", "cybersecurity", "security")),
+    "Tests unitaires": (KeywordCategory.TECHNICAL_SKILL, ("unit tests", "unit testing", "tdd")),
+    "Comptabilité": (KeywordCategory.TECHNICAL_SKILL, ("accounting", "comptable")),
+    "Contrôle de gestion": (KeywordCategory.TECHNICAL_SKILL, ("controle de gestion", "controlling")),
+    "Marketing digital": (KeywordCategory.TECHNICAL_SKILL, ("digital marketing", "webmarketing", "marketing numerique")),
+    "SEO": (KeywordCategory.TECHNICAL_SKILL, ("referencement naturel",)),
+    "Gestion de projet": (KeywordCategory.TECHNICAL_SKILL, ("project management", "chef de projet", "pilotage de projet")),
+    "Agile": (KeywordCategory.TECHNICAL_SKILL, ("methodes agiles", "methodologie agile", "scrum", "kanban")),
+    "Recrutement": (KeywordCategory.TECHNICAL_SKILL, ("recruitment", "sourcing", "talent acquisition")),
+    "Vente": (KeywordCategory.TECHNICAL_SKILL, ("sales", "commercial", "business development")),
+    # Outils
+    "Docker": (KeywordCategory.TOOL, ("conteneurs", "containers")),
+    "Kubernetes": (KeywordCategory.TOOL, ("k8s",)),
+    "Git": (KeywordCategory.TOOL, ("github", "gitlab", "bitbucket")),
+    "Jenkins": (KeywordCategory.TOOL, ()),
+    "Terraform": (KeywordCategory.TOOL, ()),
+    "Ansible": (KeywordCategory.TOOL, ()),
+    "AWS": (KeywordCategory.TOOL, ("amazon web services",)),
+    "Azure": (KeywordCategory.TOOL, ("microsoft azure",)),
+    "GCP": (KeywordCategory.TOOL, ("google cloud", "google cloud platform")),
+    "Linux": (KeywordCategory.TOOL, ("unix", "ubuntu", "debian")),
+    "PostgreSQL": (KeywordCategory.TOOL, ("postgres",)),
+    "MySQL": (KeywordCategory.TOOL, ("mariadb",)),
+    "MongoDB": (KeywordCategory.TOOL, ("mongo",)),
+    "Redis": (KeywordCategory.TOOL, ()),
+    "Elasticsearch": (KeywordCategory.TOOL, ("elastic", "elk")),
+    "Kafka": (KeywordCategory.TOOL, ("apache kafka",)),
+    "Spark": (KeywordCategory.TOOL, ("apache spark", "pyspark")),
+    "Airflow": (KeywordCategory.TOOL, ("apache airflow",)),
+    "Pandas": (KeywordCategory.TOOL, ()),
+    "TensorFlow": (KeywordCategory.TOOL, ()),
+    "PyTorch": (KeywordCategory.TOOL, ("torch",)),
+    "Scikit-learn": (KeywordCategory.TOOL, ("sklearn", "scikit learn")),
+    "Power BI": (KeywordCategory.TOOL, ("powerbi",)),
+    "Tableau": (KeywordCategory.TOOL, ()),
+    "Excel": (KeywordCategory.TOOL, ("microsoft excel", "ms excel")),
+    "Pack Office": (KeywordCategory.TOOL, ("microsoft office", "ms office", "suite office", "office 365")),
+    "SAP": (KeywordCategory.TOOL, ()),
+    "Salesforce": (KeywordCategory.TOOL, ()),
+    "Jira": (KeywordCategory.TOOL, ("confluence",)),
+    "Figma": (KeywordCategory.TOOL, ()),
+    "Photoshop": (KeywordCategory.TOOL, ("adobe photoshop",)),
+    "Google Analytics": (KeywordCategory.TOOL, ("ga4",)),
+    # Compétences comportementales
+    "Travail en équipe": (KeywordCategory.SOFT_SKILL, ("esprit d'equipe", "teamwork", "team player", "travail d'equipe")),
+    "Communication": (KeywordCategory.SOFT_SKILL, ("aisance relationnelle", "communication skills")),
+    "Autonomie": (KeywordCategory.SOFT_SKILL, ("autonome", "autonomous")),
+    "Leadership": (KeywordCategory.SOFT_SKILL, ("management d'equipe", "encadrement", "team management")),
+    "Rigueur": (KeywordCategory.SOFT_SKILL, ("rigoureux", "rigoureuse", "attention to detail")),
+    "Adaptabilité": (KeywordCategory.SOFT_SKILL, ("adaptabilite", "flexibilite", "adaptability")),
+    "Esprit d'analyse": (KeywordCategory.SOFT_SKILL, ("capacites d'analyse", "analytical skills", "esprit analytique")),
+    "Résolution de problèmes": (KeywordCategory.SOFT_SKILL, ("problem solving", "resolution de problemes")),
+    "Anglais": (KeywordCategory.OTHER, ("english", "anglais courant", "anglais professionnel")),
+    # Formation
+    "Bac+5": (KeywordCategory.EDUCATION, ("master", "msc", "diplome d'ingenieur", "ecole d'ingenieur", "bac +5")),
+    "Bac+3": (KeywordCategory.EDUCATION, ("licence", "bachelor", "bac +3")),
+    "Bac+2": (KeywordCategory.EDUCATION, ("bts", "dut", "but", "bac +2")),
+    "Doctorat": (KeywordCategory.EDUCATION, ("phd", "these", "doctorate")),
+    "MBA": (KeywordCategory.EDUCATION, ()),
+}
+
+# Alias trop ambigus pour être détectés dans du texte libre ("dans le but de", "go-to-market") :
+# côté CV, seuls les champs structurés (compétences, outils, intitulés de poste et de
+# diplôme) les reconnaissent ; côté offre, seulement sous une graphie de _OFFER_SURFACE_FORMS
+_AMBIGUOUS_ALIASES = {"py", "ts", "r", "go", "ci", "cd", "but", "these", "node", "rest", "vue", "ai", "ia",
+                      "ml", "torch", "mongo", "elastic", "tableau", "spring", "rails", "commercial", "security"}
+
+# Graphies exactes d'alias ambigus reconnues dans une offre, en mot isolé ("Go", pas "go-to-market")
+_OFFER_SURFACE_FORMS = ("Go", "R", "IA", "AI", "BUT", "ML", "REST", "Spring", "Rails", "Node")
+_OFFER_SURFACE_RE = re.compile(
+    rf"(?<![\w/&'’-])({'|'.join(_OFFER_SURFACE_FORMS)})(?![\w/&'’+#-])"
+)
+
+_ALIASES: dict[str, str] = {}
+for _canonical, (_category, _aliases) in SKILL_DICTIONARY.items():
+    for _alias in (_canonical, *_aliases):
+        _ALIASES.setdefault(normalize_term(_alias), _canonical)
+
+_MAX_NGRAM = max(len(alias.split()) for alias in _ALIASES)
+
+_REQUIRED_RE = re.compile(r"requis|obligatoire|indispensable|impérati|exig|must|required|maitrise|maîtrise", re.I)
+_OPTIONAL_RE = re.compile(r"souhait|apprécié|appreci|un plus|atout|bonus|nice to have|idéalement|idealement", re.I)
+
+
+def canonical_term(term: str) -> str:
+    """Terme canonique du dictionnaire si `term` est un alias connu, sinon le terme normalisé."""
+    normalized = normalize_term(term)
+    return normalize_term(_ALIASES.get(normalized, normalized))
+
+
+# =========================
+# Index du CV
+# =========================
+
+def _trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Distance de Damerau-Levenshtein restreinte (les inversions "dokcer" comptent pour 1)."""
+    rows = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        rows[i][0] = i
+    for j in range(len(b) + 1):
+        rows[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+class CVTermIndex:
+    """
+    Index inversé des termes normalisés d'un CV (compétences, outils, intitulés,
+    formations...) avec index de trigrammes pour la recherche approchée.
+    """
+
+    def __init__(self, canonical: CVCanonical):
+        self.terms: dict[str, list[str]] = defaultdict(list)  # terme -> preuves
+        self._trigram_index: dict[str, set[str]] = defaultdict(set)
+        self._texts: list[tuple[str, str]] = []  # (texte plié, preuve) pour la recherche de phrases
+
+        for skill in canonical.hard_skills:
+            self._add_term(skill, f"Compétences: {skill}")
+        for tool in canonical.tools:
+            self._add_term(tool, f"Outils: {tool}")
+        for skill in canonical.soft_skills:
+            self._add_term(skill, f"Savoir-être: {skill}")
+        for certification in canonical.certifications:
+            self._add_term(certification, f"Certification: {certification}")
+        for language in canonical.languages:
+            if language.name:
+                self._add_term(language.name, f"Langue: {language.name} {language.level or ''}".strip())
+
+        for exp in canonical.experiences:
+            where = " @ ".join(x for x in (exp.title, exp.company) if x) or "Expérience"
+            for skill in exp.skills:
+                self._add_term(skill, f"{where}: {skill}")
+            if exp.title:
+                self._add_text(exp.title, where, structured=True)
+            for bullet in exp.bullets:
+                self._add_text(bullet, f"{where}: {bullet}")
+
+        for edu in canonical.education:
+            label = " - ".join(x for x in (edu.degree, edu.school) if x)
+            if edu.degree:
+                self._add_term(edu.degree, f"Formation: {label}")
+                self._add_text(edu.degree, f"Formation: {label}", structured=True)
+            for detail in edu.details:
+                self._add_text(detail, f"Formation: {label}")
+
+        for text in (canonical.headline, canonical.summary):
+            if text:
+                self._add_text(text, text[:120])
+
+    def _add_term(self, term: str, evidence: str) -> None:
+        key = canonical_term(term)
+        if not key:
+            return
+        if evidence not in self.terms[key]:
+            self.terms[key].append(evidence)
+        for trigram in _trigrams(key):
+            self._trigram_index[trigram].add(key)
+
+    def _add_text(self, text: str, evidence: str, structured: bool = False) -> None:
+        normalized = normalize_term(text)
+        self._texts.append((normalized, evidence))
+        # Les alias connus présents dans le texte deviennent des termes indexés ; les
+        # alias ambigus seulement dans un intitulé (poste, diplôme), pas en texte libre
+        for alias in _scan_aliases(normalized):
+            if structured or alias not in _AMBIGUOUS_ALIASES:
+                self._add_term(alias, evidence)
+
+    def exact(self, keyword: str) -> list[str]:
+        return self.terms.get(canonical_term(keyword), [])
+
+    def fuzzy(self, keyword: str, threshold: float = 0.6) -> tuple[str, float] | None:
+        """Terme du CV le plus proche (similarité trigrammes / distance d'édition)."""
+        key = canonical_term(keyword)
+        grams = _trigrams(key)
+        candidates: dict[str, int] = defaultdict(int)
+        for trigram in grams:
+            for term in self._trigram_index.get(trigram, ()):
+                candidates[term] += 1
+
+        best: tuple[str, float] | None = None
+        for term, shared in candidates.items():
+            score = shared / len(grams | _trigrams(term))
+            if len(key) >= 5 and _edit_distance(key, term) <= 1:
+                score = max(score, 0.9)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (term, score)
+        return best
+
+    def phrase(self, keyword: str) -> str | None:
+        """Preuve textuelle si le mot-clé apparaît tel quel dans une expérience/formation."""
+        term = normalize_term(keyword)
+        if not term or term in _AMBIGUOUS_ALIASES:
+            return None
+        pattern = re.compile(rf"(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])")
+        for normalized, evidence in self._texts:
+            if pattern.search(normalized):
+                return evidence
+        return None
+
+
+def _scan_aliases(normalized_text: str) -> list[str]:
+    """Alias du dictionnaire présents dans un texte normalisé (n-grammes jusqu'à _MAX_NGRAM)."""
+    tokens = normalized_text.split()
+    found: list[str] = []
+    i = 0
+    while i < len(tokens):
+        for n in range(min(_MAX_NGRAM, len(tokens) - i), 0, -1):
+            candidate = " ".join(tokens[i:i + n])
+            if candidate in _ALIASES:
+                found.append(candidate)
+                i += n - 1
+                break
+        i += 1
+    return found
+
+
+# =========================
+# Extraction des mots-clés de l'offre
+# =========================
+
+@dataclass
+class OfferKeyword:
+    keyword: str
+    category: KeywordCategory
+    importance: int
+    known: bool = True  # False : terme de l'offre hors dictionnaire et absent des termes du CV
+
+
+# Lignes d'exigences d'une offre : puces, ou intitulé "Compétences : ...", "Stack : ..."
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-•*·▪►✓–]|\d+[.)])\s*")
+_REQUIREMENTS_LABEL_RE = re.compile(
+    r"^[^:]{0,40}(compétence|competence|stack|technolog|outil|environnement|skills|profil|prérequis|prerequis)[^:]*:",
+    re.I,
+)
+_OFFER_WORD_RE = re.compile(r"[A-Za-zÀ-ÿ0-9][\w+#./-]*[\w+#]|[A-Za-z][+#]*")
+# Mots à majuscule des offres qui ne sont pas des compétences
+_OFFER_STOPWORDS = {
+    "nous", "vous", "notre", "votre", "nos", "vos", "le", "la", "les", "un", "une", "des", "et", "ou", "en",
+    "de", "du", "au", "aux", "avec", "pour", "sur", "dans", "par", "est", "sont", "the", "and", "or", "with",
+    "cdi", "cdd", "h/f", "f/h", "rtt", "tjm", "ca", "poste", "profil", "mission", "missions", "experience",
+    "experiences", "competences", "connaissance", "connaissances", "maitrise", "bonne", "bonnes", "une",
+    "france", "paris", "lyon", "marseille", "lille", "toulouse", "bordeaux", "nantes", "remote", "teletravail",
+    "bac", "ans", "an", "annee", "annees", "minimum", "requis", "souhaite", "souhaitee", "idealement", "atout",
+    "plus", "niveau", "junior", "senior", "confirme", "confirmee", "stack", "environnement", "technique",
+    "techniques", "outils", "skills", "requirements", "must", "nice", "have", "required",
+}
+# Termes hors dictionnaire retenus au plus par offre (le reste est du bruit probable)
+_MAX_UNKNOWN_OFFER_TERMS = 15
+
+
+def _is_requirement_line(line: str) -> bool:
+    return bool(
+        _LIST_ITEM_RE.match(line) or _REQUIREMENTS_LABEL_RE.match(line)
+        or _REQUIRED_RE.search(line) or _OPTIONAL_RE.search(line)
+    )
+
+
+def _looks_technical(word: str) -> bool:
+    """Nom propre ou terme technique : majuscule, chiffre ou +#./ ("Snowflake", "S3", "Next.js", "dbt" exclu)."""
+    return word[0].isupper() or any(c.isdigit() or c in "+#./" for c in word[1:])
+
+
+def _unknown_offer_terms(line: str) -> list[str]:
+    """
+    Termes techniques d'une ligne d'exigences absents du dictionnaire
+    ("Maîtrise de Snowflake et Looker Studio" -> ["Snowflake", "Looker Studio"]).
+    Le premier mot n'est retenu que sur une puce courte ou après "Compétences :"
+    (ailleurs, sa majuscule est celle du début de phrase).
+    """
+    content = _LIST_ITEM_RE.sub("", line)
+    enumeration = bool(_REQUIREMENTS_LABEL_RE.match(content))
+    if enumeration:
+        content = content.split(":", 1)[1]
+    words = list(_OFFER_WORD_RE.finditer(content))
+    first_allowed = enumeration or len(words) <= 3
+    terms: list[str] = []
+    current: list[str] = []
+    previous_end = 0
+    for position, match in enumerate(words):
+        word = match.group()
+        normalized = normalize_term(word)
+        candidate = (
+            normalized
+            and normalized not in _OFFER_STOPWORDS
+            and normalized not in _ALIASES
+            and not normalized.isdigit()
+            and len(normalized) >= 2
+            and _looks_technical(word)
+            and (position > 0 or first_allowed or not word[1:].islower())
+        )
+        # Un terme composé ne franchit pas de ponctuation ("Looker Studio", pas "BigQuery, S3")
+        adjacent = not content[previous_end:match.start()].strip()
+        previous_end = match.end()
+        if candidate and current and adjacent and len(current) < 3:
+            current.append(word)
+            continue
+        if current:
+            terms.append(" ".join(current))
+        current = [word] if candidate else []
+    if current:
+        terms.append(" ".join(current))
+    return terms
+
+
+def extract_offer_keywords(job_description: str, index: CVTermIndex | None = None) -> list[OfferKeyword]:
+    """
+    Mots-clés de l'offre : alias du dictionnaire détectés dans le texte, termes
+    du CV qui apparaissent aussi dans l'offre (outils de niche), et termes
+    techniques des lignes d'exigences hors dictionnaire (known=False), pour
+    qu'une exigence inconnue et absente du CV soit signalée comme manquante.
+    L'importance dépend des mentions "requis"/"souhaité" et de la fréquence.
+    """
+    keywords: dict[str, OfferKeyword] = {}
+    mentions: dict[str, int] = defaultdict(int)
+    unknown = 0
+
+    for line in job_description.splitlines() or [job_description]:
+        normalized = normalize_term(line)
+        if not normalized:
+            continue
+        base = 5 if _REQUIRED_RE.search(line) else 2 if _OPTIONAL_RE.search(line) else 3
+        found = [a for a in _scan_aliases(normalized) if a not in _AMBIGUOUS_ALIASES]
+        found += [normalize_term(form) for form in _OFFER_SURFACE_RE.findall(line)]
+        if index is not None:
+            found += [
+                term for term in index.terms
+                if len(term) >= 3 and term not in _ALIASES
+                and re.search(rf"(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])", normalized)
+            ]
+
+        for alias in found:
+            name = _ALIASES.get(alias)
+            category = SKILL_DICTIONARY[name][0] if name else KeywordCategory.OTHER
+            name = name or alias
+            mentions[name] += 1
+            current = keywords.get(name)
+            if current is None or base > current.importance:
+                keywords[name] = OfferKeyword(name, category, base)
+
+        if not _is_requirement_line(line):
+            continue
+        for term in _unknown_offer_terms(line):
+            key = normalize_term(term)
+            if any(normalize_term(name) == key for name in keywords):
+                continue
+            if unknown >= _MAX_UNKNOWN_OFFER_TERMS:
+                break
+            unknown += 1
+            mentions[term] += 1
+            keywords[term] = OfferKeyword(term, KeywordCategory.OTHER, base, known=False)
+
+    for name, keyword in keywords.items():
+        if mentions[name] >= 3:
+            keyword.importance = min(5, keyword.importance + 1)
+    return sorted(keywords.values(), key=lambda k: -k.importance)
+
+
+# =========================
+# Matching local
+# =========================
+
+def _coverage(matches: list[KeywordMatch]) -> int:
+    weights = {KeywordMatchStatus.PRESENT: 1.0, KeywordMatchStatus.PARTIAL: 0.5, KeywordMatchStatus.ABSENT: 0.0}
+    total = sum(m.importance for m in matches)
+    if not total:
+        return 0
+    return round(100 * sum(m.importance * weights[m.status] for m in matches) / total)
+
+
+def build_keyword_matching(matches: list[KeywordMatch]) -> KeywordMatching:
+    return KeywordMatching(
+        keywords=matches,
+        coverage_score=_coverage(matches),
+        critical_missing=[
+            m.keyword for m in matches if m.status == KeywordMatchStatus.ABSENT and m.importance >= 4
+        ],
+    )
+
+
+def match_keyword(index: CVTermIndex, keyword: OfferKeyword) -> KeywordMatch:
+    match = KeywordMatch(keyword=keyword.keyword, category=keyword.category, importance=keyword.importance)
+
+    evidence = index.exact(keyword.keyword)
+    if evidence:
+        match.status, match.evidence = KeywordMatchStatus.PRESENT, evidence[0]
+        return match
+
+    phrase = index.phrase(keyword.keyword)
+    if phrase:
+        match.status, match.evidence = KeywordMatchStatus.PRESENT, phrase
+        return match
+
+    fuzzy = index.fuzzy(keyword.keyword)
+    if fuzzy:
+        term, _score = fuzzy
+        match.status, match.evidence = KeywordMatchStatus.PARTIAL, index.terms[term][0]
+    return match
+
+
+def _local_matches(canonical: CVCanonical, job_description: str) -> tuple[list[KeywordMatch], set[str]]:
+    """Correspondances locales et noms des mots-clés hors dictionnaire (à confirmer en mode hybride)."""
+    index = CVTermIndex(canonical)
+    offer_keywords = extract_offer_keywords(job_description, index)
+    unknown = {kw.keyword for kw in offer_keywords if not kw.known}
+    return [match_keyword(index, kw) for kw in offer_keywords], unknown
+
+
+def local_keyword_matching(canonical: CVCanonical, job_description: str) -> KeywordMatching:
+    """Matching mots-clés déterministe, sans appel LLM (quelques millisecondes)."""
+    matches, _unknown = _local_matches(canonical, job_description)
+    return build_keyword_matching(matches)
+
+
+async def match_keywords(canonical: CVCanonical, job_description: str) -> KeywordMatching:
+    """
+    Matching mots-clés selon KEYWORD_MATCHING_MODE :
+    - "llm" : extraction et matching par le LLM (comportement historique) ;
+    - "fast" : moteur local uniquement ;
+    - "hybrid" : moteur local, seuls les mots-clés ambigus (partiels) et les
+      termes hors dictionnaire non trouvés dans le CV sont envoyés au LLM ;
+      repli sur "llm" si l'offre ne contient aucun terme connu.
+    """
+    mode = settings.KEYWORD_MATCHING_MODE.lower()
+    if mode == "llm":
+        return await llm_keyword_matching(canonical, job_description)
+
+    matches, unknown = _local_matches(canonical, job_description)
+    local = build_keyword_matching(matches)
+    if mode == "fast":
+        return local
+    if not matches:
+        return await llm_keyword_matching(canonical, job_description)
+
+    ambiguous = [
+        m for m in matches
+        if m.status == KeywordMatchStatus.PARTIAL
+        or (m.keyword in unknown and m.status != KeywordMatchStatus.PRESENT)
+    ]
+    if not ambiguous:
+        return local
+    resolved = {m.keyword: m for m in await llm_resolve_keywords(canonical, ambiguous)}
+    return build_keyword_matching([resolved.get(m.keyword, m) for m in matches])
@@ -1,15 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from openai import OpenAI
+import logging
+import time
+from contextvars import ContextVar
 
 from app.core.config import settings
+from app.services.cache import (
+    cache_key,
+    job_matching_cache,
+    job_profile_cache,
+    keyword_matching_cache,
+    normalize_job_description,
+)
+from app.services.metrics import record_llm_call
+from app.services.prompt_budget import count_tokens, pack_canonical, truncate_to_tokens
+from app.services.providers import LLMProvider, LLMResponse, make_provider, model_for
+from app.services.resilience import describe_llm_error
+from app.services.sections import merge_canonicals, segment_cv, split_section
 from app.models.cv import (
     CVCanonical,
     ATSAssessment,
     CVInsights,
     ATSSubScores,
     JobMatching,
+    JobProfile,
+    JobProfileKeyword,
     KeywordMatching,
     KeywordMatch,
     KeywordMatchStatus,
@@ -19,109 +36,386 @@ from app.models.cv import (
     ComparisonCriterion,
 )
 
-# Client OpenAI initialisé uniquement si la clé est disponible
-client: OpenAI | None = None
-if getattr(settings, "OPENAI_API_KEY", None):
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# À incrémenter à chaque modification d'un prompt : invalide les caches associés
+CANONICALIZE_PROMPT_VERSION = "3"
+JOB_MATCHING_PROMPT_VERSION = "3"
+KEYWORD_MATCHING_PROMPT_VERSION = "3"
+FUSED_ANALYSIS_PROMPT_VERSION = "2"
+JOB_PROFILE_PROMPT_VERSION = "1"
+
+logger = logging.getLogger(__name__)
+
+# Champs du CV inutiles pour comparer à une offre (et données personnelles)
+MATCHING_EXCLUDED_FIELDS = ("email", "phone", "links", "extraction_warnings")
+
+# Fournisseur LLM (OpenAI, endpoint compatible ou rejeu de fixtures), None sans
+# clé OpenAI. Le client HTTP sous-jacent est partagé (pool de connexions
+# keep-alive) afin qu'un même worker puisse garder de nombreux appels en vol.
+provider: LLMProvider | None = make_provider()
+# Fournisseur de la tâche en cours à la place du fournisseur interactif (lot via l'API Batch)
+provider_override: ContextVar[LLMProvider | None] = ContextVar("provider_override", default=None)
+
+
+async def close_llm_client() -> None:
+    """Ferme proprement le pool HTTP partagé (appelé à l'arrêt de l'application)."""
+    if provider is not None:
+        await provider.close()
+
+
+async def _chat_completion(
+    stage: str,
+    messages: list[dict],
+    temperature: float | None = None,
+    json_schema: dict | None = None,
+) -> LLMResponse:
+    """Appel JSON au fournisseur configuré, avec le modèle choisi pour l'étape (durée et tokens mesurés)."""
+    start = time.perf_counter()
+    response = await (provider_override.get() or provider).complete(
+        stage, model_for(stage), messages, json_mode=True, temperature=temperature, json_schema=json_schema
+    )
+    record_llm_call(
+        stage,
+        response.model,
+        time.perf_counter() - start,
+        response.prompt_tokens,
+        response.completion_tokens,
+    )
+    return response
+
+
+def _clamp_score(score, default: int) -> int:
+    try:
+        return max(0, min(100, int(score)))
+    except (ValueError, TypeError):
+        return default
+
+
+def _list_field(data: dict, name: str) -> list:
+    value = data.get(name, [])
+    return value if isinstance(value, list) else []
+
+
+# =========================
+# Parsing des réponses (partagé entre les modes par étape et fusionné)
+# =========================
+
+def _parse_ats_and_insights(result: dict) -> tuple[ATSAssessment, CVInsights]:
+    ats_data = result.get("ats") if isinstance(result.get("ats"), dict) else {}
+    subscores_data = ats_data.get("subscores") if isinstance(ats_data.get("subscores"), dict) else {}
+
+    ats = ATSAssessment(
+        total_score=_clamp_score(ats_data.get("total_score", 50), 50),
+        subscores=ATSSubScores(
+            readability=_clamp_score(subscores_data.get("readability", 50), 50),
+            structure=_clamp_score(subscores_data.get("structure", 50), 50),
+            chronology=_clamp_score(subscores_data.get("chronology", 50), 50),
+            evidence=_clamp_score(subscores_data.get("evidence", 50), 50),
+            skills_clarity=_clamp_score(subscores_data.get("skills_clarity", 50), 50),
+        ),
+        issues=_list_field(ats_data, "issues"),
+        quick_wins=_list_field(ats_data, "quick_wins"),
+    )
+
+    insights_data = result.get("insights") if isinstance(result.get("insights"), dict) else {}
+    insights = CVInsights(
+        positioning=_list_field(insights_data, "positioning"),
+        strengths=_list_field(insights_data, "strengths"),
+        blind_spots=_list_field(insights_data, "blind_spots"),
+        rewrite_suggestions=_list_field(insights_data, "rewrite_suggestions"),
+    )
+    return ats, insights
+
+
+def _parse_job_matching(result: dict) -> JobMatching:
+    return JobMatching(
+        overall_score=_clamp_score(result.get("overall_score", 0), 0),
+        skills_match=_clamp_score(result.get("skills_match", 0), 0),
+        experience_match=_clamp_score(result.get("experience_match", 0), 0),
+        education_match=_clamp_score(result.get("education_match", 0), 0),
+        missing_requirements=_list_field(result, "missing_requirements"),
+        strengths=_list_field(result, "strengths"),
+        recommendations=_list_field(result, "recommendations"),
+    )
+
+
+_KEYWORD_CATEGORIES = {
+    "technical_skill": KeywordCategory.TECHNICAL_SKILL,
+    "soft_skill": KeywordCategory.SOFT_SKILL,
+    "tool": KeywordCategory.TOOL,
+    "education": KeywordCategory.EDUCATION,
+    "experience": KeywordCategory.EXPERIENCE,
+}
+
+
+def _parse_keyword_matching(result: dict) -> KeywordMatching:
+    keyword_matches: list[KeywordMatch] = []
+    for kw_data in _list_field(result, "keywords"):
+        try:
+            status_str = str(kw_data.get("status", "absent")).lower()
+            if status_str == "present":
+                status = KeywordMatchStatus.PRESENT
+            elif status_str == "partial":
+                status = KeywordMatchStatus.PARTIAL
+            else:
+                status = KeywordMatchStatus.ABSENT
+
+            category = _KEYWORD_CATEGORIES.get(str(kw_data.get("category", "other")).lower(), KeywordCategory.OTHER)
+
+            try:
+                importance = int(kw_data.get("importance", 3))
+            except (ValueError, TypeError):
+                importance = 3
+            importance = min(5, max(1, importance))
+
+            keyword_matches.append(
+                KeywordMatch(
+                    keyword=str(kw_data.get("keyword", "")),
+                    category=category,
+                    status=status,
+                    evidence=kw_data.get("evidence"),
+                    importance=importance,
+                )
+            )
+        except Exception:
+            continue  # ignorer les mots-clés mal formés
+
+    return KeywordMatching(
+        keywords=keyword_matches,
+        coverage_score=_clamp_score(result.get("coverage_score", 0), 0),
+        critical_missing=_list_field(result, "critical_missing"),
+    )
+
+
+# Champs du CV canonique, tels que décrits dans les prompts d'extraction
+CANONICAL_FIELDS = {
+    "full_name": "nom complet",
+    "headline": "titre/profession",
+    "email": "adresse email",
+    "phone": "numéro de téléphone",
+    "location": "localisation",
+    "summary": "résumé professionnel",
+    "experiences": "liste d'objets avec title, company, location, dates (start, end, is_current), bullets, skills",
+    "education": "liste d'objets avec degree, school, location, dates, details",
+    "hard_skills": "liste de compétences techniques",
+    "soft_skills": "liste de compétences comportementales",
+    "tools": "liste d'outils/logiciels",
+    "languages": "liste d'objets avec name et level",
+    "certifications": "liste de certifications",
+    "links": "liste d'objets avec label et url",
+}
+
+# Canonicalisation par sections : groupe de sections -> champs demandés au LLM.
+# Les sections non listées (en-tête, profil, compétences, langues...) vont dans "profile".
+SECTION_GROUPS = {"experience": "experience", "education": "education"}
+SECTION_FIELDS = {
+    "profile": tuple(f for f in CANONICAL_FIELDS if f not in ("experiences", "education")),
+    "experience": ("experiences",),
+    "education": ("education", "certifications"),
+}
+_SECTION_LABELS = {
+    "profile": "en-tête, profil et compétences",
+    "experience": "expériences professionnelles",
+    "education": "formation",
+}
+
+
+def _canonical_from_result(result: dict, fields=None) -> tuple[CVCanonical, list[str]]:
+    """CV canonique validé à partir de la réponse (restreinte à `fields`), avertissements éventuels."""
+    if fields is not None:
+        result = {name: value for name, value in result.items() if name in fields}
+    try:
+        return CVCanonical(**result), []
+    except Exception as validation_error:
+        # Si la validation échoue, créer un modèle minimal avec les données disponibles
+        canonical = CVCanonical()
+        for name in ("full_name", "email", "experiences", "hard_skills"):
+            if name in result:
+                try:
+                    setattr(canonical, name, CVCanonical(**{name: result[name]}).__getattribute__(name))
+                except Exception:
+                    pass
+        return canonical, [f"Validation partielle: {str(validation_error)}"]
+
+
+def _section_plan(cv_text: str) -> list[tuple[str, str, tuple[str, ...]]] | None:
+    """
+    Appels de la canonicalisation par sections : (groupe, texte, champs).
+    None si le CV est traité en un seul appel (mode "single", CV court en
+    mode "auto", ou texte sans intitulé reconnu qui tient dans un appel).
+    """
+    mode = settings.CANONICALIZE_MODE.lower()
+    if mode == "single":
+        return None
+    min_tokens = settings.CANONICALIZE_SECTIONS_MIN_TOKENS or settings.PROMPT_CV_TEXT_MAX_TOKENS
+    if mode == "auto" and count_tokens(cv_text) <= min_tokens:
+        return None
+
+    max_tokens = settings.CANONICALIZE_SECTION_MAX_TOKENS
+    groups: dict[str, list[str]] = {group: [] for group in SECTION_FIELDS}
+    for section in segment_cv(cv_text):
+        groups[SECTION_GROUPS.get(section.kind, "profile")].append(section.text)
+
+    if not groups["experience"] and not groups["education"]:
+        # Aucun intitulé reconnu : morceaux du texte entier, tous les champs demandés à chacun
+        chunks = split_section(cv_text, max_tokens)
+        if len(chunks) < 2:
+            return None
+        return [("full", chunk, tuple(CANONICAL_FIELDS)) for chunk in chunks]
+
+    plan = []
+    for group, fields in SECTION_FIELDS.items():
+        # Sections d'un même type regroupées (un sous-titre "Missions" reste avec son poste)
+        text = "\n\n".join(groups[group])
+        if text:
+            plan += [(group, chunk, fields) for chunk in split_section(text, max_tokens)]
+    return plan
+
+
+async def _canonicalize_section(group: str, text: str, fields: tuple[str, ...]) -> CVCanonical:
+    description = "\n".join(f"- {name}: {CANONICAL_FIELDS[name]}" for name in fields)
+    scope = (
+        f"Le texte suivant est un extrait d'un CV ({_SECTION_LABELS[group]}). Extrais uniquement les champs demandés."
+        if group in _SECTION_LABELS
+        else "Le texte suivant est un extrait d'un CV. Extrais les informations présentes dans cet extrait."
+    )
+
+    prompt = f"""Tu es un expert en extraction de données de CV. {scope}
+
+Texte du CV:
+{text}
 
+Extrais les informations suivantes au format JSON strict (pas de markdown, juste du JSON):
+{description}
+
+Réponds UNIQUEMENT avec un JSON valide, sans texte avant ou après."""
 
-def llm_canonicalize(cv_text: str, extraction_warnings: list[str]) -> CVCanonical:
+    response = await _chat_completion(
+        "canonicalize",
+        messages=[
+            {"role": "system", "content": "Tu es un expert en extraction de données structurées. Tu réponds toujours en JSON valide."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.1,
+    )
+    if not response.content:
+        raise ValueError("Réponse vide du fournisseur LLM")
+
+    canonical, warnings = _canonical_from_result(json.loads(response.content), fields)
+    canonical.extraction_warnings = warnings
+    return canonical
+
+
+async def _canonicalize_sections(
+    plan: list[tuple[str, str, tuple[str, ...]]],
+    extraction_warnings: list[str],
+) -> tuple[CVCanonical, bool]:
+    """
+    Canonicalisation par sections, en parallèle, fusionnée en un seul CV : la
+    latence est celle de la plus longue section et aucun passage n'est tronqué.
+    Renvoie aussi si toutes les sections ont été analysées (sinon résultat
+    partiel, à ne pas mettre en cache).
+    """
+    results = await asyncio.gather(
+        *(_canonicalize_section(group, text, fields) for group, text, fields in plan),
+        return_exceptions=True,
+    )
+    parts: list[CVCanonical] = []
+    warnings = list(extraction_warnings)
+    for (group, _text, _fields), result in zip(plan, results):
+        if isinstance(result, BaseException):
+            reason = f"Erreur parsing JSON: {str(result)}" if isinstance(result, json.JSONDecodeError) else describe_llm_error(result)
+            warnings.append(f"Section {_SECTION_LABELS.get(group, group)} non analysée: {reason}")
+            continue
+        parts.append(result)
+        warnings += result.extraction_warnings
+
+    canonical = merge_canonicals(parts)
+    canonical.extraction_warnings = list(dict.fromkeys(warnings))
+    return canonical, len(parts) == len(plan)
+
+
+async def llm_canonicalize(cv_text: str, extraction_warnings: list[str]) -> CVCanonical:
     """
     Extrait et structure le CV en format canonique via OpenAI.
+
+    Selon CANONICALIZE_MODE, un seul appel (texte tronqué au budget) ou un
+    appel par groupe de sections ("auto" : par sections au-delà de
+    CANONICALIZE_SECTIONS_MIN_TOKENS).
+    """
+    canonical, _complete = await llm_canonicalize_with_status(cv_text, extraction_warnings)
+    return canonical
+
+
+async def llm_canonicalize_with_status(cv_text: str, extraction_warnings: list[str]) -> tuple[CVCanonical, bool]:
+    """
+    Comme llm_canonicalize, en indiquant si le résultat est complet : False
+    après une erreur du fournisseur, même si des sections ont été analysées
+    (le résultat partiel ne doit pas être mis en cache).
     """
-    if not client:
+    if provider is None:
         return CVCanonical(
             summary=None,
             extraction_warnings=extraction_warnings + ["OpenAI API key non configurée (OPENAI_API_KEY manquant)."],
-        )
+        ), False
+
+    plan = _section_plan(cv_text)
+    if plan is not None:
+        return await _canonicalize_sections(plan, extraction_warnings)
+
+    cv_text, dropped_tokens = truncate_to_tokens(cv_text, settings.PROMPT_CV_TEXT_MAX_TOKENS)
+    if dropped_tokens:
+        extraction_warnings = extraction_warnings + [
+            f"CV long : les {dropped_tokens} derniers tokens du document n'ont pas été analysés."
+        ]
+
+    description = "\n".join(f"- {name}: {text}" for name, text in CANONICAL_FIELDS.items())
 
     prompt = f"""Tu es un expert en extraction de données de CV. Analyse le texte suivant et extrais les informations structurées.
 
 Texte du CV:
-{cv_text[:8000]}
+{cv_text}
 
 Extrais les informations suivantes au format JSON strict (pas de markdown, juste du JSON):
-- full_name: nom complet
-- headline: titre/profession
-- email: adresse email
-- phone: numéro de téléphone
-- location: localisation
-- summary: résumé professionnel
-- experiences: liste d'objets avec title, company, location, dates (start, end, is_current), bullets, skills
-- education: liste d'objets avec degree, school, location, dates, details
-- hard_skills: liste de compétences techniques
-- soft_skills: liste de compétences comportementales
-- tools: liste d'outils/logiciels
-- languages: liste d'objets avec name et level
-- certifications: liste de certifications
-- links: liste d'objets avec label et url
+{description}
 
 Réponds UNIQUEMENT avec un JSON valide, sans texte avant ou après."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "canonicalize",
             messages=[
                 {"role": "system", "content": "Tu es un expert en extraction de données structurées. Tu réponds toujours en JSON valide."},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
             temperature=0.1,
         )
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Réponse vide de l'API OpenAI")
-
-        result = json.loads(response.choices[0].message.content)
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
 
-        # Valider et créer le modèle avec gestion des erreurs de validation
-        try:
-            canonical = CVCanonical(**result)
-        except Exception as validation_error:
-            # Si la validation échoue, créer un modèle minimal avec les données disponibles
-            canonical = CVCanonical()
-            if "full_name" in result:
-                canonical.full_name = result.get("full_name")
-            if "email" in result:
-                canonical.email = result.get("email")
-            if "experiences" in result:
-                canonical.experiences = result.get("experiences", [])
-            if "hard_skills" in result:
-                canonical.hard_skills = result.get("hard_skills", [])
-            canonical.extraction_warnings = extraction_warnings + [f"Validation partielle: {str(validation_error)}"]
-            return canonical
-
-        canonical.extraction_warnings = extraction_warnings
-        return canonical
+        canonical, warnings = _canonical_from_result(json.loads(response.content))
+        canonical.extraction_warnings = extraction_warnings + warnings
+        return canonical, True
 
     except json.JSONDecodeError as e:
         return CVCanonical(
             summary=None,
             extraction_warnings=extraction_warnings + [f"Erreur parsing JSON: {str(e)}"],
-        )
+        ), False
     except Exception as e:
-        error_msg = str(e)
-        # Gestion spécifique des erreurs OpenAI
-        if "429" in error_msg or "insufficient_quota" in error_msg.lower():
-            user_message = "Quota OpenAI dépassé. Vérifiez votre plan et vos factures sur https://platform.openai.com/account/billing"
-        elif "401" in error_msg or "invalid_api_key" in error_msg.lower():
-            user_message = "Clé API OpenAI invalide. Vérifiez la variable d'environnement OPENAI_API_KEY."
-        elif "rate_limit" in error_msg.lower():
-            user_message = "Limite de taux OpenAI atteinte. Veuillez réessayer dans quelques instants."
-        else:
-            user_message = f"Erreur LLM: {error_msg[:200]}"
+        user_message = describe_llm_error(e)
 
         return CVCanonical(
             summary=None,
             extraction_warnings=extraction_warnings + [user_message],
-        )
+        ), False
 
 
-def llm_ats_and_insights(canonical: CVCanonical) -> tuple[ATSAssessment, CVInsights]:
+async def llm_ats_and_insights(canonical: CVCanonical) -> tuple[ATSAssessment, CVInsights]:
     """
     Analyse le CV pour générer un score ATS et des insights via OpenAI.
     """
-    if not client:
+    if provider is None:
         ats = ATSAssessment(
             total_score=50,
             subscores=ATSSubScores(
@@ -142,12 +436,12 @@ def llm_ats_and_insights(canonical: CVCanonical) -> tuple[ATSAssessment, CVInsig
         )
         return ats, insights
 
-    canonical_json = canonical.model_dump_json()
+    packed = pack_canonical(canonical, settings.PROMPT_CANONICAL_MAX_TOKENS)
 
     prompt = f"""Tu es un expert en ATS (Applicant Tracking System) et en optimisation de CV. Analyse le CV suivant et génère un score ATS détaillé ainsi que des insights.
 
 CV structuré:
-{canonical_json[:6000]}
+{packed.text}
 
 Génère un JSON avec:
 - ats: objet avec total_score (0-100), subscores (readability, structure, chronology, evidence, skills_clarity tous 0-100), issues (liste de problèmes), quick_wins (liste de suggestions rapides)
@@ -156,55 +450,21 @@ Génère un JSON avec:
 Réponds UNIQUEMENT avec un JSON valide avec les clés "ats" et "insights"."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "ats",
             messages=[
                 {"role": "system", "content": "Tu es un expert en ATS et optimisation de CV. Tu réponds toujours en JSON valide."},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
             temperature=0.2,
         )
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Réponse vide de l'API OpenAI")
-
-        result = json.loads(response.choices[0].message.content)
-
-        # Extraire et valider les données ATS
-        ats_data = result.get("ats", {})
-        subscores_data = ats_data.get("subscores", {})
-
-        def clamp_score(score, default=50):
-            try:
-                score_i = int(score)
-                return max(0, min(100, score_i))
-            except (ValueError, TypeError):
-                return default
-
-        ats = ATSAssessment(
-            total_score=clamp_score(ats_data.get("total_score", 50)),
-            subscores=ATSSubScores(
-                readability=clamp_score(subscores_data.get("readability", 50)),
-                structure=clamp_score(subscores_data.get("structure", 50)),
-                chronology=clamp_score(subscores_data.get("chronology", 50)),
-                evidence=clamp_score(subscores_data.get("evidence", 50)),
-                skills_clarity=clamp_score(subscores_data.get("skills_clarity", 50)),
-            ),
-            issues=ats_data.get("issues", []) if isinstance(ats_data.get("issues"), list) else [],
-            quick_wins=ats_data.get("quick_wins", []) if isinstance(ats_data.get("quick_wins"), list) else [],
-        )
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
 
-        # Extraire et valider les insights
-        insights_data = result.get("insights", {})
-        insights = CVInsights(
-            positioning=insights_data.get("positioning", []) if isinstance(insights_data.get("positioning"), list) else [],
-            strengths=insights_data.get("strengths", []) if isinstance(insights_data.get("strengths"), list) else [],
-            blind_spots=insights_data.get("blind_spots", []) if isinstance(insights_data.get("blind_spots"), list) else [],
-            rewrite_suggestions=insights_data.get("rewrite_suggestions", []) if isinstance(insights_data.get("rewrite_suggestions"), list) else [],
-        )
+        result = json.loads(response.content)
 
-        return ats, insights
+        return _parse_ats_and_insights(result)
 
     except json.JSONDecodeError as e:
         ats = ATSAssessment(
@@ -227,15 +487,7 @@ Réponds UNIQUEMENT avec un JSON valide avec les clés "ats" et "insights"."""
         )
         return ats, insights
     except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "insufficient_quota" in error_msg.lower():
-            user_message = "Quota OpenAI dépassé. Rechargez votre compte sur https://platform.openai.com/account/billing"
-        elif "401" in error_msg or "invalid_api_key" in error_msg.lower():
-            user_message = "Clé API OpenAI invalide (OPENAI_API_KEY)."
-        elif "rate_limit" in error_msg.lower():
-            user_message = "Limite de taux atteinte, réessayez plus tard."
-        else:
-            user_message = f"Erreur LLM: {error_msg[:200]}"
+        user_message = describe_llm_error(e)
 
         ats = ATSAssessment(
             total_score=50,
@@ -258,11 +510,186 @@ Réponds UNIQUEMENT avec un JSON valide avec les clés "ats" et "insights"."""
         return ats, insights
 
 
-def llm_job_matching(canonical: CVCanonical, job_description: str) -> JobMatching:
+# =========================
+# Profil de poste : l'offre compilée une fois, réutilisée pour chaque CV
+# =========================
+
+# Compilations en cours par offre : des matchings concurrents pour une même
+# offre (comparaison, étapes parallèles) attendent le même appel LLM
+_job_profile_tasks: dict[str, asyncio.Task] = {}
+
+
+def _offer_mode() -> str:
+    # Partie des clés de cache : un résultat obtenu sur le profil compilé n'est pas
+    # servi quand le texte brut est demandé, et inversement
+    return "profile" if settings.JOB_PROFILE_ENABLED else "raw"
+
+
+def _parse_job_profile(result: dict) -> JobProfile:
+    keywords: list[JobProfileKeyword] = []
+    seen: set[str] = set()
+    for kw_data in _list_field(result, "keywords"):
+        if not isinstance(kw_data, dict):
+            continue
+        keyword = str(kw_data.get("keyword", "")).strip()
+        if not keyword or keyword.lower() in seen:
+            continue
+        seen.add(keyword.lower())
+        try:
+            importance = min(5, max(1, int(kw_data.get("importance", 3))))
+        except (ValueError, TypeError):
+            importance = 3
+        keywords.append(
+            JobProfileKeyword(
+                keyword=keyword,
+                category=_KEYWORD_CATEGORIES.get(str(kw_data.get("category", "other")).lower(), KeywordCategory.OTHER),
+                importance=importance,
+                required=bool(kw_data.get("required", False)),
+            )
+        )
+
+    try:
+        min_years = result.get("min_years_experience")
+        min_years = max(0.0, float(min_years)) if min_years is not None else None
+    except (ValueError, TypeError):
+        min_years = None
+
+    return JobProfile(
+        title=result.get("title") or None,
+        seniority=result.get("seniority") or None,
+        min_years_experience=min_years,
+        education=_list_field(result, "education"),
+        languages=_list_field(result, "languages"),
+        responsibilities=_list_field(result, "responsibilities"),
+        keywords=sorted(keywords, key=lambda k: (-k.importance, not k.required)),
+    )
+
+
+def render_job_profile(profile: JobProfile) -> str:
+    """Forme compacte du profil pour les prompts (quelques dizaines de tokens par exigence)."""
+    lines = []
+    if profile.title:
+        lines.append(f"Poste: {profile.title}" + (f" ({profile.seniority})" if profile.seniority else ""))
+    if profile.min_years_experience is not None:
+        lines.append(f"Expérience minimale: {profile.min_years_experience:g} ans")
+    if profile.education:
+        lines.append(f"Formation: {'; '.join(profile.education)}")
+    if profile.languages:
+        lines.append(f"Langues: {'; '.join(profile.languages)}")
+    if profile.responsibilities:
+        lines.append(f"Missions: {'; '.join(profile.responsibilities)}")
+    if profile.keywords:
+        lines.append("Mots-clés (catégorie, importance 1-5, * = requis):")
+        lines += [
+            f"- {kw.keyword} ({kw.category.value}, {kw.importance}{'*' if kw.required else ''})"
+            for kw in profile.keywords
+        ]
+    return "\n".join(lines)
+
+
+async def _compile_job_profile(job_description: str, key: str) -> JobProfile | None:
+    job_text, _ = truncate_to_tokens(job_description, settings.PROMPT_JOB_DESCRIPTION_MAX_TOKENS)
+
+    prompt = f"""Tu es un expert en recrutement. Compile l'offre d'emploi suivante en un profil de poste structuré et concis.
+
+Offre d'emploi:
+{job_text}
+
+Génère un JSON avec:
+- title: intitulé du poste
+- seniority: niveau attendu ("junior", "confirmé", "senior", "lead"...) ou null
+- min_years_experience: années d'expérience minimales demandées (nombre) ou null
+- education: formations ou diplômes attendus (liste courte)
+- languages: langues exigées avec niveau (liste)
+- responsibilities: missions principales (5 au plus, formulations courtes)
+- keywords: mots-clés importants de l'offre (compétences techniques, comportementales, outils, formations, expériences), chacun avec:
+  - keyword: le mot-clé ou compétence (forme courte et standard)
+  - category: "technical_skill", "soft_skill", "tool", "education", "experience", ou "other"
+  - importance: 1 à 5 (5 = critique pour le poste)
+  - required: true si l'offre l'exige explicitement, false s'il est souhaité
+
+Réponds UNIQUEMENT avec un JSON valide."""
+
+    try:
+        response = await _chat_completion(
+            "job_profile",
+            messages=[
+                {"role": "system", "content": "Tu es un expert en compilation d'offres d'emploi. Tu réponds toujours en JSON valide."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+        )
+
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
+
+        profile = _parse_job_profile(json.loads(response.content))
+    except Exception as e:
+        logger.warning(f"Compilation de l'offre impossible, texte brut utilisé ({describe_llm_error(e)})")
+        return None
+
+    # Un profil vide n'apporterait rien aux matchings : texte brut, sans mise en cache
+    if not profile.keywords:
+        return None
+    job_profile_cache.set(key, profile)
+    return profile
+
+
+async def compile_job_profile(job_description: str) -> JobProfile | None:
+    """
+    Profil de poste de l'offre (mots-clés pondérés, expérience et formation
+    requises), compilé une fois par offre normalisée puis servi par le cache.
+    Les appels concurrents pour une même offre partagent la même compilation.
+    None si la compilation est désactivée ou impossible (texte brut utilisé).
+    """
+    if provider is None or not settings.JOB_PROFILE_ENABLED:
+        return None
+
+    key = cache_key(
+        "job_profile",
+        normalize_job_description(job_description),
+        JOB_PROFILE_PROMPT_VERSION,
+        model_for("job_profile"),
+    )
+    cached = job_profile_cache.get(key)
+    if cached is not None:
+        return cached
+
+    task = _job_profile_tasks.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_compile_job_profile(job_description, key))
+        _job_profile_tasks[key] = task
+        task.add_done_callback(lambda _: _job_profile_tasks.pop(key, None))
+    # shield : l'annulation d'un appelant n'interrompt pas la compilation des autres
+    return await asyncio.shield(task)
+
+
+async def _offer_context(job_description: str) -> tuple[JobProfile | None, str]:
+    """Bloc « offre » des prompts : le profil compilé s'il existe, sinon le texte brut tronqué."""
+    profile = await compile_job_profile(job_description)
+    if profile is not None:
+        return profile, f"Profil de poste (compilé depuis l'offre):\n{render_job_profile(profile)}"
+    job_text, _ = truncate_to_tokens(job_description, settings.PROMPT_JOB_DESCRIPTION_MAX_TOKENS)
+    return None, f"Offre d'emploi:\n{job_text}"
+
+
+def _apply_profile_weights(matching: KeywordMatching, profile: JobProfile | None) -> KeywordMatching:
+    # Catégorie et importance font foi dans le profil : le LLM ne fournit que statut et preuve
+    if profile is None:
+        return matching
+    by_name = {kw.keyword.lower(): kw for kw in profile.keywords}
+    for match in matching.keywords:
+        reference = by_name.get(match.keyword.lower())
+        if reference is not None:
+            match.category, match.importance = reference.category, reference.importance
+    return matching
+
+
+async def llm_job_matching(canonical: CVCanonical, job_description: str) -> JobMatching:
     """
     Compare le CV avec une offre d'emploi et génère un score d'adéquation via OpenAI.
     """
-    if not client:
+    if provider is None:
         return JobMatching(
             overall_score=0,
             skills_match=0,
@@ -275,13 +702,29 @@ def llm_job_matching(canonical: CVCanonical, job_description: str) -> JobMatchin
 
     canonical_json = canonical.model_dump_json()
 
+    # Résultat mémoïsé par couple (CV canonique, offre normalisée, version du prompt)
+    key = cache_key(
+        "job_matching",
+        canonical_json,
+        normalize_job_description(job_description),
+        _offer_mode(),
+        JOB_MATCHING_PROMPT_VERSION,
+        model_for("job_matching"),
+    )
+    cached = job_matching_cache.get(key)
+    if cached is not None:
+        cached.from_cache = True
+        return cached
+
+    packed = pack_canonical(canonical, settings.PROMPT_CANONICAL_MAX_TOKENS, exclude=MATCHING_EXCLUDED_FIELDS)
+    _profile, offer = await _offer_context(job_description)
+
     prompt = f"""Tu es un expert en recrutement. Compare le CV suivant avec l'offre d'emploi et évalue le degré d'adéquation.
 
 CV structuré:
-{canonical_json[:6000]}
+{packed.text}
 
-Offre d'emploi:
-{job_description[:4000]}
+{offer}
 
 Génère un JSON avec:
 - overall_score: score global d'adéquation (0-100)
@@ -295,37 +738,23 @@ Génère un JSON avec:
 Réponds UNIQUEMENT avec un JSON valide."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "job_matching",
             messages=[
                 {"role": "system", "content": "Tu es un expert en recrutement et matching CV/offre. Tu réponds toujours en JSON valide."},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
             temperature=0.2,
         )
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Réponse vide de l'API OpenAI")
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
 
-        result = json.loads(response.choices[0].message.content)
-
-        def clamp_score(score, default=0):
-            try:
-                score_i = int(score)
-                return max(0, min(100, score_i))
-            except (ValueError, TypeError):
-                return default
+        result = json.loads(response.content)
 
-        return JobMatching(
-            overall_score=clamp_score(result.get("overall_score", 0)),
-            skills_match=clamp_score(result.get("skills_match", 0)),
-            experience_match=clamp_score(result.get("experience_match", 0)),
-            education_match=clamp_score(result.get("education_match", 0)),
-            missing_requirements=result.get("missing_requirements", []) if isinstance(result.get("missing_requirements"), list) else [],
-            strengths=result.get("strengths", []) if isinstance(result.get("strengths"), list) else [],
-            recommendations=result.get("recommendations", []) if isinstance(result.get("recommendations"), list) else [],
-        )
+        job_matching = _parse_job_matching(result)
+        job_matching_cache.set(key, job_matching)
+        return job_matching
 
     except json.JSONDecodeError as e:
         return JobMatching(
@@ -338,15 +767,7 @@ Réponds UNIQUEMENT avec un JSON valide."""
             recommendations=[],
         )
     except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "insufficient_quota" in error_msg.lower():
-            user_message = "Quota OpenAI dépassé. Rechargez votre compte pour analyser l'adéquation CV/offre."
-        elif "401" in error_msg or "invalid_api_key" in error_msg.lower():
-            user_message = "Clé API OpenAI invalide (OPENAI_API_KEY)."
-        elif "rate_limit" in error_msg.lower():
-            user_message = "Limite de taux atteinte, réessayez plus tard."
-        else:
-            user_message = f"Erreur LLM: {error_msg[:200]}"
+        user_message = describe_llm_error(e)
 
         return JobMatching(
             overall_score=0,
@@ -359,11 +780,11 @@ Réponds UNIQUEMENT avec un JSON valide."""
         )
 
 
-def llm_keyword_matching(canonical: CVCanonical, job_description: str) -> KeywordMatching:
+async def llm_keyword_matching(canonical: CVCanonical, job_description: str) -> KeywordMatching:
     """
     Extrait les mots-clés de l'offre et compare avec le CV pour déterminer leur présence.
     """
-    if not client:
+    if provider is None:
         return KeywordMatching(
             keywords=[],
             coverage_score=0,
@@ -372,16 +793,39 @@ def llm_keyword_matching(canonical: CVCanonical, job_description: str) -> Keywor
 
     canonical_json = canonical.model_dump_json()
 
+    # Résultat mémoïsé par couple (CV canonique, offre normalisée, version du prompt)
+    key = cache_key(
+        "keyword_matching",
+        canonical_json,
+        normalize_job_description(job_description),
+        _offer_mode(),
+        KEYWORD_MATCHING_PROMPT_VERSION,
+        model_for("keyword_matching"),
+    )
+    cached = keyword_matching_cache.get(key)
+    if cached is not None:
+        cached.from_cache = True
+        return cached
+
+    packed = pack_canonical(canonical, settings.PROMPT_CANONICAL_MAX_TOKENS, exclude=MATCHING_EXCLUDED_FIELDS)
+    profile, offer = await _offer_context(job_description)
+    if profile is not None:
+        keyword_source = "Reprends chaque mot-clé du profil de poste, tel quel et sans en ajouter"
+    else:
+        keyword_source = (
+            "Extrais les mots-clés importants de l'offre (compétences techniques, compétences "
+            "comportementales, outils, formations, expériences requises)"
+        )
+
     prompt = f"""Tu es un expert en recrutement et analyse de CV. Analyse l'offre d'emploi suivante et compare-la avec le CV pour identifier la correspondance des mots-clés.
 
 CV structuré:
-{canonical_json[:6000]}
+{packed.text}
 
-Offre d'emploi:
-{job_description[:4000]}
+{offer}
 
 Tâches:
-1. Extrais les mots-clés importants de l'offre (compétences techniques, compétences comportementales, outils, formations, expériences requises)
+1. {keyword_source}
 2. Pour chaque mot-clé, détermine s'il est présent, partiellement présent ou absent dans le CV
 3. Si présent ou partiel, indique l'élément du CV qui sert de preuve
 4. Évalue l'importance de chaque mot-clé (1=faible, 5=critique pour le poste)
@@ -400,79 +844,23 @@ Génère un JSON avec:
 Réponds UNIQUEMENT avec un JSON valide."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "keyword_matching",
             messages=[
                 {"role": "system", "content": "Tu es un expert en extraction de mots-clés et matching CV/offre. Tu réponds toujours en JSON valide."},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
             temperature=0.2,
         )
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Réponse vide de l'API OpenAI")
-
-        result = json.loads(response.choices[0].message.content)
-
-        keywords_data = result.get("keywords", [])
-        keyword_matches: list[KeywordMatch] = []
-
-        for kw_data in keywords_data:
-            try:
-                status_str = str(kw_data.get("status", "absent")).lower()
-                if status_str == "present":
-                    status = KeywordMatchStatus.PRESENT
-                elif status_str == "partial":
-                    status = KeywordMatchStatus.PARTIAL
-                else:
-                    status = KeywordMatchStatus.ABSENT
-
-                category_str = str(kw_data.get("category", "other")).lower()
-                category_map = {
-                    "technical_skill": KeywordCategory.TECHNICAL_SKILL,
-                    "soft_skill": KeywordCategory.SOFT_SKILL,
-                    "tool": KeywordCategory.TOOL,
-                    "education": KeywordCategory.EDUCATION,
-                    "experience": KeywordCategory.EXPERIENCE,
-                }
-                category = category_map.get(category_str, KeywordCategory.OTHER)
-
-                importance_raw = kw_data.get("importance", 3)
-                try:
-                    importance = int(importance_raw)
-                except (ValueError, TypeError):
-                    importance = 3
-                importance = min(5, max(1, importance))
-
-                keyword_matches.append(
-                    KeywordMatch(
-                        keyword=str(kw_data.get("keyword", "")),
-                        category=category,
-                        status=status,
-                        evidence=kw_data.get("evidence"),
-                        importance=importance,
-                    )
-                )
-            except Exception:
-                continue  # ignorer les mots-clés mal formés
-
-        coverage_raw = result.get("coverage_score", 0)
-        try:
-            coverage_score = int(coverage_raw)
-        except (ValueError, TypeError):
-            coverage_score = 0
-        coverage_score = min(100, max(0, coverage_score))
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
 
-        critical_missing = result.get("critical_missing", [])
-        if not isinstance(critical_missing, list):
-            critical_missing = []
+        result = json.loads(response.content)
 
-        return KeywordMatching(
-            keywords=keyword_matches,
-            coverage_score=coverage_score,
-            critical_missing=critical_missing,
-        )
+        keyword_matching = _apply_profile_weights(_parse_keyword_matching(result), profile)
+        keyword_matching_cache.set(key, keyword_matching)
+        return keyword_matching
 
     except json.JSONDecodeError as e:
         return KeywordMatching(
@@ -481,15 +869,252 @@ Réponds UNIQUEMENT avec un JSON valide."""
             critical_missing=[f"Erreur parsing JSON: {str(e)}"],
         )
     except Exception as e:
-        error_msg = str(e)
         return KeywordMatching(
             keywords=[],
             coverage_score=0,
-            critical_missing=[f"Erreur LLM: {error_msg[:200]}"],
+            critical_missing=[describe_llm_error(e)],
         )
 
 
-def llm_compare_cvs(cvs_data: list[tuple[str, str, CVCanonical]], job_description: str) -> CVComparisonResult:
+# =========================
+# Mode fusionné : ATS, matching offre et mots-clés en un seul appel
+# =========================
+
+def _object_schema(properties: dict) -> dict:
+    # Mode strict : toutes les propriétés requises, aucune propriété additionnelle
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+_SCORE = {"type": "integer"}
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+
+
+def _fused_schema(include_keywords: bool) -> dict:
+    properties = {
+        "ats": _object_schema({
+            "total_score": _SCORE,
+            "subscores": _object_schema({
+                name: _SCORE for name in ("readability", "structure", "chronology", "evidence", "skills_clarity")
+            }),
+            "issues": _STRINGS,
+            "quick_wins": _STRINGS,
+        }),
+        "insights": _object_schema({
+            name: _STRINGS for name in ("positioning", "strengths", "blind_spots", "rewrite_suggestions")
+        }),
+        "job_matching": _object_schema({
+            "overall_score": _SCORE,
+            "skills_match": _SCORE,
+            "experience_match": _SCORE,
+            "education_match": _SCORE,
+            "missing_requirements": _STRINGS,
+            "strengths": _STRINGS,
+            "recommendations": _STRINGS,
+        }),
+    }
+    if include_keywords:
+        properties["keyword_matching"] = _object_schema({
+            "keywords": {
+                "type": "array",
+                "items": _object_schema({
+                    "keyword": {"type": "string"},
+                    "category": {"type": "string", "enum": [c.value for c in KeywordCategory]},
+                    "status": {"type": "string", "enum": [s.value for s in KeywordMatchStatus]},
+                    "evidence": {"type": ["string", "null"]},
+                    "importance": {"type": "integer"},
+                }),
+            },
+            "coverage_score": _SCORE,
+            "critical_missing": _STRINGS,
+        })
+    return {"name": "cv_analysis", "strict": True, "schema": _object_schema(properties)}
+
+
+def _fused_cache_key(kind: str, canonical_json: str, job_description: str) -> str:
+    return cache_key(
+        f"fused_{kind}",
+        canonical_json,
+        normalize_job_description(job_description),
+        _offer_mode(),
+        FUSED_ANALYSIS_PROMPT_VERSION,
+        model_for("fused"),
+    )
+
+
+def _section(result: dict, name: str) -> dict:
+    value = result.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+async def llm_fused_analysis(
+    canonical: CVCanonical,
+    job_description: str,
+    include_keywords: bool = True,
+) -> tuple[ATSAssessment, CVInsights, JobMatching, KeywordMatching | None]:
+    """
+    Diagnostic ATS, insights, matching offre et (si `include_keywords`)
+    matching mots-clés en un seul appel à schéma JSON strict, analysés avec
+    les mêmes règles que le mode par étape.
+
+    Le matching offre et mots-clés est mis en cache comme en mode par étape
+    (clés propres au prompt fusionné) : sur un hit, seul l'appel ATS reste.
+    En cas d'erreur, chaque partie reçoit le message dans ses listes de problèmes.
+    """
+    if provider is None:
+        ats, insights = await llm_ats_and_insights(canonical)
+        keyword_matching = await llm_keyword_matching(canonical, job_description) if include_keywords else None
+        return ats, insights, await llm_job_matching(canonical, job_description), keyword_matching
+
+    canonical_json = canonical.model_dump_json()
+    job_key = _fused_cache_key("job_matching", canonical_json, job_description)
+    keyword_key = _fused_cache_key("keyword_matching", canonical_json, job_description)
+
+    cached_job = job_matching_cache.get(job_key)
+    cached_keywords = keyword_matching_cache.get(keyword_key) if include_keywords else None
+    if cached_job is not None and (cached_keywords is not None or not include_keywords):
+        ats, insights = await llm_ats_and_insights(canonical)
+        cached_job.from_cache = True
+        if cached_keywords is not None:
+            cached_keywords.from_cache = True
+        return ats, insights, cached_job, cached_keywords
+
+    packed = pack_canonical(canonical, settings.PROMPT_CANONICAL_MAX_TOKENS, exclude=MATCHING_EXCLUDED_FIELDS)
+    profile, offer = await _offer_context(job_description)
+    keyword_source = (
+        "chaque mot-clé du profil de poste, tel quel" if profile is not None
+        else "mots-clés importants de l'offre (compétences techniques, comportementales, outils, formations, expériences)"
+    )
+
+    keyword_task = f"""
+- keyword_matching: objet avec:
+  - keywords: {keyword_source}, chacun avec:
+    - keyword: le mot-clé ou compétence
+    - category: "technical_skill", "soft_skill", "tool", "education", "experience", ou "other"
+    - status: "present", "partial", ou "absent" dans le CV
+    - evidence: élément du CV qui prouve la présence, null si absent
+    - importance: 1 à 5 (5 = critique pour le poste)
+  - coverage_score: score de couverture global (0-100)
+  - critical_missing: mots-clés critiques (importance >= 4) absents du CV""" if include_keywords else ""
+
+    prompt = f"""Tu es un expert en ATS (Applicant Tracking System) et en recrutement. Analyse le CV suivant, puis compare-le avec l'offre d'emploi.
+
+CV structuré:
+{packed.text}
+
+{offer}
+
+Génère un JSON avec:
+- ats: objet avec total_score (0-100), subscores (readability, structure, chronology, evidence, skills_clarity tous 0-100), issues (liste de problèmes), quick_wins (liste de suggestions rapides)
+- insights: objet avec positioning (suggestions de positionnement), strengths (points forts), blind_spots (angles morts), rewrite_suggestions (suggestions de réécriture)
+- job_matching: objet avec overall_score, skills_match, experience_match, education_match (tous 0-100), missing_requirements (exigences manquantes), strengths (points forts par rapport à l'offre), recommendations (recommandations pour améliorer l'adéquation){keyword_task}
+
+Réponds UNIQUEMENT avec un JSON valide."""
+
+    try:
+        response = await _chat_completion(
+            "fused",
+            messages=[
+                {"role": "system", "content": "Tu es un expert en analyse complète de CV (ATS et matching CV/offre). Tu réponds toujours en JSON valide."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.2,
+            json_schema=_fused_schema(include_keywords),
+        )
+
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
+
+        result = json.loads(response.content)
+
+        ats, insights = _parse_ats_and_insights(result)
+        job_matching = _parse_job_matching(_section(result, "job_matching"))
+        job_matching_cache.set(job_key, job_matching)
+        keyword_matching = None
+        if include_keywords:
+            keyword_matching = _apply_profile_weights(
+                _parse_keyword_matching(_section(result, "keyword_matching")), profile
+            )
+            keyword_matching_cache.set(keyword_key, keyword_matching)
+        return ats, insights, job_matching, keyword_matching
+
+    except json.JSONDecodeError as e:
+        error = f"Erreur parsing JSON: {str(e)}"
+    except Exception as e:
+        error = describe_llm_error(e)
+
+    return (
+        ATSAssessment(issues=[error]),
+        CVInsights(),
+        JobMatching(missing_requirements=[error]),
+        KeywordMatching(critical_missing=[error]) if include_keywords else None,
+    )
+
+
+async def llm_resolve_keywords(canonical: CVCanonical, keywords: list[KeywordMatch]) -> list[KeywordMatch]:
+    """
+    Tranche via OpenAI le statut de mots-clés ambigus (pré-filtrés par le moteur local).
+    En cas d'erreur, les statuts locaux sont conservés.
+    """
+    if provider is None or not keywords:
+        return keywords
+
+    packed = pack_canonical(canonical, settings.PROMPT_CANONICAL_MAX_TOKENS, exclude=MATCHING_EXCLUDED_FIELDS)
+    keyword_list = "\n".join(f"- {kw.keyword}" for kw in keywords)
+
+    prompt = f"""Tu es un expert en recrutement. Pour chaque mot-clé ci-dessous, indique s'il est présent, partiellement présent ou absent du CV.
+
+CV structuré:
+{packed.text}
+
+Mots-clés à vérifier:
+{keyword_list}
+
+Génère un JSON avec:
+- keywords: liste d'objets avec:
+  - keyword: le mot-clé exactement tel que fourni
+  - status: "present", "partial", ou "absent"
+  - evidence: élément du CV qui prouve la présence (si présent ou partiel), null si absent
+
+Réponds UNIQUEMENT avec un JSON valide."""
+
+    try:
+        response = await _chat_completion(
+            "resolve_keywords",
+            messages=[
+                {"role": "system", "content": "Tu es un expert en matching CV/offre. Tu réponds toujours en JSON valide."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+        )
+
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
+
+        result = json.loads(response.content)
+        verdicts = {
+            str(item.get("keyword", "")).strip().lower(): item
+            for item in result.get("keywords", [])
+            if isinstance(item, dict)
+        }
+
+        statuses = {s.value: s for s in KeywordMatchStatus}
+        resolved: list[KeywordMatch] = []
+        for kw in keywords:
+            verdict = verdicts.get(kw.keyword.lower())
+            status = statuses.get(str(verdict.get("status", "")).lower()) if verdict else None
+            if status is None:
+                resolved.append(kw)
+                continue
+            resolved.append(
+                kw.model_copy(update={"status": status, "evidence": verdict.get("evidence") or kw.evidence})
+            )
+        return resolved
+
+    except Exception:
+        return keywords
+
+
+async def llm_compare_cvs(cvs_data: list[tuple[str, str, CVCanonical]], job_description: str) -> CVComparisonResult:
     """
     Compare plusieurs CV pour une même offre d'emploi et génère un classement.
 
@@ -497,7 +1122,7 @@ def llm_compare_cvs(cvs_data: list[tuple[str, str, CVCanonical]], job_descriptio
         cvs_data: Liste de tuples (cv_id, filename, canonical)
         job_description: Texte de l'offre d'emploi
     """
-    if not client:
+    if provider is None:
         return CVComparisonResult(
             job_description=job_description,
             cvs=[],
@@ -515,15 +1140,21 @@ def llm_compare_cvs(cvs_data: list[tuple[str, str, CVCanonical]], job_descriptio
             summary="Au moins 2 CV sont nécessaires pour une comparaison.",
         )
 
+    # Budget réparti équitablement entre les CV : le JSON reste toujours valide
+    per_cv_tokens = min(
+        settings.PROMPT_CANONICAL_MAX_TOKENS,
+        settings.PROMPT_COMPARE_MAX_TOKENS // len(cvs_data),
+    )
     cvs_info = []
     for cv_id, filename, canonical in cvs_data:
         cvs_info.append(
             {
                 "id": cv_id,
                 "filename": filename,
-                "data": canonical.model_dump_json()[:4000],
+                "data": pack_canonical(canonical, per_cv_tokens, exclude=MATCHING_EXCLUDED_FIELDS).data,
             }
         )
+    _profile, offer = await _offer_context(job_description)
 
     cvs_description = []
     for i, cv_info in enumerate(cvs_info):
@@ -533,8 +1164,7 @@ def llm_compare_cvs(cvs_data: list[tuple[str, str, CVCanonical]], job_descriptio
 
     prompt = f"""Tu es un expert en recrutement et comparaison de CV. Compare les {len(cvs_data)} CV suivants pour l'offre d'emploi donnée.
 
-Offre d'emploi:
-{job_description[:4000]}
+{offer}
 
 CVs à comparer (utilise EXACTEMENT ces IDs dans ta réponse):
 {chr(10).join(cvs_description)}
@@ -542,7 +1172,7 @@ CVs à comparer (utilise EXACTEMENT ces IDs dans ta réponse):
 IDs valides à utiliser: {', '.join([f"'{id}'" for id in cv_ids_list])}
 
 Données des CVs:
-{json.dumps(cvs_info, ensure_ascii=False)[:12000]}
+{json.dumps(cvs_info, ensure_ascii=False)}
 
 Tâches:
 1. Pour chaque CV, calcule:
@@ -582,28 +1212,21 @@ Génère un JSON avec:
 CRITIQUE: Utilise EXACTEMENT les IDs fournis. Réponds UNIQUEMENT avec un JSON valide."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "compare",
             messages=[
                 {"role": "system", "content": "Tu es un expert en comparaison de CV et recrutement. Tu réponds toujours en JSON valide."},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"},
             temperature=0.2,
         )
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Réponse vide de l'API OpenAI")
+        if not response.content:
+            raise ValueError("Réponse vide du fournisseur LLM")
 
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(response.content)
 
         cvs_items: list[CVComparisonItem] = []
-        def clamp_score(score, default=0):
-            try:
-                return max(0, min(100, int(score)))
-            except (ValueError, TypeError):
-                return default
-
         cvs_result = result.get("cvs", [])
         if not isinstance(cvs_result, list):
             cvs_result = []
@@ -630,11 +1253,11 @@ CRITIQUE: Utilise EXACTEMENT les IDs fournis. Réponds UNIQUEMENT avec un JSON v
                         cv_id=cv_id,
                         filename=filename,
                         canonical=canonical,
-                        matching_score=clamp_score(cv_result_data.get("matching_score", 0)),
-                        skills_score=clamp_score(cv_result_data.get("skills_score", 0)),
-                        experience_score=clamp_score(cv_result_data.get("experience_score", 0)),
-                        education_score=clamp_score(cv_result_data.get("education_score", 0)),
-                        keyword_coverage=clamp_score(cv_result_data.get("keyword_coverage", 0)),
+                        matching_score=_clamp_score(cv_result_data.get("matching_score", 0), 0),
+                        skills_score=_clamp_score(cv_result_data.get("skills_score", 0), 0),
+                        experience_score=_clamp_score(cv_result_data.get("experience_score", 0), 0),
+                        education_score=_clamp_score(cv_result_data.get("education_score", 0), 0),
+                        keyword_coverage=_clamp_score(cv_result_data.get("keyword_coverage", 0), 0),
                         justification=str(cv_result_data.get("justification", "")),
                         keyword_matching=None,
                     )
@@ -691,12 +1314,11 @@ CRITIQUE: Utilise EXACTEMENT les IDs fournis. Réponds UNIQUEMENT avec un JSON v
             summary=f"Erreur parsing JSON: {str(e)}",
         )
     except Exception as e:
-        error_msg = str(e)
         return CVComparisonResult(
             job_description=job_description,
             cvs=[],
             overall_ranking=[],
             criteria_comparison=[],
-            summary=f"Erreur LLM: {error_msg[:200]}",
+            summary=describe_llm_error(e),
         )
 
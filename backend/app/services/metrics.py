@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+logger = logging.getLogger("app.metrics")
+
+# Bornes (secondes) des histogrammes de durée : de la lecture de cache à l'appel LLM lent
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+# =========================
+# Registre Prometheus minimal (format texte 0.0.4, par processus)
+# =========================
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Par jeu de labels : compteurs par borne (non cumulés), somme, total
+        self.series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        counts, totals = self.series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        totals[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, totals) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {totals[0]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[Counter | Histogram] = []
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "cv_analyzer_http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")
+)
+HTTP_DURATION = Histogram(
+    "cv_analyzer_http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route")
+)
+STAGE_DURATION = Histogram(
+    "cv_analyzer_stage_duration_seconds", "Durée des étapes d'analyse", ("stage", "outcome")
+)
+LLM_DURATION = Histogram(
+    "cv_analyzer_llm_call_duration_seconds", "Durée des appels LLM (tentatives comprises)", ("stage", "model")
+)
+LLM_TOKENS = Counter(
+    "cv_analyzer_llm_tokens_total", "Tokens consommés (response.usage)", ("stage", "model", "kind")
+)
+LLM_RETRIES = Counter(
+    "cv_analyzer_llm_retries_total", "Nouvelles tentatives d'appels LLM", ("reason",)
+)
+LLM_CIRCUIT_REJECTIONS = Counter(
+    "cv_analyzer_llm_circuit_open_total", "Appels LLM refusés par le disjoncteur"
+)
+CACHE_LOOKUPS = Counter(
+    "cv_analyzer_cache_lookups_total", "Consultations des caches", ("cache", "result")
+)
+COALESCED = Counter(
+    "cv_analyzer_coalesced_total", "Exécutions identiques regroupées sur une exécution en cours", ("flight", "scope")
+)
+
+
+# =========================
+# Contexte de requête (request id, spans pour Server-Timing)
+# =========================
+
+@dataclass
+class RequestTimings:
+    request_id: str
+    spans: dict[str, float] = field(default_factory=dict)
+    tokens: dict[str, int] = field(default_factory=dict)
+    cache_hits: int = 0
+    llm_retries: int = 0
+
+    def add_span(self, name: str, duration: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def server_timing(self, total: float | None = None) -> str:
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in self.spans.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+current_request: ContextVar[RequestTimings | None] = ContextVar("current_request", default=None)
+
+
+def current_request_id() -> str | None:
+    timings = current_request.get()
+    return timings.request_id if timings else None
+
+
+def log_event(event: str, **fields) -> None:
+    """Ligne de log structurée (JSON) rattachée à la requête en cours."""
+    record = {"event": event, "request_id": current_request_id(), **fields}
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def record_stage(stage: str, duration: float, ok: bool = True) -> None:
+    STAGE_DURATION.observe(duration, stage=stage, outcome="ok" if ok else "error")
+    timings = current_request.get()
+    if timings is not None:
+        timings.add_span(stage, duration)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Span d'étape : histogramme Prometheus + entrée Server-Timing de la requête."""
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record_stage(stage, time.perf_counter() - start, ok)
+
+
+def record_llm_call(stage: str, model: str, duration: float, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_DURATION.observe(duration, stage=stage, model=model)
+    LLM_TOKENS.inc(prompt_tokens, stage=stage, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, stage=stage, model=model, kind="completion")
+    timings = current_request.get()
+    if timings is not None:
+        timings.tokens["prompt"] = timings.tokens.get("prompt", 0) + prompt_tokens
+        timings.tokens["completion"] = timings.tokens.get("completion", 0) + completion_tokens
+    logger.debug(json.dumps({
+        "event": "llm_call", "request_id": current_request_id(), "stage": stage, "model": model,
+        "duration_ms": round(duration * 1000, 1),
+        "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+    }))
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+    timings = current_request.get()
+    if timings is not None and hit:
+        timings.cache_hits += 1
+
+
+def record_coalesced(flight: str, scope: str) -> None:
+    """Appel rattaché à une exécution en cours : scope "process" (même worker) ou "worker" (autre worker)."""
+    COALESCED.inc(flight=flight, scope=scope)
+
+
+def record_llm_retry(reason: str) -> None:
+    LLM_RETRIES.inc(reason=reason)
+    timings = current_request.get()
+    if timings is not None:
+        timings.llm_retries += 1
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable
+
+from app.services.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    Étape du pipeline d'analyse.
+
+    `func` reçoit un dict {nom_dépendance: résultat} et retourne une coroutine.
+    Si `fallback` est fourni, une erreur ou un timeout de l'étape produit un
+    résultat dégradé au lieu de faire échouer les étapes dépendantes.
+    """
+
+    name: str
+    func: Callable[[dict[str, Any]], Awaitable[Any]]
+    depends_on: tuple[str, ...] = ()
+    timeout: float | None = None
+    fallback: Callable[[str], Any] | None = None
+
+
+@dataclass
+class StageOutcome:
+    name: str
+    value: Any = None
+    error: str | None = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class PipelineResult:
+    outcomes: dict[str, StageOutcome] = field(default_factory=dict)
+
+    def value(self, name: str) -> Any:
+        outcome = self.outcomes.get(name)
+        return outcome.value if outcome else None
+
+    @property
+    def errors(self) -> dict[str, str]:
+        return {name: o.error for name, o in self.outcomes.items() if o.error}
+
+
+class StageFailedError(RuntimeError):
+    """Une étape sans fallback a échoué : ses dépendantes ne peuvent pas s'exécuter."""
+
+    def __init__(self, stage: str, error: str):
+        super().__init__(error)
+        self.stage = stage
+        self.error = error
+
+
+def _describe_error(name: str, exc: BaseException, timeout: float | None) -> str:
+    if isinstance(exc, asyncio.TimeoutError):
+        return f"Étape '{name}' interrompue (délai de {timeout:g} s dépassé)."
+    return f"Étape '{name}' en erreur: {str(exc)[:200]}"
+
+
+async def run_stages(
+    stages: Iterable[Stage],
+    on_stage_done: Callable[[StageOutcome], Awaitable[None] | None] | None = None,
+) -> PipelineResult:
+    """
+    Exécute un graphe d'étapes (DAG) : chaque étape démarre dès que ses
+    dépendances sont terminées, les étapes indépendantes tournent en parallèle.
+
+    Lève StageFailedError si une étape sans fallback échoue.
+    """
+    stages = list(stages)
+    # Les dépendances doivent être déclarées avant l'étape (ordre topologique) :
+    # cela interdit les cycles qui bloqueraient le pipeline.
+    declared: set[str] = set()
+    for stage in stages:
+        for dep in stage.depends_on:
+            if dep not in declared:
+                raise ValueError(f"Dépendance inconnue '{dep}' pour l'étape '{stage.name}'")
+        declared.add(stage.name)
+
+    result = PipelineResult()
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def run(stage: Stage) -> StageOutcome:
+        deps: dict[str, Any] = {}
+        for dep in stage.depends_on:
+            dep_outcome: StageOutcome = await tasks[dep]
+            deps[dep] = dep_outcome.value
+
+        start = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(stage.func(deps), timeout=stage.timeout)
+            outcome = StageOutcome(stage.name, value=value)
+        except Exception as e:
+            error = _describe_error(stage.name, e, stage.timeout)
+            if stage.fallback is None:
+                record_stage(stage.name, time.perf_counter() - start, ok=False)
+                raise StageFailedError(stage.name, error) from e
+            logger.warning(error)
+            outcome = StageOutcome(stage.name, value=stage.fallback(error), error=error)
+        outcome.duration = time.perf_counter() - start
+        record_stage(stage.name, outcome.duration, ok=outcome.ok)
+
+        result.outcomes[stage.name] = outcome
+        if on_stage_done is not None:
+            maybe = on_stage_done(outcome)
+            if asyncio.iscoroutine(maybe):
+                await maybe
+        return outcome
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run(stage))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    return result
+
+
+async def gather_bounded(
+    items: Iterable[Any],
+    func: Callable[[Any], Awaitable[Any]],
+    limit: int,
+) -> list[Any]:
+    """
+    Applique `func` à chaque élément avec au plus `limit` appels en vol.
+
+    L'ordre des résultats suit celui des éléments ; une erreur sur un élément
+    est retournée à sa place (exception) sans interrompre les autres.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: Any) -> Any:
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.models.cv import CVCanonical
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Comptage de tokens
+# =========================
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimation du nombre de tokens (approximation du BPE des modèles GPT) : un
+    token par ponctuation, environ un token par tranche de 4 caractères pour
+    les mots. Sans tokenizer : déterministe, sans téléchargement de vocabulaire,
+    et les budgets ne dépendent pas des paquets installés.
+    """
+    if not text:
+        return 0
+    return sum(math.ceil(len(m) / 4) if m[0].isalnum() or m[0] == "_" else 1 for m in _WORD_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> tuple[str, int]:
+    """
+    Coupe `text` pour tenir dans `max_tokens`, de préférence sur une fin de ligne.
+    Retourne (texte conservé, nombre de tokens abandonnés).
+    """
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text, 0
+
+    kept: list[str] = []
+    used = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line)
+        if used + line_tokens > max_tokens:
+            # Ligne trop longue (texte sans retours à la ligne) : coupe par mots
+            if not kept:
+                for word in re.split(r"(\s+)", line):
+                    word_tokens = count_tokens(word)
+                    if used + word_tokens > max_tokens:
+                        break
+                    kept.append(word)
+                    used += word_tokens
+            break
+        kept.append(line)
+        used += line_tokens
+
+    truncated = "".join(kept).rstrip()
+    return truncated, total - count_tokens(truncated)
+
+
+# =========================
+# Empaquetage du CV canonique
+# =========================
+
+# Sections du CV par ordre de pertinence pour les prompts d'analyse/matching
+SECTION_PRIORITY = (
+    "full_name",
+    "headline",
+    "location",
+    "summary",
+    "experiences",
+    "hard_skills",
+    "tools",
+    "education",
+    "soft_skills",
+    "languages",
+    "certifications",
+    "email",
+    "phone",
+    "links",
+    "extraction_warnings",
+)
+
+
+def compact(value: Any) -> Any:
+    """Retire récursivement les champs null / vides ("", [], {})."""
+    if isinstance(value, dict):
+        items = ((k, compact(v)) for k, v in value.items())
+        return {k: v for k, v in items if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        items = (compact(v) for v in value)
+        return [v for v in items if v not in (None, "", [], {})]
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class PackedCanonical:
+    data: dict
+    text: str
+    tokens: int
+    dropped_tokens: int = 0
+    dropped: list[str] = field(default_factory=list)
+
+
+def pack_canonical(
+    canonical: CVCanonical,
+    max_tokens: int,
+    exclude: tuple[str, ...] = (),
+) -> PackedCanonical:
+    """
+    Sérialise le CV canonique pour un prompt en respectant un budget de tokens.
+
+    Les champs vides sont retirés, puis les sections sont ajoutées par ordre de
+    pertinence ; dans une liste (expériences...), les éléments sont ajoutés un
+    à un tant que le budget le permet. Ce qui ne tient pas est listé dans
+    `dropped` (ex: "experiences[5:]").
+    """
+    full = compact(canonical.model_dump(mode="json", exclude=set(exclude)))
+    packed: dict = {}
+    dropped: list[str] = []
+    used = 2  # accolades
+
+    for name in SECTION_PRIORITY:
+        if name not in full:
+            continue
+        value = full[name]
+        key_tokens = count_tokens(_dumps(name)) + 2
+
+        if isinstance(value, list):
+            kept: list = []
+            for i, item in enumerate(value):
+                item_tokens = count_tokens(_dumps(item)) + 1
+                if used + key_tokens + item_tokens > max_tokens:
+                    dropped.append(f"{name}[{i}:]" if i else name)
+                    break
+                kept.append(item)
+                used += item_tokens
+            if kept:
+                packed[name] = kept
+                used += key_tokens
+            continue
+
+        value_tokens = count_tokens(_dumps(value))
+        if used + key_tokens + value_tokens > max_tokens:
+            dropped.append(name)
+            continue
+        packed[name] = value
+        used += key_tokens + value_tokens
+
+    text = _dumps(packed)
+    tokens = count_tokens(text)
+    dropped_tokens = max(0, count_tokens(_dumps(full)) - tokens)
+    if dropped:
+        logger.info(f"Prompt: CV réduit à {tokens} tokens ({dropped_tokens} abandonnés: {', '.join(dropped)})")
+    return PackedCanonical(
+        data=packed,
+        text=text,
+        tokens=tokens,
+        dropped_tokens=dropped_tokens,
+        dropped=dropped,
+    )
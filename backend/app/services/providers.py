@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Protocol
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.prompt_budget import count_tokens
+from app.services.resilience import call_with_resilience
+
+logger = logging.getLogger(__name__)
+
+# Étapes LLM : chacune peut utiliser son propre modèle (LLM_STAGE_MODELS)
+LLM_STAGES = (
+    "canonicalize", "ats", "job_matching", "keyword_matching", "resolve_keywords", "compare", "fused", "job_profile",
+)
+
+
+@dataclass
+class LLMResponse:
+    content: str | None
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class LLMProvider(Protocol):
+    name: str
+
+    async def complete(
+        self,
+        stage: str,
+        model: str,
+        messages: list[dict],
+        json_mode: bool = True,
+        temperature: float | None = None,
+        json_schema: dict | None = None,
+    ) -> LLMResponse: ...
+
+    async def close(self) -> None: ...
+
+
+class FixtureMissingError(LookupError):
+    """Aucune réponse enregistrée pour cet appel (fournisseur "fixtures")."""
+
+
+def model_for(stage: str) -> str:
+    """Modèle d'une étape : LLM_STAGE_MODELS[stage] s'il est défini, sinon LLM_MODEL."""
+    return settings.LLM_STAGE_MODELS.get(stage) or settings.LLM_MODEL
+
+
+def fixture_key(stage: str, messages: list[dict]) -> str:
+    """Clé stable d'un appel (indépendante du modèle, pour rejouer quel que soit le routage)."""
+    payload = json.dumps([stage, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+# =========================
+# OpenAI et endpoints compatibles
+# =========================
+
+def chat_request_body(
+    model: str,
+    messages: list[dict],
+    json_mode: bool = True,
+    temperature: float | None = None,
+    json_schema: dict | None = None,
+) -> dict:
+    """Corps d'une requête chat.completions (appel direct ou ligne d'un lot Batch API)."""
+    body: dict = {"model": model, "messages": messages}
+    if json_schema is not None and settings.LLM_STRICT_SCHEMA:
+        # Sortie structurée : le modèle est contraint au schéma (strict)
+        body["response_format"] = {"type": "json_schema", "json_schema": json_schema}
+    elif json_mode or json_schema is not None:
+        body["response_format"] = {"type": "json_object"}
+    if temperature is not None:
+        body["temperature"] = temperature
+    return body
+
+
+class OpenAIProvider:
+    """
+    API OpenAI ou tout serveur compatible (vLLM, Ollama, LM Studio...) via
+    `base_url`. Client HTTP partagé (pool keep-alive) ; nouvelles tentatives,
+    limitation de débit et disjoncteur assurés par call_with_resilience.
+    """
+
+    def __init__(self, api_key: str, base_url: str | None = None, name: str = "openai"):
+        self.name = name
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            max_retries=0,  # nouvelles tentatives gérées par call_with_resilience
+            http_client=httpx.AsyncClient(
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+                ),
+            ),
+        )
+
+    async def complete(self, stage, model, messages, json_mode=True, temperature=None, json_schema=None) -> LLMResponse:
+        kwargs = chat_request_body(model, messages, json_mode, temperature, json_schema)
+        response = await call_with_resilience(
+            lambda: self.client.chat.completions.create(**kwargs),
+            estimated_tokens=sum(count_tokens(m["content"]) for m in messages),
+        )
+        usage = response.usage
+        return LLMResponse(
+            content=response.choices[0].message.content if response.choices else None,
+            model=response.model or model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# =========================
+# Rejeu de fixtures (hors ligne, déterministe)
+# =========================
+
+class FixtureReplayProvider:
+    """
+    Rejoue des réponses enregistrées dans `directory` : `<étape>/<clé>.json`
+    pour un appel précis, sinon `<étape>/default.json`. Aucun appel réseau :
+    tests de charge sans coût et CI hors ligne.
+    """
+
+    name = "fixtures"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _load(self, path: str) -> str | None:
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    async def complete(self, stage, model, messages, json_mode=True, temperature=None, json_schema=None) -> LLMResponse:
+        content = self._load(os.path.join(self.directory, stage, f"{fixture_key(stage, messages)}.json"))
+        if content is None:
+            content = self._load(os.path.join(self.directory, stage, "default.json"))
+        if content is None:
+            raise FixtureMissingError(f"Aucune fixture pour l'étape {stage} dans {self.directory}")
+        return LLMResponse(
+            content=content,
+            model=model,
+            prompt_tokens=sum(count_tokens(m["content"]) for m in messages),
+            completion_tokens=count_tokens(content),
+        )
+
+    async def close(self) -> None:
+        return None
+
+
+class RecordingProvider:
+    """Enregistre chaque réponse du fournisseur réel sous forme de fixture rejouable."""
+
+    def __init__(self, inner: LLMProvider, directory: str):
+        self.inner = inner
+        self.directory = directory
+        self.name = inner.name
+
+    async def complete(self, stage, model, messages, json_mode=True, temperature=None, json_schema=None) -> LLMResponse:
+        response = await self.inner.complete(stage, model, messages, json_mode, temperature, json_schema)
+        if response.content:
+            stage_dir = os.path.join(self.directory, stage)
+            os.makedirs(stage_dir, exist_ok=True)
+            path = os.path.join(stage_dir, f"{fixture_key(stage, messages)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(response.content)
+        return response
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+def make_provider() -> LLMProvider | None:
+    """
+    Fournisseur configuré par LLM_PROVIDER : "openai", "openai_compatible"
+    (OPENAI_BASE_URL requis, clé facultative) ou "fixtures".
+    None si OpenAI est choisi sans clé (mode dégradé).
+    """
+    kind = settings.LLM_PROVIDER.lower()
+    if kind == "fixtures":
+        return FixtureReplayProvider(settings.LLM_FIXTURES_DIR)
+
+    if kind == "openai_compatible":
+        if not settings.OPENAI_BASE_URL:
+            raise ValueError("LLM_PROVIDER=openai_compatible nécessite OPENAI_BASE_URL.")
+        provider: LLMProvider = OpenAIProvider(
+            settings.OPENAI_API_KEY or "not-needed", settings.OPENAI_BASE_URL, name=kind
+        )
+    elif kind == "openai":
+        if not settings.OPENAI_API_KEY:
+            return None
+        provider = OpenAIProvider(settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL)
+    else:
+        raise ValueError(f"LLM_PROVIDER inconnu: {settings.LLM_PROVIDER}")
+
+    if settings.LLM_FIXTURES_RECORD:
+        provider = RecordingProvider(provider, settings.LLM_FIXTURES_DIR)
+    return provider
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.models.cv import (
+    CVCanonical,
+    CVComparisonItem,
+    CVComparisonResult,
+    ComparisonCriterion,
+)
+from app.services.embeddings import canonical_fingerprint, get_cv_index
+from app.services.keywords import local_keyword_matching, match_keywords
+from app.services.llm import llm_compare_cvs, llm_job_matching
+from app.services.pipeline import gather_bounded
+
+logger = logging.getLogger(__name__)
+
+# Critères classés localement à partir des scores individuels
+CRITERIA = (
+    ("Compétences techniques", "skills_score"),
+    ("Expérience", "experience_score"),
+    ("Formation", "education_score"),
+    ("Couverture des mots-clés", "keyword_coverage"),
+)
+
+
+async def _score_cv(cv: tuple[str, str, CVCanonical], job_description: str) -> CVComparisonItem:
+    """Map : score indépendant d'un CV face à l'offre (matching + mots-clés, en cache)."""
+    cv_id, filename, canonical = cv
+    job_matching, keyword_matching = await asyncio.gather(
+        llm_job_matching(canonical, job_description),
+        match_keywords(canonical, job_description),
+    )
+    return CVComparisonItem(
+        cv_id=cv_id,
+        filename=filename,
+        canonical=canonical,
+        matching_score=job_matching.overall_score,
+        skills_score=job_matching.skills_match,
+        experience_score=job_matching.experience_match,
+        education_score=job_matching.education_match,
+        keyword_coverage=keyword_matching.coverage_score,
+        justification=" ".join(job_matching.strengths[:3]),
+        keyword_matching=keyword_matching,
+    )
+
+
+def _batches(items: list, size: int, offset: int = 0) -> list[list]:
+    """Découpe en lots consécutifs ; `offset` décale les frontières entre deux tours."""
+    head = [items[:offset]] if offset else []
+    return [b for b in head + [items[i:i + size] for i in range(offset, len(items), size)] if b]
+
+
+def _apply_batch_ranking(batch: list[CVComparisonItem], ranking: list[str]) -> list[CVComparisonItem]:
+    """Réordonne un lot selon le classement LLM (IDs inconnus ignorés, oubliés gardés en fin)."""
+    by_id = {item.cv_id: item for item in batch}
+    ordered = [by_id.pop(cv_id) for cv_id in ranking if cv_id in by_id]
+    return ordered + [item for item in batch if item.cv_id in by_id]
+
+
+async def _reduce_round(
+    items: list[CVComparisonItem],
+    job_description: str,
+    batch_size: int,
+    offset: int,
+) -> list[CVComparisonItem]:
+    """Un tour de tournoi : chaque lot de CV voisins est départagé par une comparaison LLM."""
+    batches = _batches(items, batch_size, offset)
+
+    async def compare_batch(batch: list[CVComparisonItem]) -> list[CVComparisonItem]:
+        if len(batch) < 2:
+            return batch
+        result = await llm_compare_cvs(
+            [(item.cv_id, item.filename, item.canonical) for item in batch],
+            job_description,
+        )
+        justifications = {cv.cv_id: cv.justification for cv in result.cvs if cv.justification}
+        for item in batch:
+            if item.cv_id in justifications:
+                item.justification = justifications[item.cv_id]
+        return _apply_batch_ranking(batch, result.overall_ranking)
+
+    results = await gather_bounded(batches, compare_batch, settings.COMPARE_MAX_CONCURRENCY)
+    ordered: list[CVComparisonItem] = []
+    for batch, batch_result in zip(batches, results):
+        if isinstance(batch_result, BaseException):
+            logger.warning(f"Tour de classement: lot ignoré ({batch_result})")
+            ordered.extend(batch)
+        else:
+            ordered.extend(batch_result)
+    return ordered
+
+
+def _local_criteria(items: list[CVComparisonItem]) -> list[ComparisonCriterion]:
+    criteria = []
+    for name, attr in CRITERIA:
+        ranked = sorted(items, key=lambda item: getattr(item, attr), reverse=True)
+        best = ranked[0]
+        criteria.append(
+            ComparisonCriterion(
+                criterion_name=name,
+                best_cv_id=best.cv_id,
+                ranking=[item.cv_id for item in ranked],
+                justification=f"Classement par score individuel ({best.filename}: {getattr(best, attr)}/100).",
+            )
+        )
+    return criteria
+
+
+async def _prerank(
+    cvs_data: list[tuple[str, str, CVCanonical]],
+    job_description: str,
+    top_k: int,
+) -> tuple[list[tuple[str, str, CVCanonical]], list[CVComparisonItem]]:
+    """
+    Présélection sémantique : similarité (embeddings par section) de tous les
+    CV avec l'offre en un passage vectorisé ; seuls les `top_k` plus proches
+    sont gardés pour le classement LLM. Les autres reçoivent un matching
+    mots-clés local (sans appel LLM), classés par similarité décroissante.
+    """
+    index = get_cv_index()
+    keys = [canonical_fingerprint(canonical) for _, _, canonical in cvs_data]
+    await asyncio.to_thread(index.add, zip(keys, (canonical for _, _, canonical in cvs_data)))
+    ranked = await asyncio.to_thread(index.search, job_description, len(set(keys)), list(dict.fromkeys(keys)))
+    order = {key: (position, score) for position, (key, score) in enumerate(ranked)}
+
+    ordered = sorted(zip(keys, cvs_data), key=lambda pair: order[pair[0]][0])
+    kept = [cv for _, cv in ordered[:top_k]]
+    excluded = []
+    for key, (cv_id, filename, canonical) in ordered[top_k:]:
+        keyword_matching = local_keyword_matching(canonical, job_description)
+        excluded.append(
+            CVComparisonItem(
+                cv_id=cv_id,
+                filename=filename,
+                canonical=canonical,
+                keyword_coverage=keyword_matching.coverage_score,
+                justification=f"Écarté par la présélection sémantique (similarité {order[key][1]:.2f}).",
+                keyword_matching=keyword_matching,
+            )
+        )
+    return kept, excluded
+
+
+async def rank_cvs(
+    cvs_data: list[tuple[str, str, CVCanonical]],
+    job_description: str,
+) -> CVComparisonResult:
+    """
+    Classement de N CV pour une offre, en coût linéaire.
+
+    Jusqu'à COMPARE_BATCH_SIZE CV, une seule comparaison LLM suffit. Au-delà :
+    - map : chaque CV est scoré indépendamment, en parallèle ;
+    - reduce : les CV triés par score sont départagés par lots voisins de
+      COMPARE_BATCH_SIZE (COMPARE_REDUCE_ROUNDS tours, frontières décalées
+      d'un demi-lot à chaque tour) ;
+    - le lot de tête est comparé une dernière fois pour la synthèse.
+    Soit N + N/B * tours + 1 appels, quel que soit N.
+
+    Au-delà de COMPARE_PRERANK_TOP_K CV, une présélection par embeddings ne
+    garde que les K plus proches de l'offre : le coût LLM ne dépend plus de N.
+    """
+    top_k = settings.COMPARE_PRERANK_TOP_K
+    if top_k > 0 and len(cvs_data) > max(2, top_k):
+        kept, excluded = await _prerank(cvs_data, job_description, max(2, top_k))
+        result = await rank_cvs(kept, job_description)
+        result.cvs += excluded
+        result.overall_ranking += [item.cv_id for item in excluded]
+        result.warnings.append(
+            f"{len(excluded)} CV sur {len(cvs_data)} écartés par la présélection sémantique "
+            f"(seuls les {len(kept)} plus proches de l'offre sont classés par le LLM)."
+        )
+        return result
+
+    batch_size = max(2, settings.COMPARE_BATCH_SIZE)
+    if len(cvs_data) <= batch_size:
+        return await llm_compare_cvs(cvs_data, job_description)
+
+    scored = await gather_bounded(
+        cvs_data,
+        lambda cv: _score_cv(cv, job_description),
+        settings.COMPARE_MAX_CONCURRENCY,
+    )
+    items: list[CVComparisonItem] = []
+    warnings: list[str] = []
+    for (cv_id, filename, canonical), item in zip(cvs_data, scored):
+        if isinstance(item, BaseException):
+            warnings.append(f"{filename}: score indisponible ({str(item)[:200]})")
+            item = CVComparisonItem(cv_id=cv_id, filename=filename, canonical=canonical)
+        items.append(item)
+
+    items.sort(key=lambda item: item.matching_score, reverse=True)
+    for round_index in range(settings.COMPARE_REDUCE_ROUNDS):
+        offset = (batch_size // 2) if round_index % 2 else 0
+        items = await _reduce_round(items, job_description, batch_size, offset)
+
+    top = items[:batch_size]
+    final = await llm_compare_cvs(
+        [(item.cv_id, item.filename, item.canonical) for item in top],
+        job_description,
+    )
+    items = _apply_batch_ranking(top, final.overall_ranking) + items[batch_size:]
+
+    summary = f"{len(items)} CV évalués, synthèse des {len(top)} premiers. {final.summary}".strip()
+    return CVComparisonResult(
+        job_description=job_description,
+        cvs=items,
+        overall_ranking=[item.cv_id for item in items],
+        criteria_comparison=_local_criteria(items),
+        summary=summary,
+        warnings=warnings + final.warnings,
+    )
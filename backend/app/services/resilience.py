@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+import openai
+
+from app.core.config import settings
+from app.services.metrics import LLM_CIRCUIT_REJECTIONS, record_llm_retry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Le fournisseur LLM est considéré indisponible : appel refusé sans être tenté."""
+
+
+# =========================
+# Limitation de débit (token bucket)
+# =========================
+
+class TokenBucket:
+    """
+    Seau à jetons : `rate_per_minute` jetons regagnés par minute, au plus
+    `capacity` en réserve (rafale autorisée). Un débit nul désactive la limite.
+    Les appelants en attente sont servis dans l'ordre d'arrivée.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)  # une demande plus grosse que le seau passerait jamais
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+# =========================
+# Disjoncteur
+# =========================
+
+class CircuitBreaker:
+    """
+    Ouvert après `failure_threshold` pannes consécutives du fournisseur : les
+    appels échouent immédiatement pendant `reset_seconds`, puis un seul appel
+    d'essai est autorisé (semi-ouvert) ; son succès referme le circuit, sinon
+    une nouvelle période d'ouverture commence.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open":
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(f"Service LLM indisponible (nouvel essai dans {remaining:.0f} s).")
+        if state == "half_open":
+            # Appel d'essai : les suivants restent refusés jusqu'à son issue
+            self.opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold > 0 and self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Disjoncteur LLM ouvert après {self.failures} échecs consécutifs")
+            self.opened_at = time.monotonic()
+
+
+# =========================
+# Classification des erreurs
+# =========================
+
+def _is_quota_exhausted(error: BaseException) -> bool:
+    return isinstance(error, openai.RateLimitError) and getattr(error, "code", None) == "insufficient_quota"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erreurs transitoires : limite de débit, délai dépassé, réseau, erreur serveur."""
+    if _is_quota_exhausted(error):
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Pannes comptées par le disjoncteur (un 429 ou un 400 prouve que le service répond)."""
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Délai demandé par le fournisseur (en-têtes retry-after-ms / retry-after)."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # format date HTTP : ignoré, backoff classique
+    return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponentiel avec jitter complet (attempt commence à 0)."""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def describe_llm_error(error: BaseException) -> str:
+    """Message utilisateur (français) pour une erreur d'appel LLM."""
+    if isinstance(error, CircuitOpenError):
+        return str(error)
+    if _is_quota_exhausted(error):
+        return "Quota OpenAI dépassé. Vérifiez votre plan et vos factures sur https://platform.openai.com/account/billing"
+    if isinstance(error, openai.RateLimitError):
+        return "Limite de taux OpenAI atteinte. Veuillez réessayer dans quelques instants."
+    if isinstance(error, openai.AuthenticationError):
+        return "Clé API OpenAI invalide. Vérifiez la variable d'environnement OPENAI_API_KEY."
+    if isinstance(error, openai.APITimeoutError):
+        return "Délai de réponse OpenAI dépassé. Veuillez réessayer."
+    if isinstance(error, openai.APIConnectionError):
+        return "Service OpenAI injoignable. Veuillez réessayer plus tard."
+    return f"Erreur LLM: {str(error)[:200]}"
+
+
+# =========================
+# Appel protégé
+# =========================
+
+request_limiter = TokenBucket(settings.LLM_RATE_LIMIT_RPM)
+token_limiter = TokenBucket(settings.LLM_RATE_LIMIT_TPM)
+circuit_breaker = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS)
+
+
+async def call_with_resilience(call: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+    """
+    Exécute un appel LLM avec limitation de débit (requêtes et tokens par minute),
+    disjoncteur et nouvelles tentatives (backoff exponentiel avec jitter, en
+    respectant Retry-After). La dernière erreur est relevée telle quelle.
+    """
+    attempt = 0
+    while True:
+        try:
+            circuit_breaker.before_call()
+        except CircuitOpenError:
+            LLM_CIRCUIT_REJECTIONS.inc()
+            raise
+        await request_limiter.acquire()
+        await token_limiter.acquire(estimated_tokens)
+        try:
+            result = await call()
+        except Exception as e:
+            if is_provider_failure(e):
+                circuit_breaker.record_failure()
+            elif isinstance(e, openai.APIStatusError):
+                circuit_breaker.record_success()  # le service a répondu
+            if not is_retryable(e) or attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            elif delay > settings.LLM_RETRY_MAX_DELAY_SECONDS:
+                raise  # attente demandée trop longue pour une requête interactive
+            attempt += 1
+            record_llm_retry(type(e).__name__)
+            logger.info(f"Appel LLM en échec ({type(e).__name__}), tentative {attempt + 1} dans {delay:.2f} s")
+            await asyncio.sleep(delay)
+            continue
+        circuit_breaker.record_success()
+        return result
@@ -1,11 +1,9 @@
 from ..models.cv import CVCanonical
 
-def fallback_scoring_if_needed(canonical: CVCanonical) -> CVCanonical:
-    """
-    Si l'extraction/LLM renvoie quelque chose de trop vide,
-    on garde au moins les warnings. (Tu enrichiras plus tard.)
-    """
-    if (
+
+def is_canonical_empty(canonical: CVCanonical) -> bool:
+    """Vrai si l'extraction/LLM n'a produit aucune donnée exploitable."""
+    return (
         canonical.full_name is None
         and canonical.headline is None
         and canonical.summary is None
@@ -13,7 +11,15 @@ def fallback_scoring_if_needed(canonical: CVCanonical) -> CVCanonical:
         and not canonical.education
         and not canonical.hard_skills
         and not canonical.tools
-    ):
+    )
+
+
+def fallback_scoring_if_needed(canonical: CVCanonical) -> CVCanonical:
+    """
+    Si l'extraction/LLM renvoie quelque chose de trop vide,
+    on garde au moins les warnings. (Tu enrichiras plus tard.)
+    """
+    if is_canonical_empty(canonical):
         canonical.extraction_warnings.append(
             "Le CV structuré est très vide. Vérifie l'extraction ou fournis un CV en DOCX."
         )
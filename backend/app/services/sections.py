@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass
+
+from app.models.cv import CVCanonical
+from app.services.prompt_budget import count_tokens
+
+
+def fold(text: str) -> str:
+    # Comme keywords.fold (non importé : keywords dépend de llm, qui dépend de ce module)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+# =========================
+# Segmentation d'un CV en sections (titres reconnus)
+# =========================
+
+# Intitulés de section (forme pliée : minuscules, sans accents) -> type de section
+SECTION_HEADINGS: dict[str, tuple[str, ...]] = {
+    "summary": (
+        "profil", "profil professionnel", "resume", "a propos", "a propos de moi", "presentation",
+        "objectif", "objectif professionnel", "summary", "profile", "about", "about me",
+    ),
+    "experience": (
+        "experience", "experiences", "experience professionnelle", "experiences professionnelles",
+        "parcours", "parcours professionnel", "emplois", "missions", "projets", "work experience",
+        "professional experience", "employment", "employment history", "career", "projects",
+    ),
+    "education": (
+        "formation", "formations", "education", "diplomes", "etudes", "cursus", "parcours academique",
+        "scolarite", "academic background",
+    ),
+    "skills": (
+        "competences", "competences techniques", "competences cles", "savoir-faire", "outils",
+        "technologies", "stack technique", "expertise", "skills", "technical skills", "tools",
+    ),
+    "languages": ("langues", "languages"),
+    "certifications": ("certifications", "certificats", "certifications et formations"),
+    "other": (
+        "centres d'interet", "centres d interet", "loisirs", "interets", "benevolat", "publications",
+        "references", "interests", "hobbies", "volunteering",
+    ),
+}
+_HEADINGS = {heading: kind for kind, headings in SECTION_HEADINGS.items() for heading in headings}
+_HEADING_CLEAN_RE = re.compile(r"^[\s\W\d]+|[\s:\-–—.•|_]+$")
+_MAX_HEADING_WORDS = 5
+
+
+@dataclass
+class CVSection:
+    kind: str  # "header" (avant le premier titre : nom, contact), puis un type de SECTION_HEADINGS
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.text)
+
+
+def heading_kind(line: str) -> str | None:
+    """Type de section si la ligne est un intitulé connu ("EXPÉRIENCES :" -> "experience")."""
+    cleaned = _HEADING_CLEAN_RE.sub("", fold(line))
+    if not cleaned or len(cleaned.split()) > _MAX_HEADING_WORDS:
+        return None
+    return _HEADINGS.get(cleaned)
+
+
+def segment_cv(text: str) -> list[CVSection]:
+    """
+    Découpe le texte extrait en sections d'après les intitulés reconnus ; le
+    texte avant le premier intitulé forme la section "header". Deux sections
+    de même type (ex. "Expériences" puis "Projets") restent distinctes.
+    """
+    sections = [CVSection("header", "")]
+    lines: list[str] = []
+    for line in text.splitlines():
+        kind = heading_kind(line)
+        if kind is None:
+            lines.append(line)
+            continue
+        sections[-1].text = "\n".join(lines).strip()
+        sections.append(CVSection(kind, ""))
+        lines = [line.strip()]
+    sections[-1].text = "\n".join(lines).strip()
+    return [s for s in sections if s.text]
+
+
+def split_section(text: str, max_tokens: int) -> list[str]:
+    """
+    Découpe un texte en morceaux d'au plus `max_tokens`, aux lignes vides de
+    préférence (une expérience n'est pas coupée en deux tant qu'elle tient).
+    Un bloc trop long est coupé aux lignes (puces), une ligne trop longue aux mots.
+    """
+    blocks = [b for b in re.split(r"\n\s*\n", text) if b.strip()]
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for block in _fitting_pieces(blocks, max_tokens):
+        tokens = count_tokens(block)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _fitting_pieces(blocks: list[str], max_tokens: int) -> list[str]:
+    """Blocs redécoupés aux lignes, puis aux mots, jusqu'à tenir dans `max_tokens`."""
+    pieces: list[str] = []
+    for block in blocks:
+        if count_tokens(block) <= max_tokens:
+            pieces.append(block)
+            continue
+        lines = [line for line in block.splitlines() if line.strip()]
+        if len(lines) > 1:
+            pieces += _fitting_pieces(lines, max_tokens)
+            continue
+        part: list[str] = []
+        part_tokens = 0
+        for word in block.split():
+            tokens = count_tokens(word)
+            if part and part_tokens + tokens > max_tokens:
+                pieces.append(" ".join(part))
+                part, part_tokens = [], 0
+            part.append(word)
+            part_tokens += tokens
+        if part:
+            pieces.append(" ".join(part))
+    return pieces
+
+
+# =========================
+# Fusion des CV canoniques partiels
+# =========================
+
+def _dedup_key(value) -> str:
+    if isinstance(value, str):
+        return fold(value)
+    if hasattr(value, "model_dump_json"):
+        data = value.model_dump()
+        if "title" in data and "company" in data:
+            # Même poste extrait deux fois (section coupée) : titre, entreprise, début
+            start = (data.get("dates") or {}).get("start")
+            return fold(f"{data.get('title')}|{data.get('company')}|{start}")
+        return fold(value.model_dump_json())
+    return str(value)
+
+
+def _merge_lists(values: list[list]) -> list:
+    """Listes concaténées dans l'ordre, sans doublons ; un doublon d'objet complète le premier."""
+    positions: dict[str, int] = {}
+    items = []
+    for value in values:
+        for item in value:
+            key = _dedup_key(item)
+            if key not in positions:
+                positions[key] = len(items)
+                items.append(item)
+            elif hasattr(item, "model_dump_json"):
+                items[positions[key]] = _merge_items(items[positions[key]], item)
+    return items
+
+
+def _merge_items(first, second):
+    """
+    Même objet extrait de deux blocs (expérience coupée entre deux morceaux) :
+    listes réunies (puces, compétences), champs simples manquants complétés.
+    """
+    update = {}
+    for name in type(first).model_fields:
+        current, other = getattr(first, name), getattr(second, name)
+        if isinstance(current, list):
+            update[name] = _merge_lists([current, other])
+        elif not current and other:
+            update[name] = other
+    return first.model_copy(update=update)
+
+
+def merge_canonicals(parts: list[CVCanonical]) -> CVCanonical:
+    """
+    Fusionne des CV canoniques partiels (un par section) : premier champ simple
+    renseigné, listes concaténées dans l'ordre des sections sans doublons (les
+    doublons d'une même expérience sont fusionnés, voir _merge_items).
+    """
+    merged = CVCanonical()
+    for name in CVCanonical.model_fields:
+        values = [getattr(part, name) for part in parts]
+        if isinstance(getattr(merged, name), list):
+            setattr(merged, name, _merge_lists(values))
+        else:
+            setattr(merged, name, next((v for v in values if v), None))
+    return merged
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Protocol
+
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+# Signatures (magic bytes) des formats acceptés
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"  # DOCX = archive ZIP
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # DOC (Word 97-2003), illisible par python-docx
+
+UNSUPPORTED_FORMAT_MESSAGE = "Format non supporté. PDF ou DOCX uniquement."
+
+_EXPECTED_MAGIC = {
+    ".pdf": (PDF_MAGIC,),
+    ".docx": (ZIP_MAGIC,),
+    ".doc": (ZIP_MAGIC,),  # seuls les DOCX renommés en .doc sont lisibles
+}
+
+
+class UploadRejectedError(ValueError):
+    """Fichier refusé pendant la lecture (taille, contenu)."""
+
+
+class AsyncReadable(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+@dataclass
+class UploadedDocument:
+    """
+    CV reçu : gardé en mémoire s'il est petit, sinon copié dans un fichier
+    temporaire (transmis par chemin à l'extraction). `close()` supprime ce fichier
+    quand plus aucun détenteur ne l'utilise (`retain()` en ajoute un, ex. une
+    analyse partagée qui peut survivre à la requête qui l'a lancée).
+    """
+
+    filename: str
+    size: int
+    content_hash: str
+    data: bytes | None = None
+    path: str | None = None
+    temporary: bool = False
+    holders: int = field(default=1, init=False, repr=False)
+
+    @classmethod
+    def from_bytes(cls, filename: str, data: bytes) -> "UploadedDocument":
+        return cls(filename=filename, size=len(data), content_hash=hashlib.sha256(data).hexdigest(), data=data)
+
+    @classmethod
+    def from_path(cls, filename: str, path: str) -> "UploadedDocument":
+        """Fichier déjà sur disque (lot local) : haché par blocs, jamais chargé ni supprimé."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(filename=filename, size=size, content_hash=digest.hexdigest(), path=path)
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def retain(self) -> None:
+        self.holders += 1
+
+    def close(self) -> None:
+        self.holders = max(0, self.holders - 1)
+        if self.holders:
+            return
+        if self.temporary and self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def close_all(documents) -> None:
+    for document in documents:
+        document.close()
+
+
+def sniff_format(head: bytes, filename: str) -> None:
+    """Vérifie que les premiers octets correspondent à l'extension annoncée."""
+    if head.startswith(OLE_MAGIC):
+        # Word 97-2003 : refusé à l'envoi plutôt qu'en échec à l'extraction
+        raise UploadRejectedError(UNSUPPORTED_FORMAT_MESSAGE)
+    extension = os.path.splitext(filename.lower())[1]
+    expected = _EXPECTED_MAGIC.get(extension)
+    if expected is None:
+        raise UploadRejectedError("Extension non supportée (PDF/DOCX uniquement).")
+    if not any(head.startswith(magic) for magic in expected):
+        raise UploadRejectedError("Contenu du fichier invalide : ce n'est pas un PDF/DOCX valide.")
+
+
+class _Spooler:
+    """Accumule les blocs d'un envoi : en mémoire, puis sur disque passé le seuil."""
+
+    def __init__(self, filename: str, max_bytes: int, spool_threshold: int | None):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.spool_threshold = (
+            settings.UPLOAD_SPOOL_THRESHOLD_KB * 1024 if spool_threshold is None else spool_threshold
+        )
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray()
+        self.spool = None
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        if self.size == 0:
+            sniff_format(chunk, self.filename)
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejectedError(
+                f"Fichier trop volumineux (taille maximale : {self.max_bytes // (1024 * 1024)} Mo)."
+            )
+        self.digest.update(chunk)
+
+        if self.spool is None and self.size > self.spool_threshold:
+            suffix = os.path.splitext(self.filename)[1].lower()
+            self.spool = tempfile.NamedTemporaryFile(
+                prefix="cv-", suffix=suffix, dir=settings.UPLOAD_TMP_DIR, delete=False
+            )
+            self.spool.write(self.buffer)
+            self.buffer = bytearray()
+        if self.spool is not None:
+            self.spool.write(chunk)
+        else:
+            self.buffer.extend(chunk)
+
+    def finish(self) -> UploadedDocument:
+        if self.size == 0:
+            raise UploadRejectedError("Fichier vide.")
+        document = UploadedDocument(filename=self.filename, size=self.size, content_hash=self.digest.hexdigest())
+        if self.spool is not None:
+            self.spool.close()
+            document.path = self.spool.name
+            document.temporary = True
+        else:
+            document.data = bytes(self.buffer)
+        return document
+
+    def discard(self) -> None:
+        if self.spool is not None:
+            self.spool.close()
+            os.remove(self.spool.name)
+
+
+async def read_upload(
+    source: AsyncReadable,
+    filename: str,
+    max_bytes: int,
+    spool_threshold: int | None = None,
+) -> UploadedDocument:
+    """
+    Lit un envoi par blocs : arrêt dès que `max_bytes` est dépassé, contrôle des
+    magic bytes sur le premier bloc, hash calculé au fil de l'eau. Au-delà de
+    `spool_threshold` octets, le contenu est écrit dans un fichier temporaire
+    au lieu d'être accumulé en mémoire.
+    """
+    spooler = _Spooler(filename, max_bytes, spool_threshold)
+    try:
+        while chunk := await source.read(CHUNK_SIZE):
+            spooler.write(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.discard()
+        raise
+
+
+def spool_stream(
+    source: BinaryIO,
+    filename: str,
+    max_bytes: int,
+    spool_threshold: int | None = None,
+) -> UploadedDocument:
+    """Équivalent synchrone de read_upload (entrées d'une archive ZIP)."""
+    spooler = _Spooler(filename, max_bytes, spool_threshold)
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            spooler.write(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.discard()
+        raise
@@ -0,0 +1,129 @@
+"""
+Génère un corpus de CV synthétiques (PDF et DOCX) de tailles variées.
+
+Usage (depuis le dossier backend) :
+    python -m benchmarks.corpus --out benchmarks/corpus --count 12 --seed 42
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+
+FIRST_NAMES = ("Camille", "Louis", "Inès", "Hugo", "Léa", "Nathan", "Chloé", "Yanis", "Manon", "Adam", "Sarah", "Lucas")
+LAST_NAMES = ("Martin", "Bernard", "Dubois", "Thomas", "Robert", "Petit", "Durand", "Leroy", "Moreau", "Simon")
+TITLES = ("Développeur backend", "Data engineer", "Ingénieure DevOps", "Développeuse full-stack", "Data scientist")
+COMPANIES = ("Exemple SAS", "Démo Conseil", "Acme Industries", "Nova Santé", "Orion Logistique", "Atlas Banque")
+CITIES = ("Paris", "Lyon", "Nantes", "Lille", "Bordeaux", "Toulouse")
+SKILLS = (
+    "Python", "FastAPI", "Django", "PostgreSQL", "Redis", "Docker", "Kubernetes", "AWS", "Terraform",
+    "React", "TypeScript", "Kafka", "Spark", "Airflow", "GitLab CI", "Linux", "SQL", "Pandas",
+)
+ACTIONS = (
+    "Conception et développement", "Migration", "Optimisation des performances", "Mise en place",
+    "Industrialisation", "Refonte", "Automatisation", "Supervision",
+)
+OBJECTS = (
+    "d'une API REST à fort trafic", "du pipeline de données quotidien", "de la plateforme de paiement",
+    "des déploiements continus", "du moteur de recherche interne", "de l'entrepôt de données",
+)
+
+# Nombre d'expériences par taille : de ~1 page à une dizaine de pages
+SIZES = {"small": 2, "medium": 8, "large": 30}
+
+
+def build_cv_text(rng: random.Random, experiences: int) -> list[str]:
+    """Lignes d'un CV réaliste (nom en première ligne)."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [
+        name,
+        f"{rng.choice(TITLES)} - {rng.choice(CITIES)}",
+        f"{name.lower().replace(' ', '.')}@example.com - 06 12 34 56 78",
+        "",
+        "PROFIL",
+        f"{rng.randint(2, 15)} ans d'expérience en développement logiciel et en données.",
+        "",
+        "EXPÉRIENCES",
+    ]
+    year = 2024
+    for _ in range(experiences):
+        start = year - rng.randint(1, 3)
+        lines.append(f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)} ({start} - {year})")
+        for _ in range(rng.randint(3, 6)):
+            lines.append(f"- {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} ({', '.join(rng.sample(SKILLS, 3))})")
+        lines.append("")
+        year = start
+    lines += [
+        "FORMATION",
+        f"Master Informatique - Université de {rng.choice(CITIES)} ({year - 2} - {year})",
+        "",
+        "COMPÉTENCES",
+        ", ".join(rng.sample(SKILLS, 10)),
+        "",
+        "LANGUES",
+        "Français (natif), Anglais (C1)",
+    ]
+    return lines
+
+
+def write_pdf(path: str, lines: list[str]) -> None:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    per_page = 55
+    for i in range(0, len(lines), per_page):
+        page = doc.new_page()
+        y = 50
+        for line in lines[i:i + per_page]:
+            page.insert_text((50, y), line, fontsize=10)
+            y += 13
+    doc.save(path)
+    doc.close()
+
+
+def write_docx(path: str, lines: list[str]) -> None:
+    import docx
+
+    d = docx.Document()
+    for line in lines:
+        d.add_paragraph(line)
+    d.save(path)
+
+
+def generate_corpus(out_dir: str, count: int = 12, seed: int = 42) -> list[str]:
+    """Écrit `count` CV (alternance PDF/DOCX, tailles small/medium/large) ; renvoie leurs chemins."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    sizes = list(SIZES.items())
+    for i in range(count):
+        size, experiences = sizes[i % len(sizes)]
+        extension = ".pdf" if (i // len(sizes)) % 2 == 0 else ".docx"
+        path = os.path.join(out_dir, f"cv_{i:03d}_{size}{extension}")
+        lines = build_cv_text(rng, experiences)
+        (write_pdf if extension == ".pdf" else write_docx)(path, lines)
+        paths.append(path)
+    return paths
+
+
+def list_corpus(directory: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith((".pdf", ".docx"))
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=os.path.join("benchmarks", "corpus"))
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    for path in generate_corpus(args.out, args.count, args.seed):
+        print(f"{path} ({os.path.getsize(path) // 1024} Ko)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Serveur factice compatible OpenAI (POST /v1/chat/completions) pour les
+benchmarks et tests de charge : latence et taux d'erreur configurables,
+réponses JSON plausibles par étape (tirées de fixtures/llm), usage en tokens.
+
+Usage (depuis le dossier backend) :
+    python -m benchmarks.fake_llm --port 8900 --latency 0.8 --jitter 0.3 --error-rate 0.05
+
+puis lancer l'API avec OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "llm")
+
+# Étape déduite du message système des prompts de app/services/llm.py
+STAGE_MARKERS = (
+    ("analyse complète de CV", "fused"),
+    ("compilation d'offres d'emploi", "job_profile"),
+    ("extraction de données structurées", "canonicalize"),
+    ("expert en ATS", "ats"),
+    ("extraction de mots-clés", "keyword_matching"),
+    ("comparaison de CV", "compare"),
+    ("recrutement et matching", "job_matching"),
+    ("matching CV/offre", "resolve_keywords"),
+)
+
+
+def detect_stage(messages: list[dict]) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    for marker, stage in STAGE_MARKERS:
+        if marker in system:
+            return stage
+    return "job_matching"
+
+
+def load_fixtures(directory: str) -> dict[str, dict]:
+    fixtures = {}
+    for _marker, stage in STAGE_MARKERS:
+        path = os.path.join(directory, stage, "default.json")
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                fixtures[stage] = json.load(f)
+    return fixtures
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(
+    latency: float = 0.5,
+    jitter: float = 0.2,
+    error_rate: float = 0.0,
+    error_status: int = 429,
+    fixtures_dir: str = FIXTURES_DIR,
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    fixtures = load_fixtures(fixtures_dir)
+    counters = {"requests": 0, "errors": 0}
+
+    def content_for(stage: str, prompt: str) -> dict:
+        content = json.loads(json.dumps(fixtures.get(stage, {})))
+        if stage == "canonicalize":
+            # Un CV canonique propre à chaque document (sinon tout le reste sortirait du cache)
+            match = re.search(r"Texte du CV:\s*\n\s*(.+)", prompt)
+            if match:
+                content["full_name"] = match.group(1).strip()[:80]
+        elif stage == "compare":
+            # Réutilise les IDs du prompt pour que le classement soit exploitable
+            ids = list(dict.fromkeys(re.findall(r"CV ID: '([^']+)'", prompt)))
+            template = content.get("cvs") or [{}]
+            content["cvs"] = [
+                {**template[i % len(template)], "cv_id": cv_id, "matching_score": max(10, 90 - 7 * i)}
+                for i, cv_id in enumerate(ids)
+            ]
+            content["overall_ranking"] = ids
+        return content
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+        if error_rate and random.random() < error_rate:
+            counters["errors"] += 1
+            if error_status == 429:
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                    status_code=429,
+                    headers={"retry-after-ms": "200"},
+                )
+            return JSONResponse({"error": {"message": "Upstream error", "type": "server_error"}}, status_code=error_status)
+
+        messages = body.get("messages", [])
+        prompt = messages[-1].get("content", "") if messages else ""
+        stage = detect_stage(messages)
+        result = content_for(stage, prompt)
+        schema = (body.get("response_format") or {}).get("json_schema")
+        if schema:
+            # Sortie structurée : ne renvoie que les parties demandées par le schéma
+            properties = schema.get("schema", {}).get("properties", {})
+            result = {name: value for name, value in result.items() if name in properties}
+        content = json.dumps(result, ensure_ascii=False)
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-fake-{counters['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_llm", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Latence moyenne par appel (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variation uniforme de la latence (± s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion d'appels en erreur (0-1)")
+    parser.add_argument("--error-status", type=int, default=429, help="Code HTTP des erreurs simulées (429, 500, 503...)")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Répertoire des réponses par étape")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.error_status, args.fixtures)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
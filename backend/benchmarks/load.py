@@ -0,0 +1,183 @@
+"""
+Test de charge de bout en bout de /analyze-cv et /compare-cvs : latences
+p50/p95/p99, débit et tokens LLM consommés par requête, pour plusieurs
+niveaux de concurrence.
+
+Usage (depuis le dossier backend), avec le serveur LLM factice :
+    python -m benchmarks.fake_llm --port 8900 &
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load --url http://127.0.0.1:8000 --concurrency 1,4,16 --requests 40
+
+ou sans serveur HTTP (application chargée dans le processus) :
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake python -m benchmarks.load --in-process
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.corpus import generate_corpus, list_corpus
+from benchmarks.stats import print_table, summarize
+
+API_PREFIX = "/api/v1"
+DEFAULT_JOB_DESCRIPTION = (
+    "Développeur backend Python confirmé : FastAPI, PostgreSQL, Docker, Kubernetes, AWS. "
+    "5 ans d'expérience minimum, anglais courant."
+)
+CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+_TOKENS_LINE = re.compile(r'^cv_analyzer_llm_tokens_total\{.*kind="(prompt|completion)".*\}\s+([0-9.e+]+)$', re.M)
+
+
+def _file_part(path: str, field: str = "file") -> tuple[str, tuple[str, bytes, str]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    name = os.path.basename(path)
+    return field, (name, data, CONTENT_TYPES[os.path.splitext(name)[1].lower()])
+
+
+async def _llm_tokens(client: httpx.AsyncClient) -> dict[str, float]:
+    """Tokens cumulés côté serveur (métriques Prometheus), vide si indisponible."""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return {}
+    totals: dict[str, float] = {}
+    for kind, value in _TOKENS_LINE.findall(response.text):
+        totals[kind] = totals.get(kind, 0.0) + float(value)
+    return totals
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    paths: list[str],
+    concurrency: int,
+    total: int,
+    job_description: str,
+    compare_size: int,
+) -> dict:
+    cycle = itertools.cycle(paths)
+    # Chaque requête reçoit ses fichiers à l'avance : la lecture disque n'est pas mesurée
+    if endpoint == "analyze":
+        payloads = [[_file_part(next(cycle))] for _ in range(total)]
+        url = f"{API_PREFIX}/analyze-cv"
+    else:
+        payloads = [[_file_part(next(cycle), "files") for _ in range(compare_size)] for _ in range(total)]
+        url = f"{API_PREFIX}/compare-cvs"
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+
+    async def one(files) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, files=files, data={"job_description": job_description})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if status == "200":
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    tokens_before = await _llm_tokens(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(files) for files in payloads))
+    wall = time.perf_counter() - start
+    tokens_after = await _llm_tokens(client)
+
+    row = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        **summarize(latencies),
+        "rps": round(len(latencies) / wall, 2) if wall else 0,
+        "errors": sum(errors.values()),
+    }
+    if tokens_after:
+        for kind in ("prompt", "completion"):
+            used = tokens_after.get(kind, 0) - tokens_before.get(kind, 0)
+            row[f"{kind}_tok_per_req"] = round(used / total)
+    if errors:
+        row["error_detail"] = errors
+    return row
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    if args.in_process:
+        from app.core.config import settings
+        from app.main import app, lifespan
+
+        settings.METRICS_ENABLED = True  # tokens lus sur /metrics
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    else:
+        app = lifespan = None
+        transport = None
+        base_url = args.url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list_corpus(args.corpus) if args.corpus else generate_corpus(tmp, count=12)
+        rows: list[dict] = []
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+            if lifespan is not None:
+                context = lifespan(app)
+                await context.__aenter__()
+            try:
+                for endpoint in args.endpoints.split(","):
+                    for concurrency in (int(c) for c in args.concurrency.split(",")):
+                        row = await run_level(
+                            client, endpoint.strip(), paths, concurrency, args.requests,
+                            args.job_description, args.compare_size,
+                        )
+                        if args.label:
+                            row = {"label": args.label, **row}
+                        rows.append(row)
+                        print(json.dumps(row, ensure_ascii=False), flush=True)
+            finally:
+                if lifespan is not None:
+                    await context.__aexit__(None, None, None)
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL de l'API à tester")
+    parser.add_argument("--in-process", action="store_true", help="Charge app.main dans ce processus (ASGI)")
+    parser.add_argument("--endpoints", default="analyze,compare", help="analyze, compare ou les deux")
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveaux de concurrence (séparés par des virgules)")
+    parser.add_argument("--requests", type=int, default=20, help="Requêtes par niveau")
+    parser.add_argument("--compare-size", type=int, default=3, help="CV par requête /compare-cvs")
+    parser.add_argument("--corpus", help="Répertoire de CV (par défaut : corpus synthétique temporaire)")
+    parser.add_argument("--job-description", default=DEFAULT_JOB_DESCRIPTION)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--label", help="Étiquette ajoutée à chaque ligne (ex. configuration testée)")
+    parser.add_argument("--json", dest="json_out", help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(run(args))
+    print()
+    print_table(rows, [
+        "endpoint", "concurrency", "count", "p50_ms", "p95_ms", "p99_ms", "rps", "errors",
+        "prompt_tok_per_req", "completion_tok_per_req",
+    ])
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
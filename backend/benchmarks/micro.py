@@ -0,0 +1,95 @@
+"""
+Microbenchmarks : extraction de texte (PyMuPDF / python-docx) et
+sérialisation des modèles Pydantic.
+
+Usage (depuis le dossier backend) :
+    python -m benchmarks.micro --corpus benchmarks/corpus --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.corpus import generate_corpus, list_corpus
+from benchmarks.stats import print_table, summarize
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: int = 2) -> list[float]:
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def bench_extraction(paths: list[str], repeat: int) -> list[dict]:
+    from app.services.extract_text import extract_text_from_file
+
+    rows = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        filename = os.path.basename(path)
+        durations = measure(lambda: extract_text_from_file(data, filename), repeat)
+        stats = summarize(durations)
+        rows.append({
+            "benchmark": f"extract {filename}",
+            "size_kb": len(data) // 1024,
+            **stats,
+            "mb_per_s": round(len(data) / 1024 / 1024 / (stats["mean_ms"] / 1000), 1),
+        })
+    return rows
+
+
+def bench_models(repeat: int) -> list[dict]:
+    from app.models.cv import ATSAssessment, CVCanonical, CvAnalysisResponse, CVInsights
+
+    fixtures = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "llm")
+    with open(os.path.join(fixtures, "canonicalize", "default.json"), encoding="utf-8") as f:
+        canonical_dict = json.load(f)
+    canonical = CVCanonical.model_validate(canonical_dict)
+    canonical_json = canonical.model_dump_json()
+    response = CvAnalysisResponse(canonical=canonical, ats=ATSAssessment(), insights=CVInsights())
+    response_json = response.model_dump_json()
+
+    cases = {
+        "CVCanonical.model_validate(dict)": lambda: CVCanonical.model_validate(canonical_dict),
+        "CVCanonical.model_validate_json": lambda: CVCanonical.model_validate_json(canonical_json),
+        "CVCanonical.model_dump_json": lambda: canonical.model_dump_json(),
+        "CvAnalysisResponse.model_dump(mode=json)": lambda: response.model_dump(mode="json"),
+        "CvAnalysisResponse aller-retour JSON": lambda: CvAnalysisResponse.model_validate_json(response_json),
+    }
+    rows = []
+    for name, func in cases.items():
+        # Opérations de l'ordre de la microseconde : mesurées par lots de 100
+        durations = [d / 100 for d in measure(lambda: [func() for _ in range(100)], repeat)]
+        rows.append({"benchmark": name, **summarize(durations)})
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Répertoire de CV (par défaut : corpus synthétique temporaire)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", dest="json_out", help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list_corpus(args.corpus) if args.corpus else generate_corpus(tmp, count=6)
+        rows = bench_extraction(paths, args.repeat) + bench_models(args.repeat)
+
+    print_table(rows, ["benchmark", "size_kb", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "mb_per_s"])
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
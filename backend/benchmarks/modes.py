@@ -0,0 +1,87 @@
+"""
+Compare les modes d'analyse "staged" (un appel LLM par étape) et "fused"
+(un seul appel à schéma strict) sur /analyze-cv : latences, appels LLM et
+tokens par requête.
+
+Usage (depuis le dossier backend), avec le serveur LLM factice :
+    python -m benchmarks.fake_llm --port 8900 &
+    export OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake
+    export CANONICAL_CACHE_BACKEND=none RESULT_CACHE_BACKEND=none
+    python -m benchmarks.modes --concurrency 1,8 --requests 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+
+import httpx
+
+from benchmarks.corpus import generate_corpus, list_corpus
+from benchmarks.load import DEFAULT_JOB_DESCRIPTION, run_level
+from benchmarks.stats import print_table
+
+MODES = ("staged", "fused")
+_CALLS_LINE = re.compile(r'^cv_analyzer_llm_call_duration_seconds_count\{.*\}\s+([0-9.e+]+)$', re.M)
+
+
+async def _llm_calls(client: httpx.AsyncClient) -> float:
+    response = await client.get("/metrics")
+    return sum(float(value) for value in _CALLS_LINE.findall(response.text))
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    from app.core.config import settings
+    from app.main import app, lifespan
+    from app.services.cache import canonical_cache, job_matching_cache, keyword_matching_cache
+
+    settings.METRICS_ENABLED = True  # appels LLM lus sur /metrics
+    rows: list[dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list_corpus(args.corpus) if args.corpus else generate_corpus(tmp, count=12)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            async with lifespan(app):
+                for mode in args.modes.split(","):
+                    # Le mode est lu à chaque analyse : bascule sans recharger l'application
+                    settings.ANALYSIS_MODE = mode.strip()
+                    for concurrency in (int(c) for c in args.concurrency.split(",")):
+                        for cache in (canonical_cache, job_matching_cache, keyword_matching_cache):
+                            cache.clear()
+                        calls_before = await _llm_calls(client)
+                        row = await run_level(
+                            client, "analyze", paths, concurrency, args.requests, args.job_description, 0,
+                        )
+                        calls = await _llm_calls(client) - calls_before
+                        row = {"mode": settings.ANALYSIS_MODE, **row, "llm_calls_per_req": round(calls / args.requests, 2)}
+                        rows.append(row)
+                        print(json.dumps(row, ensure_ascii=False), flush=True)
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.modes", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help="Modes à comparer (séparés par des virgules)")
+    parser.add_argument("--concurrency", default="1,8", help="Niveaux de concurrence (séparés par des virgules)")
+    parser.add_argument("--requests", type=int, default=20, help="Requêtes par niveau et par mode")
+    parser.add_argument("--corpus", help="Répertoire de CV (par défaut : corpus synthétique temporaire)")
+    parser.add_argument("--job-description", default=DEFAULT_JOB_DESCRIPTION)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", dest="json_out", help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(run(args))
+    print()
+    print_table(rows, [
+        "mode", "concurrency", "count", "p50_ms", "p95_ms", "p99_ms", "rps", "errors",
+        "llm_calls_per_req", "prompt_tok_per_req", "completion_tok_per_req",
+    ])
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
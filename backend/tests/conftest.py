@@ -0,0 +1,41 @@
+"""
+Configuration commune : fournisseur LLM "fixtures" (réponses rejouées depuis
+fixtures/llm, aucun appel réseau), caches et stores désactivés. Les variables
+sont posées avant le premier import de `app` (la configuration est lue à l'import).
+
+Lancement, depuis le dossier backend :
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import random
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.update(
+    LLM_PROVIDER="fixtures",
+    LLM_FIXTURES_DIR=os.path.join(BACKEND_DIR, "fixtures", "llm"),
+    LLM_FIXTURES_RECORD="false",
+    CANONICAL_CACHE_BACKEND="none",
+    RESULT_CACHE_BACKEND="none",
+    JOB_PROFILE_CACHE_BACKEND="none",
+    COALESCE_BACKEND="memory",
+    JOBS_STORE_BACKEND="memory",
+    EXTRACTION_EXECUTOR="thread",
+    CANDIDATE_STORE_PATH="",
+    EMBEDDING_INDEX_DIR="",
+)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def cv_pdf(tmp_path):
+    """PDF texte d'un CV réaliste (générateur du corpus de benchmarks)."""
+    from benchmarks.corpus import build_cv_text, write_pdf
+
+    path = tmp_path / "cv.pdf"
+    write_pdf(str(path), build_cv_text(random.Random(7), 3))
+    return path
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+
+from app.core.config import settings
+from app.services.batch_api import BatchingProvider, BatchRequestError, LocalBatchBackend
+from app.services.providers import FixtureReplayProvider
+
+MESSAGES = [{"role": "system", "content": "test"}, {"role": "user", "content": "CV"}]
+
+
+def _fixture(stage: str) -> str:
+    with open(os.path.join(settings.LLM_FIXTURES_DIR, stage, "default.json"), encoding="utf-8") as f:
+        return f.read()
+
+
+def _batching(tmp_path) -> BatchingProvider:
+    backend = LocalBatchBackend(str(tmp_path / "local"), FixtureReplayProvider(settings.LLM_FIXTURES_DIR))
+    return BatchingProvider(backend, str(tmp_path), flush_seconds=0.05, poll_seconds=0.01)
+
+
+def test_local_batch_round_trip(tmp_path):
+    async def main():
+        batching = _batching(tmp_path)
+        try:
+            responses = await asyncio.gather(
+                batching.complete("canonicalize", "model-a", MESSAGES),
+                batching.complete("ats", "model-a", MESSAGES),
+                batching.complete("canonicalize", "model-b", MESSAGES),
+            )
+            return responses, batching.submitted
+        finally:
+            await batching.close()
+
+    responses, submitted = asyncio.run(main())
+
+    # Un lot par modèle
+    assert submitted == 2
+    assert [json.loads(r.content) for r in responses] == [
+        json.loads(_fixture("canonicalize")), json.loads(_fixture("ats")), json.loads(_fixture("canonicalize"))
+    ]
+    assert [r.model for r in responses] == ["model-a", "model-a", "model-b"]
+    # Fichiers au format de l'API Batch : entrée et sortie par lot
+    batches = os.listdir(tmp_path / "local")
+    assert len(batches) == 2
+    for batch_id in batches:
+        with open(tmp_path / "local" / batch_id / "batch.json", encoding="utf-8") as f:
+            state = json.load(f)
+        assert state["status"] == "completed" and state["failed"] == 0
+
+
+def test_failed_request_raises_for_its_caller_only(tmp_path):
+    async def main():
+        batching = _batching(tmp_path)
+        try:
+            return await asyncio.gather(
+                batching.complete("canonicalize", "model-a", MESSAGES),
+                batching.complete("unknown_stage", "model-a", MESSAGES),
+                return_exceptions=True,
+            )
+        finally:
+            await batching.close()
+
+    ok, failed = asyncio.run(main())
+
+    assert json.loads(ok.content) == json.loads(_fixture("canonicalize"))
+    assert isinstance(failed, BatchRequestError)
+
+
+def test_interrupted_local_batch_resumes_on_retrieve(tmp_path):
+    inner = FixtureReplayProvider(settings.LLM_FIXTURES_DIR)
+    input_path = tmp_path / "input.jsonl"
+    line = {"custom_id": "ats-0000001", "method": "POST", "url": "/v1/chat/completions",
+            "body": {"model": "model-a", "messages": MESSAGES}}
+    input_path.write_text(json.dumps(line) + "\n", encoding="utf-8")
+
+    async def submit() -> str:
+        backend = LocalBatchBackend(str(tmp_path / "local"), inner)
+        batch_id = await backend.submit(str(input_path), "test")
+        await backend.close()  # processus arrêté avant la fin du lot
+        return batch_id
+
+    async def resume(batch_id: str):
+        backend = LocalBatchBackend(str(tmp_path / "local"), inner)
+        state = await backend.retrieve(batch_id)
+        while state.status != "completed":
+            await asyncio.sleep(0.01)
+            state = await backend.retrieve(batch_id)
+        return await backend.results(state)
+
+    batch_id = asyncio.run(submit())
+    results = asyncio.run(asyncio.wait_for(resume(batch_id), timeout=5))
+
+    assert [r["custom_id"] for r in results] == ["ats-0000001"]
+    assert results[0]["response"]["status_code"] == 200
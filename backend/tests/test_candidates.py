@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+from app.main import app, cors_origins
+from app.models.cv import CVCanonical
+from app.services import analyze, candidates, embeddings
+from app.services.cache import MemoryLRUCache, ModelCache
+
+
+async def _request(method: str, url: str, **kwargs) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        return await client.request(method, url, **kwargs)
+
+
+def test_delete_erases_store_cache_and_embeddings(monkeypatch, tmp_path, cv_pdf):
+    monkeypatch.setattr(settings, "CANDIDATE_STORE_PATH", str(tmp_path / "candidates.sqlite3"))
+    monkeypatch.setattr(settings, "EMBEDDING_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(candidates, "_store", None)
+    monkeypatch.setattr(embeddings, "_shared_index", None)
+    cache = ModelCache("canonical", CVCanonical, MemoryLRUCache(max_entries=10))
+    monkeypatch.setattr(analyze, "canonical_cache", cache)
+
+    with open(cv_pdf, "rb") as f:
+        analyzed = asyncio.run(_request("POST", "/api/v1/analyze-cv", files={"file": ("cv.pdf", f.read(), "application/pdf")}))
+    assert analyzed.status_code == 200, analyzed.text
+    shortlist = asyncio.run(_request("POST", "/api/v1/candidates/shortlist", data={"job_description": "Python"}))
+    [candidate] = shortlist.json()["candidates"]
+    index = embeddings.get_cv_index()
+    assert len(index) == 1 and len(cache.backend) == 2  # clés fichier brut et texte extrait
+
+    deleted = asyncio.run(_request("DELETE", f"/api/v1/candidates/{candidate['candidate_id']}"))
+
+    assert deleted.status_code == 204
+    assert asyncio.run(_request("GET", f"/api/v1/candidates/{candidate['candidate_id']}")).status_code == 404
+    assert len(cache.backend) == 0
+    assert len(index) == 0
+    assert len(embeddings.EmbeddingIndex(index.embedder, settings.EMBEDDING_INDEX_DIR)) == 0
+
+
+def test_cors_preflight_allows_delete():
+    response = asyncio.run(_request("OPTIONS", "/api/v1/candidates/abc", headers={
+        "Origin": cors_origins[0],
+        "Access-Control-Request-Method": "DELETE",
+    }))
+
+    assert response.status_code == 200
+    assert "DELETE" in response.headers["access-control-allow-methods"]
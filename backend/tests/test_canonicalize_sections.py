@@ -0,0 +1,72 @@
+import asyncio
+import shutil
+
+from app.core.config import settings
+from app.models.cv import CVCanonical, DateRange, ExperienceItem
+from app.services import analyze, llm
+from app.services.cache import MemoryLRUCache, ModelCache
+from app.services.providers import FixtureReplayProvider, fixture_key
+from app.services.sections import merge_canonicals
+from app.services.uploads import UploadedDocument
+
+
+class SpyProvider(FixtureReplayProvider):
+    """Rejoue les fixtures et note les clés des appels (pour en casser un)."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.calls: list[tuple[str, list[dict]]] = []
+
+    async def complete(self, stage, model, messages, **kwargs):
+        self.calls.append((stage, messages))
+        return await super().complete(stage, model, messages, **kwargs)
+
+
+def test_failed_section_is_not_cached(cv_pdf, tmp_path, monkeypatch):
+    fixtures = tmp_path / "fixtures"
+    shutil.copytree(settings.LLM_FIXTURES_DIR, fixtures)
+    provider = SpyProvider(str(fixtures))
+    cache = ModelCache("canonical", CVCanonical, MemoryLRUCache(max_entries=10))
+    monkeypatch.setattr(settings, "CANONICALIZE_MODE", "sections")
+    monkeypatch.setattr(llm, "provider", provider)
+    monkeypatch.setattr(analyze, "canonical_cache", cache)
+
+    def canonicalize():
+        document = UploadedDocument.from_path("cv.pdf", str(cv_pdf))
+        return asyncio.run(analyze.canonicalize_document(document))
+
+    # Premier passage : repère l'appel de la section « expériences »
+    canonicalize()
+    label = llm._SECTION_LABELS["experience"]
+    experience_calls = [(s, m) for s, m in provider.calls if label in m[-1]["content"]]
+    assert len(experience_calls) == 1
+    cache.clear()
+
+    # Fixture de cette section invalide : résultat partiel, signalé et jamais mis en cache
+    broken = fixtures / "canonicalize" / f"{fixture_key(*experience_calls[0])}.json"
+    broken.write_text("{pas du json", encoding="utf-8")
+    canonical = canonicalize()
+    assert canonical.full_name
+    assert any("non analysée" in w for w in canonical.extraction_warnings)
+    assert len(cache.backend) == 0
+
+    # Fournisseur rétabli : le nouvel envoi réessaie, puis le résultat complet est mis en cache
+    broken.unlink()
+    canonical = canonicalize()
+    assert not any("non analysée" in w for w in canonical.extraction_warnings)
+    assert len(cache.backend) == 2
+
+
+def test_experience_split_across_chunks_is_merged():
+    head = ExperienceItem(title="Développeur", company="ACME", dates=DateRange(start="2019"), bullets=["API REST"])
+    tail = ExperienceItem(
+        title="Développeur", company="ACME", dates=DateRange(start="2019"), location="Lyon",
+        bullets=["API REST", "Migration vers Docker"], skills=["Docker"],
+    )
+
+    merged = merge_canonicals([CVCanonical(experiences=[head]), CVCanonical(experiences=[tail])])
+
+    [experience] = merged.experiences
+    assert experience.bullets == ["API REST", "Migration vers Docker"]
+    assert experience.skills == ["Docker"]
+    assert experience.location == "Lyon"
@@ -0,0 +1,33 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.coalesce import SingleFlight, SQLiteFlightStore
+
+
+class Value(BaseModel):
+    n: int
+
+
+def test_lock_is_renewed_while_leader_runs_past_ttl(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "COALESCE_LOCK_TTL_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "COALESCE_POLL_INTERVAL_SECONDS", 0.05)
+    path = str(tmp_path / "flights.sqlite3")
+    # Deux workers : chacun son SingleFlight et sa connexion
+    workers = [SingleFlight("test", Value, SQLiteFlightStore(path)) for _ in range(2)]
+    calls: list[int] = []
+
+    async def slow() -> Value:
+        calls.append(1)
+        await asyncio.sleep(1.0)  # plus de 3 TTL
+        return Value(n=len(calls))
+
+    async def scenario() -> list[Value]:
+        leader = asyncio.create_task(workers[0].run("cle", slow))
+        await asyncio.sleep(0.1)
+        return await asyncio.gather(leader, workers[1].run("cle", slow))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [r.n for r in results] == [1, 1]
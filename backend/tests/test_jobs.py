@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from app.models.jobs import JobInfo, JobKind, JobStatus
+from app.services.jobs import INTERRUPTED_JOB_ERROR, JobManager, MemoryJobStore, SQLiteJobStore
+
+
+def test_expired_lease_fails_job_of_dead_process(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    alive = SQLiteJobStore(path, lease_seconds=60)
+    job = JobInfo(job_id="j1", kind=JobKind.ANALYZE, created_at=time.time())
+    alive.save(job)
+
+    # Même hostname, même PID (conteneurs) : seul le bail compte
+    other = SQLiteJobStore(path, lease_seconds=60)
+    assert other.fail_orphans(INTERRUPTED_JOB_ERROR) == 0
+
+    with other._conn:
+        other._conn.execute("UPDATE jobs SET lease_until = ?", (time.time() - 1,))
+    assert other.fail_orphans(INTERRUPTED_JOB_ERROR) == 1
+    failed = other.get("j1")
+    assert failed.status == JobStatus.FAILED
+    assert failed.error == INTERRUPTED_JOB_ERROR
+
+
+def test_stop_cleans_up_queued_jobs():
+    cleaned: list[str] = []
+
+    async def scenario() -> None:
+        manager = JobManager(MemoryJobStore(), workers=1, queue_size=10, ttl_seconds=60, lease_seconds=60)
+        await manager.start()
+        blocker = asyncio.Event()
+
+        async def slow():
+            await blocker.wait()
+
+        manager.submit(JobKind.ANALYZE, slow, cleanup=lambda: cleaned.append("running"))
+        queued = manager.submit(JobKind.ANALYZE, slow, cleanup=lambda: cleaned.append("queued"))
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        assert manager.get(queued.job_id).error == INTERRUPTED_JOB_ERROR
+
+    asyncio.run(scenario())
+    assert sorted(cleaned) == ["queued", "running"]
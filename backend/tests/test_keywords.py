@@ -0,0 +1,70 @@
+from app.models.cv import CVCanonical, EducationItem, ExperienceItem, KeywordMatchStatus
+from app.services.keywords import extract_offer_keywords, local_keyword_matching
+
+OFFER = """Profil recherché :
+- Bac+2 minimum requis
+- Maîtrise de Go et Python (obligatoire)
+- Connaissance de l'intelligence artificielle
+- Expérience en Vente souhaitée
+- Compétences : Snowflake, Looker Studio, SQL
+Poste basé à Paris, CDI H/F, au sein de notre équipe R&D."""
+
+
+def _statuses(canonical: CVCanonical, offer: str = OFFER) -> dict[str, KeywordMatchStatus]:
+    return {m.keyword: m.status for m in local_keyword_matching(canonical, offer).keywords}
+
+
+def test_ambiguous_aliases_in_free_text_are_not_matches():
+    cv = CVCanonical(
+        hard_skills=["Python", "SQL"],
+        experiences=[ExperienceItem(
+            title="Chef de projet marketing",
+            bullets=["Refonte du reporting dans le but de réduire les coûts", "Go-to-market plan, AI features"],
+        )],
+        summary="Profil commercial et orienté résultats.",
+    )
+
+    statuses = _statuses(cv)
+
+    # "but", "go", "ai", "commercial" dans des phrases ne prouvent ni diplôme, ni langage, ni domaine
+    assert statuses["Bac+2"] == KeywordMatchStatus.ABSENT
+    assert statuses["Go"] == KeywordMatchStatus.ABSENT
+    assert statuses["Intelligence artificielle"] == KeywordMatchStatus.ABSENT
+    assert statuses["Vente"] == KeywordMatchStatus.ABSENT
+    assert statuses["Python"] == KeywordMatchStatus.PRESENT
+    matching = local_keyword_matching(cv, OFFER)
+    assert matching.coverage_score < 100
+    assert "Go" in matching.critical_missing
+
+
+def test_ambiguous_aliases_still_match_in_structured_fields():
+    cv = CVCanonical(
+        hard_skills=["Go"],
+        experiences=[ExperienceItem(title="Développeur IA")],
+        education=[EducationItem(degree="BUT Informatique")],
+    )
+
+    statuses = _statuses(cv)
+
+    assert statuses["Go"] == KeywordMatchStatus.PRESENT
+    assert statuses["Intelligence artificielle"] == KeywordMatchStatus.PRESENT
+    assert statuses["Bac+2"] == KeywordMatchStatus.PRESENT
+
+
+def test_offer_ambiguous_aliases_need_their_exact_form():
+    names = {k.keyword for k in extract_offer_keywords("Lancement go-to-market, dans le but de croître (R&D).")}
+
+    assert names.isdisjoint({"Go", "Bac+2", "R"})
+
+
+def test_unknown_offer_terms_are_reported_missing():
+    cv = CVCanonical(hard_skills=["Python", "SQL"])
+
+    keywords = {k.keyword: k for k in extract_offer_keywords(OFFER)}
+    statuses = _statuses(cv)
+
+    assert not keywords["Snowflake"].known
+    assert statuses["Snowflake"] == KeywordMatchStatus.ABSENT
+    assert statuses["Looker Studio"] == KeywordMatchStatus.ABSENT
+    # Mots à majuscule hors lignes d'exigences (ville, contrat) : pas des compétences
+    assert not {"Paris", "CDI"} & set(statuses)
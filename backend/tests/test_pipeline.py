@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+
+JOB_DESCRIPTION = "Développeur backend Python : FastAPI, PostgreSQL, Docker. Anglais courant."
+
+
+def _fixture(stage: str) -> dict:
+    with open(os.path.join(settings.LLM_FIXTURES_DIR, stage, "default.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def _post(url: str, **kwargs) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        return await client.post(url, **kwargs)
+
+
+def test_analyze_cv_replays_fixtures_end_to_end(cv_pdf):
+    with open(cv_pdf, "rb") as f:
+        response = asyncio.run(_post(
+            "/api/v1/analyze-cv",
+            files={"file": ("cv.pdf", f.read(), "application/pdf")},
+            data={"job_description": JOB_DESCRIPTION},
+        ))
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["canonical"]["full_name"] == _fixture("canonicalize")["full_name"]
+    assert body["ats"]["total_score"] == _fixture("ats")["ats"]["total_score"]
+    assert body["job_matching"] is not None
+    assert body["job_matching"]["keyword_matching"]["keywords"]
+
+
+def test_analyze_cv_without_offer_skips_matching(cv_pdf):
+    with open(cv_pdf, "rb") as f:
+        response = asyncio.run(_post("/api/v1/analyze-cv", files={"file": ("cv.pdf", f.read(), "application/pdf")}))
+
+    assert response.status_code == 200, response.text
+    assert response.json()["job_matching"] is None
+
+
+def test_analyze_cv_rejects_wrong_content():
+    response = asyncio.run(_post(
+        "/api/v1/analyze-cv",
+        files={"file": ("cv.pdf", b"pas un pdf", "application/pdf")},
+    ))
+
+    assert response.status_code == 400
+
+
+def _zip(entries: dict[str, bytes]) -> bytes:
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_batch_zip_streams_one_record_per_cv(cv_pdf):
+    data = cv_pdf.read_bytes()
+    archive = _zip({"a.pdf": data, "b.pdf": data + b"\n%autre"})
+    response = asyncio.run(_post("/api/v1/batch/analyze", files={"files": ("lot.zip", archive, "application/zip")}))
+
+    assert response.status_code == 200, response.text
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["filename"] for r in records) == ["a.pdf", "b.pdf"]
+    assert all(r["status"] == "ok" for r in records)
+
+
+def test_batch_zip_too_many_files_rejected_before_decompression(monkeypatch, cv_pdf):
+    from app.services import batch
+
+    monkeypatch.setattr(settings, "BATCH_MAX_FILES", 2)
+    monkeypatch.setattr(batch, "spool_stream", lambda *args: (_ for _ in ()).throw(AssertionError("décompressé")))
+    archive = _zip({f"{i}.pdf": b"%PDF-1.4" for i in range(2)})
+    with open(cv_pdf, "rb") as f:
+        response = asyncio.run(_post("/api/v1/batch/analyze", files=[
+            ("files", ("lot.zip", archive, "application/zip")),
+            ("files", ("cv.pdf", f.read(), "application/pdf")),
+        ]))
+
+    assert response.status_code == 400
+    assert "Trop de fichiers" in response.json()["detail"]
+
+
+def test_metrics_label_routes_with_their_mount_prefix(monkeypatch):
+    async def scenario() -> tuple[httpx.Response, httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            disabled = await client.get("/metrics")
+            monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+            await client.get("/api/v1/cache/stats")
+            return disabled, await client.get("/metrics")
+
+    disabled, metrics = asyncio.run(scenario())
+
+    assert disabled.status_code == 404
+    assert 'route="/api/v1/cache/stats"' in metrics.text
+    assert 'route="/cache/stats"' not in metrics.text
+
+
+def test_analyze_cv_rejects_word_97_documents():
+    ole = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\0" * 512
+    for content_type in ("application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"):
+        response = asyncio.run(_post("/api/v1/analyze-cv", files={"file": ("cv.doc", ole, content_type)}))
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Format non supporté. PDF ou DOCX uniquement."
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.services.pipeline import Stage, StageFailedError, run_stages
+
+
+async def _slow(_deps):
+    await asyncio.sleep(5)
+    return "trop tard"
+
+
+def test_timeout_uses_fallback_and_feeds_dependents():
+    seen = {}
+
+    async def dependent(deps):
+        seen.update(deps)
+        return "ok"
+
+    result = asyncio.run(run_stages([
+        Stage("slow", _slow, timeout=0.05, fallback=lambda error: "dégradé"),
+        Stage("next", dependent, depends_on=("slow",)),
+    ]))
+
+    assert result.value("slow") == "dégradé"
+    assert "délai" in result.errors["slow"]
+    assert seen == {"slow": "dégradé"}
+    assert result.outcomes["next"].ok
+
+
+def test_independent_stages_run_in_parallel():
+    async def wait(_deps):
+        await asyncio.sleep(0.2)
+        return True
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await run_stages([Stage("a", wait), Stage("b", wait), Stage("c", wait)])
+        return loop.time() - start
+
+    assert asyncio.run(main()) < 0.4
+
+
+def test_failure_without_fallback_stops_the_pipeline():
+    async def boom(_deps):
+        raise RuntimeError("panne")
+
+    with pytest.raises(StageFailedError) as info:
+        asyncio.run(run_stages([Stage("boom", boom), Stage("after", _slow, depends_on=("boom",))]))
+
+    assert info.value.stage == "boom"
+    assert "panne" in info.value.error
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(run_stages([Stage("a", _slow, depends_on=("missing",))]))
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def fake_server(responses: list[JSONResponse]) -> tuple[FastAPI, list[float]]:
+    """Serveur compatible OpenAI qui rejoue `responses` dans l'ordre (la dernière ensuite)."""
+    app = FastAPI()
+    calls: list[float] = []
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions():
+        calls.append(time.monotonic())
+        return responses[min(len(calls), len(responses)) - 1]
+
+    return app, calls
+
+
+def client_for(app: FastAPI) -> openai.AsyncOpenAI:
+    # Nouvelles tentatives du SDK désactivées : seules celles de call_with_resilience comptent
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return openai.AsyncOpenAI(api_key="test", base_url="http://fake/v1", max_retries=0, http_client=http_client)
+
+
+def chat(client: openai.AsyncOpenAI):
+    return lambda: client.chat.completions.create(model="test", messages=[{"role": "user", "content": "?"}])
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    monkeypatch.setattr(resilience, "circuit_breaker", breaker)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY_SECONDS", 0.01)
+    return breaker
+
+
+def test_retry_after_is_honoured_on_429(breaker):
+    rate_limited = JSONResponse(
+        {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+        status_code=429,
+        headers={"retry-after": "0.3"},
+    )
+    app, calls = fake_server([rate_limited, JSONResponse(COMPLETION)])
+
+    completion = asyncio.run(call_with_resilience(chat(client_for(app))))
+
+    assert completion.choices[0].message.content == "{}"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.3
+    # Un 429 prouve que le service répond : le disjoncteur reste fermé
+    assert breaker.state == "closed"
+
+
+def test_circuit_opens_after_provider_failures(breaker):
+    app, calls = fake_server([JSONResponse({"error": {"message": "boom", "type": "server_error"}}, status_code=500)])
+    client = client_for(app)
+
+    # Première tentative + une nouvelle tentative : deux pannes, le seuil est atteint
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(call_with_resilience(chat(client)))
+    assert len(calls) == 2
+    assert breaker.state == "open"
+
+    # Circuit ouvert : refus immédiat, sans appel au serveur
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_resilience(chat(client)))
+    assert len(calls) == 2